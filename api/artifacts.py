@@ -0,0 +1,190 @@
+"""
+Memory-mapped model artifacts shared across uvicorn workers
+
+With N workers, each one unpickles its own copy of every model, so resident
+memory grows with the worker count. With API_MMAP_MODELS=1:
+
+- Model pickles are loaded with ``joblib.load(..., mmap_mode="r")``. The
+  Prosit 2 pickles and the Prosit 3 linear models and scaler are
+  uncompressed joblib files, so their large NumPy attributes (DBSCAN core
+  samples, clustering labels, ...) become read-only views of the file, and
+  every worker on the host shares them through the page cache. The other
+  pickles (the Prosit 3 tree ensembles, all of Prosit 5) were written with
+  plain pickle, which joblib loads into private memory whatever mmap_mode.
+- Artifacts derived at startup (the DBSCAN KD-tree index, the compiled
+  forests) are exported once to API_ARTIFACT_CACHE as uncompressed joblib
+  files and memory-mapped the same way. sklearn's own tree objects copy
+  their nodes when unpickled, so for the Prosit 5 forests the compiled
+  arrays are the only part that is shared.
+
+Exports are keyed by the size and mtime of their source files plus the
+NumPy/scikit-learn versions; a stale export is rebuilt and replaced.
+"""
+
+import logging
+import os
+from functools import partial
+from pathlib import Path
+from typing import Callable, Iterable
+
+import joblib
+import numpy as np
+
+from logging_config import LOGGER_NAME
+
+MMAP_ENABLED = os.environ.get("API_MMAP_MODELS", "0") == "1"
+CACHE_DIR = Path(
+    os.environ.get(
+        "API_ARTIFACT_CACHE", Path(__file__).parent.parent / "models" / "compiled"
+    )
+)
+# Bump when the layout of an exported artifact changes
+CACHE_VERSION = 1
+
+logger = logging.getLogger(f"{LOGGER_NAME}.artifacts")
+
+
+def load_pickle(path: Path):
+    """joblib.load a model pickle, memory-mapping its arrays when enabled"""
+    return joblib.load(path, mmap_mode="r" if MMAP_ENABLED else None)
+
+
+def fingerprint(sources: Iterable[Path]) -> tuple:
+    """Identify the inputs of a derived artifact"""
+    import sklearn
+
+    files = tuple(
+        (Path(source).name, os.stat(source).st_size, os.stat(source).st_mtime_ns)
+        for source in sources
+    )
+    return (CACHE_VERSION, np.__version__, sklearn.__version__, files)
+
+
+def cached_artifact(name: str, sources: Iterable[Path], build: Callable):
+    """
+    Return build(), shared through a memory-mapped export when enabled
+
+    `sources` are the files build() depends on (model pickles and the code
+    that derives the artifact). Empty results (None, {}) are not exported.
+    """
+    if not MMAP_ENABLED:
+        return build()
+
+    path = CACHE_DIR / f"{name}.joblib"
+    key = fingerprint(sources)
+    cached = _load_export(path, key)
+    if cached is not None:
+        return cached
+
+    artifact = build()
+    if not artifact:
+        return artifact
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        # Workers may export concurrently: write privately, then swap in
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        joblib.dump({"key": key, "artifact": artifact}, tmp_path)
+        os.replace(tmp_path, path)
+    except OSError:
+        logger.warning("Could not export %s to %s", name, CACHE_DIR, exc_info=True)
+        return artifact
+
+    logger.info("Exported %s to %s", name, path)
+    return _load_export(path, key) or artifact
+
+
+def _load_export(path: Path, key: tuple):
+    if not path.exists():
+        return None
+    try:
+        export = joblib.load(path, mmap_mode="r")
+    except Exception:
+        logger.warning("Ignoring unreadable export %s", path, exc_info=True)
+        return None
+    if export.get("key") != key:
+        return None
+    return _unwrap_memmaps(export["artifact"])
+
+
+def _unwrap_memmaps(obj):
+    """
+    Replace np.memmap instances with plain ndarray views of the same pages
+
+    Every operation on a memmap subclass goes through its __array_wrap__ /
+    __array_finalize__ hooks, which roughly doubles the cost of the small
+    array operations on the hot path.
+    """
+    if isinstance(obj, np.memmap):
+        return np.asarray(obj)
+    if isinstance(obj, dict):
+        return {key: _unwrap_memmaps(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_unwrap_memmaps(value) for value in obj)
+    if isinstance(obj, partial):
+        return partial(
+            obj.func,
+            *_unwrap_memmaps(obj.args),
+            **_unwrap_memmaps(obj.keywords),
+        )
+    return obj
+
+
+# ============================================================================
+# MEMORY REPORT
+# ============================================================================
+
+
+def process_memory(pid="self") -> dict:
+    """
+    Resident memory of a process split into shared and private bytes
+
+    Reads /proc/<pid>/smaps_rollup (Linux). Shared pages are those mapped by
+    more than one process, such as memory-mapped artifacts used by several
+    workers; PSS divides each shared page between the processes using it.
+    """
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+
+    return {
+        "rss_bytes": fields.get("Rss", 0),
+        "pss_bytes": fields.get("Pss", 0),
+        "shared_bytes": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+        "private_bytes": fields.get("Private_Clean", 0)
+        + fields.get("Private_Dirty", 0),
+    }
+
+
+def worker_pids(parent_pid: int) -> list:
+    """Child processes of a uvicorn/gunicorn master (its workers)"""
+    children = []
+    for task in Path(f"/proc/{parent_pid}/task").iterdir():
+        children.extend(int(pid) for pid in (task / "children").read_text().split())
+    return sorted(children)
+
+
+def main():
+    """Print shared vs private RSS for each worker of a server process"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("pid", type=int, help="PID of the uvicorn master process")
+    args = parser.parse_args()
+
+    pids = worker_pids(args.pid) or [args.pid]
+    mib = 1024 * 1024
+    print(f"{'PID':>8} {'RSS MiB':>9} {'Shared':>9} {'Private':>9} {'PSS':>9}")
+    for pid in pids:
+        usage = process_memory(pid)
+        print(
+            f"{pid:>8} {usage['rss_bytes'] / mib:>9.1f} "
+            f"{usage['shared_bytes'] / mib:>9.1f} "
+            f"{usage['private_bytes'] / mib:>9.1f} {usage['pss_bytes'] / mib:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
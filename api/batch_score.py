@@ -0,0 +1,497 @@
+"""
+Offline batch scoring of a course-level CSV with Prosit 2 and Prosit 3
+
+The nightly scoring of data/merged_cleaned_encoded.csv (538,147 rows) does
+not need to go through the HTTP API. This scores the file directly, with the
+API's model loading (the model registry loaders in main.py) and feature
+order (feature_names.pkl, matched to CSV columns by either name, as in the
+scoring jobs):
+
+    python batch_score.py ../data/merged_cleaned_encoded.csv scores.arrow
+    python batch_score.py cohort.csv scores.npy --chunk-rows 50000 --processes 4
+
+The parent process loads the models once and forks a process pool (sharing
+the model pages copy-on-write, as prefork.py does). It reads the CSV in
+chunks of --chunk-rows rows, hands each chunk to the pool, and every chunk's
+predictions are written as one part file under <output>.parts/. When all
+chunks are done the parts are joined into the output file, an Arrow IPC file
+(.arrow, .feather; requires pyarrow) or a structured .npy array (.npy):
+
+    row                      row number in the CSV, from 0
+    prosit2_<algorithm>      cluster label (-1: DBSCAN noise or invalid row)
+    prosit2_valid            False if the row failed the Prosit 2 feature checks
+    prosit3_probation_risk   0/1 (-1: invalid row)
+    prosit3_probability      NaN for an invalid row
+    prosit3_valid            False if the row failed the Prosit 3 feature checks
+
+When the CSV has no KMeans_Cluster column, Prosit 3 is given the Prosit 2
+K-Means cluster of the same row instead. A missing Hierarchical_Cluster or
+GMM_Cluster column is filled with -1, the value most Prosit 3 training rows
+had (as in the API's /chained endpoints).
+
+Running the same command again after an interruption resumes it: chunks
+whose part file exists are skipped (--restart starts over). Rows per second
+and peak RSS of the parent and of the largest worker are reported at the end.
+"""
+
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from columnar import ARROW_FILE, EXTENSIONS, NPY
+
+DEFAULT_CHUNK_ROWS = 20000
+ALGORITHMS = ("kmeans", "hierarchical", "gmm", "dbscan")
+# Prosit 3 cluster feature -> the Prosit 2 algorithm that produces it
+CLUSTER_FIELDS = {
+    "kmeans_cluster": "kmeans",
+    "hierarchical_cluster": "hierarchical",
+    "gmm_cluster": "gmm",
+}
+
+# Set in each worker by init_worker
+_scorer = None
+
+
+class ChunkScorer:
+    """Scores the feature matrices of one chunk and writes its part file"""
+
+    def __init__(
+        self,
+        p2: Optional[dict],
+        p3: Optional[dict],
+        algorithms: List[str],
+        prosit3_model: Optional[str],
+        fill_clusters: Dict[int, str],
+        parts_dir: Path,
+        media_type: str,
+    ):
+        self.p2 = p2
+        self.p3 = p3
+        self.algorithms = algorithms
+        self.prosit3_model = prosit3_model
+        # Prosit 3 column -> Prosit 2 algorithm whose labels fill it
+        self.fill_clusters = fill_clusters
+        self.parts_dir = parts_dir
+        self.media_type = media_type
+
+    def score(self, start_row: int, X2, X3) -> Dict[str, np.ndarray]:
+        import main as api
+
+        n = len(X2) if X2 is not None else len(X3)
+        columns = {"row": np.arange(start_row, start_row + n, dtype=np.int64)}
+
+        if X2 is not None:
+            valid2 = ~self.p2["vectors"].invalid(X2).any(axis=1)
+            clusters = {}
+            for algorithm in set(self.algorithms) | set(self.fill_clusters.values()):
+                labels = np.full(n, -1, dtype=np.int64)
+                if valid2.any():
+                    labels[valid2] = api.cluster_prosit2_matrix(
+                        self.p2, algorithm, X2[valid2]
+                    )
+                clusters[algorithm] = labels
+            for algorithm in self.algorithms:
+                columns[f"prosit2_{algorithm}"] = clusters[algorithm]
+            columns["prosit2_valid"] = valid2
+
+        if X3 is not None:
+            for column, algorithm in self.fill_clusters.items():
+                # Rows without a cluster stay NaN and fail the Prosit 3 checks
+                X3[:, column] = np.where(valid2, clusters[algorithm], np.nan)
+            valid3 = ~self.p3["vectors"].invalid(X3).any(axis=1)
+            risk = np.full(n, -1, dtype=np.int64)
+            probability = np.full(n, np.nan)
+            if valid3.any():
+                if self.prosit3_model == "ensemble":
+                    predictions, probabilities = api.compute_prosit3_ensemble(
+                        self.p3, X3[valid3]
+                    )
+                else:
+                    predictions, probabilities = api.compute_prosit3(
+                        self.p3, self.prosit3_model, X3[valid3]
+                    )
+                risk[valid3] = predictions
+                probability[valid3] = probabilities
+            columns["prosit3_probation_risk"] = risk
+            columns["prosit3_probability"] = probability
+            columns["prosit3_valid"] = valid3
+        return columns
+
+    def run(self, index: int, start_row: int, X2, X3) -> dict:
+        columns = self.score(start_row, X2, X3)
+        path = part_path(self.parts_dir, index, self.media_type)
+        write_part(path, columns, self.media_type)
+        invalid = {
+            prosit: int((~columns[f"{prosit}_valid"]).sum())
+            for prosit in ("prosit2", "prosit3")
+            if f"{prosit}_valid" in columns
+        }
+        return {"index": index, "rows": len(columns["row"]), "invalid": invalid}
+
+
+def init_worker(scorer: ChunkScorer):
+    global _scorer
+    _scorer = scorer
+
+
+def score_chunk(index: int, start_row: int, X2, X3) -> dict:
+    return _scorer.run(index, start_row, X2, X3)
+
+
+# ============================================================================
+# Part files and the joined output
+# ============================================================================
+
+
+def part_path(parts_dir: Path, index: int, media_type: str) -> Path:
+    suffix = ".npy" if media_type == NPY else ".arrow"
+    return parts_dir / f"part-{index:06d}{suffix}"
+
+
+def write_part(path: Path, columns: Dict[str, np.ndarray], media_type: str):
+    """Write one chunk's columns atomically (a part that exists is complete)"""
+    tmp_path = path.with_name(path.name + ".tmp")
+    if media_type == NPY:
+        result = np.empty(
+            len(columns["row"]),
+            dtype=[(name, values.dtype) for name, values in columns.items()],
+        )
+        for name, values in columns.items():
+            result[name] = values
+        with open(tmp_path, "wb") as f:
+            np.save(f, result, allow_pickle=False)
+    else:
+        import pyarrow as pa
+        import pyarrow.ipc
+
+        batch = pa.record_batch(
+            [pa.array(values) for values in columns.values()], names=list(columns)
+        )
+        with pa.OSFile(str(tmp_path), "wb") as sink:
+            with pa.ipc.new_file(sink, batch.schema) as writer:
+                writer.write_batch(batch)
+    os.replace(tmp_path, path)
+
+
+def join_parts(parts: List[Path], output: Path, media_type: str) -> int:
+    """Concatenate the part files into the output file; returns the row count"""
+    tmp_path = output.with_name(output.name + ".tmp")
+    if media_type == NPY:
+        arrays = [np.load(part, mmap_mode="r") for part in parts]
+        total = sum(len(array) for array in arrays)
+        result = np.lib.format.open_memmap(
+            tmp_path, mode="w+", dtype=arrays[0].dtype, shape=(total,)
+        )
+        offset = 0
+        for array in arrays:
+            result[offset : offset + len(array)] = array
+            offset += len(array)
+        result.flush()
+        del result, arrays
+    else:
+        import pyarrow as pa
+        import pyarrow.ipc
+
+        total = 0
+        with pa.OSFile(str(tmp_path), "wb") as sink:
+            writer = None
+            for part in parts:
+                with pa.memory_map(str(part)) as source:
+                    table = pa.ipc.open_file(source).read_all()
+                if writer is None:
+                    writer = pa.ipc.new_file(sink, table.schema)
+                writer.write_table(table)
+                total += table.num_rows
+            writer.close()
+    os.replace(tmp_path, output)
+    return total
+
+
+def output_format(output: Path) -> str:
+    media_type = EXTENSIONS.get(output.suffix.lower())
+    if media_type == NPY:
+        return NPY
+    if media_type == ARROW_FILE:
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            sys.exit(f"{output.name}: Arrow output needs pyarrow; write .npy instead")
+        return ARROW_FILE
+    sys.exit(f"{output.name}: output must be .arrow, .feather or .npy")
+
+
+def peak_rss_mib(who: int) -> float:
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(who).ru_maxrss * scale / (1024 * 1024)
+
+
+# ============================================================================
+# Driver
+# ============================================================================
+
+
+def read_chunks(pd, path: Path, needed: List[str], chunk_rows: int, first: int):
+    """CSV chunks from chunk number `first` on, with only the needed columns"""
+    return pd.read_csv(
+        path,
+        usecols=lambda column: column in needed,
+        chunksize=chunk_rows,
+        # Rows before the first unfinished chunk are not parsed at all
+        skiprows=range(1, first * chunk_rows + 1),
+    )
+
+
+def feature_matrix(pd, chunk, columns: List[Optional[str]]) -> np.ndarray:
+    X = np.full((len(chunk), len(columns)), np.nan)
+    for j, column in enumerate(columns):
+        if column is not None:
+            # Non-numeric cells become NaN and fail the finiteness check
+            X[:, j] = pd.to_numeric(chunk[column], errors="coerce")
+    return X
+
+
+def batch_score(args) -> int:
+    import pandas as pd
+
+    import main as api
+
+    media_type = output_format(args.output)
+    parts_dir = args.output.with_name(args.output.name + ".parts")
+    algorithms = [a for a in args.algorithms.split(",") if a]
+    unknown = set(algorithms) - set(ALGORITHMS)
+    if unknown:
+        sys.exit(f"Unknown algorithm(s): {', '.join(sorted(unknown))}")
+    if not algorithms and args.prosit3_model == "none":
+        sys.exit("Nothing to score: no Prosit 2 algorithm and no Prosit 3 model")
+
+    header = list(pd.read_csv(args.input, nrows=0).columns)
+    start = time.perf_counter()
+    # Load before forking, so the workers share the models
+    gc.disable()
+    p2 = p3 = None
+    columns3: List[Optional[str]] = []
+    fill_clusters: Dict[int, str] = {}
+    fill_unsampled: List[int] = []
+    if args.prosit3_model != "none":
+        api.ensure_loaded("prosit3")
+        p3 = api.model_registry.get("prosit3")
+        if args.prosit3_model != "ensemble" and args.prosit3_model not in p3["models"]:
+            sys.exit(
+                f"Unknown Prosit 3 model {args.prosit3_model!r}; "
+                f"choose ensemble or one of {', '.join(p3['models'])}"
+            )
+        columns3 = p3["vectors"].csv_columns(header)
+        for field, algorithm in CLUSTER_FIELDS.items():
+            position = p3["vectors"].positions[field]
+            if columns3[position] is not None:
+                continue
+            if field in api.PROSIT3_SAMPLED_CLUSTER_FIELDS:
+                fill_unsampled.append(position)
+            else:
+                fill_clusters[position] = algorithm
+        missing = [
+            p3["vectors"].feature_names[i]
+            for i, column in enumerate(columns3)
+            if column is None and i not in fill_clusters and i not in fill_unsampled
+        ]
+        if missing:
+            sys.exit(f"CSV lacks Prosit 3 feature column(s): {', '.join(missing)}")
+    if algorithms or fill_clusters:
+        api.ensure_loaded("prosit2")
+        p2 = api.model_registry.get("prosit2")
+        columns2 = p2["vectors"].csv_columns(header)
+        missing = [
+            p2["vectors"].feature_names[i]
+            for i, column in enumerate(columns2)
+            if column is None
+        ]
+        if missing:
+            sys.exit(f"CSV lacks Prosit 2 feature column(s): {', '.join(missing)}")
+    load_seconds = time.perf_counter() - start
+
+    stat = args.input.stat()
+    manifest = {
+        "input": str(args.input.resolve()),
+        "input_size": stat.st_size,
+        "input_mtime_ns": stat.st_mtime_ns,
+        "chunk_rows": args.chunk_rows,
+        "algorithms": algorithms,
+        "prosit3_model": args.prosit3_model,
+        "format": media_type,
+        "versions": {
+            "prosit2": p2["version"] if p2 else None,
+            "prosit3": p3["version"] if p3 else None,
+        },
+    }
+    if args.restart:
+        shutil.rmtree(parts_dir, ignore_errors=True)
+    manifest_path = parts_dir / "manifest.json"
+    if manifest_path.exists():
+        with open(manifest_path) as f:
+            previous = json.load(f)
+        if previous != manifest:
+            sys.exit(
+                f"{parts_dir} belongs to a run with different input, options or "
+                "models; pass --restart to start over"
+            )
+    else:
+        parts_dir.mkdir(parents=True, exist_ok=True)
+        with open(manifest_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+
+    done = {
+        int(path.stem.split("-")[1])
+        for path in parts_dir.glob("part-*")
+        if path.suffix in (".npy", ".arrow")
+    }
+    first = 0
+    while first in done:
+        first += 1
+
+    needed = {column for column in columns3 if column is not None}
+    if p2 is not None:
+        needed.update(columns2)
+    scorer = ChunkScorer(
+        p2,
+        p3,
+        algorithms,
+        None if p3 is None else args.prosit3_model,
+        fill_clusters,
+        parts_dir,
+        media_type,
+    )
+    context = multiprocessing.get_context(
+        "fork" if "fork" in multiprocessing.get_all_start_methods() else None
+    )
+    # Frozen objects stay out of the collector's reach (and their pages
+    # clean in the workers); everything allocated from here on, pandas
+    # chunks included, is collected as usual in the parent and the workers
+    gc.freeze()
+    gc.enable()
+
+    start = time.perf_counter()
+    rows = 0
+    invalid = {"prosit2": 0, "prosit3": 0}
+    pending = set()
+    index = first
+
+    def collect(futures):
+        nonlocal rows
+        for future in futures:
+            result = future.result()
+            rows += result["rows"]
+            for prosit, count in result["invalid"].items():
+                invalid[prosit] += count
+            elapsed = time.perf_counter() - start
+            print(
+                f"chunk {result['index']}: {result['rows']} rows "
+                f"({rows / elapsed:,.0f} rows/s so far)",
+                flush=True,
+            )
+
+    with ProcessPoolExecutor(
+        max_workers=args.processes,
+        mp_context=context,
+        initializer=init_worker,
+        initargs=(scorer,),
+    ) as pool:
+        for chunk in read_chunks(pd, args.input, needed, args.chunk_rows, first):
+            if index not in done:
+                X2 = None if p2 is None else feature_matrix(pd, chunk, columns2)
+                X3 = None if p3 is None else feature_matrix(pd, chunk, columns3)
+                if fill_unsampled:
+                    X3[:, fill_unsampled] = api.PROSIT3_UNSAMPLED_CLUSTER
+                pending.add(
+                    pool.submit(score_chunk, index, index * args.chunk_rows, X2, X3)
+                )
+                # Bound the chunks held in memory while the workers catch up
+                if len(pending) >= 2 * args.processes:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(finished)
+            index += 1
+        collect(pending)
+    score_seconds = time.perf_counter() - start
+
+    parts = sorted(
+        path
+        for path in parts_dir.glob("part-*")
+        if path.suffix in (".npy", ".arrow")
+    )
+    if not parts:
+        sys.exit(f"{args.input} has no rows")
+    total = join_parts(parts, args.output, media_type)
+    shutil.rmtree(parts_dir)
+
+    print(
+        f"Scored {rows:,} rows in {score_seconds:.1f}s "
+        f"({rows / score_seconds if score_seconds else 0:,.0f} rows/s) "
+        f"with {args.processes} processes; models loaded in {load_seconds:.1f}s"
+    )
+    if first or len(done) > first:
+        print(f"Resumed: {len(done)} chunk(s) were already scored")
+    print(
+        "Rows failing the feature checks: "
+        + ", ".join(f"{prosit} {count:,}" for prosit, count in invalid.items())
+    )
+    print(f"Wrote {total:,} rows to {args.output}")
+    print(
+        f"Peak RSS: parent {peak_rss_mib(resource.RUSAGE_SELF):.1f} MiB, "
+        f"largest worker {peak_rss_mib(resource.RUSAGE_CHILDREN):.1f} MiB"
+    )
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("input", type=Path, help="CSV to score")
+    parser.add_argument(
+        "output", type=Path, help="Output file (.arrow, .feather or .npy)"
+    )
+    parser.add_argument(
+        "--chunk-rows",
+        type=int,
+        default=DEFAULT_CHUNK_ROWS,
+        help=f"Rows per chunk (default {DEFAULT_CHUNK_ROWS})",
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Scoring processes (default: CPU count)",
+    )
+    parser.add_argument(
+        "--algorithms",
+        default=",".join(ALGORITHMS),
+        help="Comma-separated Prosit 2 algorithms to output (default: all)",
+    )
+    parser.add_argument(
+        "--prosit3-model",
+        default="ensemble",
+        help="Prosit 3 model, 'ensemble' (default) or 'none' to skip Prosit 3",
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="Discard the chunks of an earlier, unfinished run",
+    )
+    args = parser.parse_args()
+    if args.chunk_rows < 1 or args.processes < 1:
+        parser.error("--chunk-rows and --processes must be at least 1")
+    sys.exit(batch_score(args))
+
+
+if __name__ == "__main__":
+    main()
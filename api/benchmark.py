@@ -0,0 +1,413 @@
+"""
+Load and latency benchmark for the prediction endpoints
+
+The test_*.py scripts check responses but measure nothing. This drives the
+endpoints with synthetic payloads and reports throughput and p50/p95/p99
+latency per endpoint, either in-process over ASGI (no sockets, measures the
+app itself) or against a uvicorn server it launches locally:
+
+    python benchmark.py                                  # in-process ASGI
+    python benchmark.py --target uvicorn --concurrency 32
+    python benchmark.py --output baseline.json           # save a baseline
+    python benchmark.py --baseline baseline.json         # exit 1 on regression
+
+Payloads are sampled from each model's scaler (mean_ ± scale_, clipped to the
+request schema's bounds, whole numbers for integer fields), so they look like
+the training data. Each endpoint gets --requests requests from --concurrency
+concurrent clients, after --warmup requests that are not measured.
+
+With --baseline, an endpoint regresses when its p50, p95 or p99 latency
+grows, or its throughput falls, by more than --threshold percent against the
+baseline run with the same target. Needs httpx (in requirements.txt).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+
+# Per-request INFO logs would swamp the report (set API_LOG_LEVEL to override)
+os.environ.setdefault("API_LOG_LEVEL", "WARNING")
+
+API_DIR = Path(__file__).resolve().parent
+PAYLOAD_POOL = 256
+BATCH_ROWS = 100
+
+# Compared against the baseline: (result key, True if higher is worse)
+COMPARED = (
+    ("p50_ms", True),
+    ("p95_ms", True),
+    ("p99_ms", True),
+    ("throughput_rps", False),
+)
+
+
+class Endpoint:
+    """A benchmarked route and the pool of request bodies it is sent"""
+
+    def __init__(self, name: str, path: str, bodies: List[bytes]):
+        self.name = name
+        self.path = path
+        self.bodies = bodies
+
+
+def sample_records(schema, scaler, n: int, rng) -> List[dict]:
+    """n named-field records drawn from the scaler's per-feature statistics"""
+    X = rng.normal(scaler.mean_, scaler.scale_, size=(n, len(scaler.mean_)))
+    lower, upper = schema.lower, schema.upper
+    X = np.clip(X, lower, upper)
+    X[:, schema.integer] = np.round(X[:, schema.integer])
+    # Exclusive bounds: move values that landed on them just inside
+    X = np.where(~schema.lower_inclusive & (X <= lower), np.nextafter(lower, np.inf), X)
+    X = np.where(~schema.upper_inclusive & (X >= upper), np.nextafter(upper, -np.inf), X)
+    records = []
+    for row in X.tolist():
+        records.append(
+            {
+                field: int(value) if integer else value
+                for field, value, integer in zip(
+                    schema.field_order, row, schema.integer.tolist()
+                )
+            }
+        )
+    return records
+
+
+def build_endpoints(api, seed: int) -> List[Endpoint]:
+    rng = np.random.default_rng(seed)
+    api.load_every_prosit()
+    p2 = api.model_registry.get("prosit2")
+    p3 = api.model_registry.get("prosit3")
+    p5 = api.model_registry.get("prosit5")
+
+    def single(records: List[dict]) -> List[bytes]:
+        return [json.dumps(record).encode() for record in records]
+
+    def batches(records: List[dict]) -> List[bytes]:
+        return [
+            json.dumps({"records": records[i : i + BATCH_ROWS]}).encode()
+            for i in range(0, len(records) - BATCH_ROWS + 1, BATCH_ROWS)
+        ]
+
+    prosit2 = sample_records(p2["vectors"], p2["scaler"], PAYLOAD_POOL * 4, rng)
+    prosit3 = sample_records(p3["vectors"], p3["scaler"], PAYLOAD_POOL * 4, rng)
+    endpoints = [
+        Endpoint(
+            f"prosit2_{algorithm}",
+            f"/prosit2/cluster/{algorithm}",
+            single(prosit2[:PAYLOAD_POOL]),
+        )
+        for algorithm in ("kmeans", "hierarchical", "gmm", "dbscan")
+    ]
+    endpoints += [
+        Endpoint(
+            "prosit2_kmeans_batch", "/prosit2/cluster/kmeans/batch", batches(prosit2)
+        ),
+        Endpoint(
+            "prosit3_baseline_logistic",
+            "/prosit3/predict/baseline_logistic",
+            single(prosit3[:PAYLOAD_POOL]),
+        ),
+        Endpoint(
+            "prosit3_ensemble",
+            "/prosit3/predict/ensemble",
+            single(prosit3[:PAYLOAD_POOL]),
+        ),
+        Endpoint(
+            "prosit3_ensemble_batch",
+            "/prosit3/predict/ensemble/batch",
+            batches(prosit3),
+        ),
+        Endpoint(
+            "prosit3_ensemble_chained",
+            "/prosit3/predict/ensemble/chained",
+            single(prosit2[:PAYLOAD_POOL]),
+        ),
+    ]
+    for task, model_key in api.PROSIT5_TASKS.items():
+        records = sample_records(
+            p5["vectors"][model_key], p5["scalers"][model_key], PAYLOAD_POOL, rng
+        )
+        endpoints.append(
+            Endpoint(
+                f"prosit5_{task.replace('-', '_')}",
+                f"/prosit5/predict/{task}",
+                single(records),
+            )
+        )
+    return endpoints
+
+
+# ============================================================================
+# Load generation
+# ============================================================================
+
+
+async def drive(
+    client, endpoint: Endpoint, requests: int, concurrency: int, warmup: int
+) -> dict:
+    """Send `requests` requests from `concurrency` clients; latency stats"""
+    headers = {"Content-Type": "application/json"}
+    latencies: List[float] = []
+    errors = 0
+    sent = 0
+
+    async def worker(count: int, record: bool):
+        nonlocal errors, sent
+        while sent < count:
+            body = endpoint.bodies[sent % len(endpoint.bodies)]
+            sent += 1
+            start = time.perf_counter()
+            response = await client.post(endpoint.path, content=body, headers=headers)
+            elapsed = time.perf_counter() - start
+            if not record:
+                continue
+            if response.status_code == 200:
+                latencies.append(elapsed)
+            else:
+                errors += 1
+
+    await asyncio.gather(*(worker(warmup, False) for _ in range(concurrency)))
+    sent = 0
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(requests, True) for _ in range(concurrency)))
+    wall = time.perf_counter() - start
+
+    ms = np.array(latencies) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99]) if len(ms) else (np.nan,) * 3
+    return {
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": round(len(ms) / wall, 1),
+        "mean_ms": round(float(ms.mean()), 3) if len(ms) else None,
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+    }
+
+
+async def run_all(
+    make_client: Callable, endpoints: List[Endpoint], args
+) -> Dict[str, dict]:
+    results = {}
+    async with make_client() as client:
+        for endpoint in endpoints:
+            results[endpoint.name] = await drive(
+                client, endpoint, args.requests, args.concurrency, args.warmup
+            )
+            print_row(endpoint.name, results[endpoint.name])
+    return results
+
+
+def asgi_client(httpx, app):
+    def make_client():
+        return httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://benchmark"
+        )
+
+    return make_client
+
+
+def launch_uvicorn(port: int, workers: int) -> subprocess.Popen:
+    """Start `uvicorn main:app` on localhost and wait until it answers"""
+    import urllib.request
+
+    command = [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port)]
+    if workers > 1:
+        command += ["--workers", str(workers)]
+    server = subprocess.Popen(
+        command, cwd=API_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            sys.exit(f"uvicorn exited with status {server.returncode}")
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1)
+            return server
+        except OSError:
+            time.sleep(0.5)
+    server.terminate()
+    sys.exit("uvicorn did not start within 120 s")
+
+
+# ============================================================================
+# Reporting and baselines
+# ============================================================================
+
+
+def print_header(title: str):
+    print(f"\n{title}")
+    print(
+        f"{'endpoint':<30} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} "
+        f"{'p99 ms':>9} {'errors':>7}"
+    )
+
+
+def print_row(name: str, result: dict):
+    print(
+        f"{name:<30} {result['throughput_rps']:>9.1f} {result['p50_ms']:>9.2f} "
+        f"{result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['errors']:>7}",
+        flush=True,
+    )
+
+
+def find_regressions(
+    results: Dict[str, Dict[str, dict]], baseline: dict, threshold: float
+) -> List[str]:
+    """Human-readable regressions of `results` against a saved baseline run"""
+    regressions = []
+    for target, endpoints in results.items():
+        previous = baseline.get("results", {}).get(target, {})
+        for name, result in endpoints.items():
+            if result["errors"]:
+                regressions.append(f"{target} {name}: {result['errors']} errors")
+            before = previous.get(name)
+            if before is None:
+                continue
+            for key, higher_is_worse in COMPARED:
+                old, new = before.get(key), result.get(key)
+                if not old or new is None:
+                    continue
+                change = (new - old) / old * 100
+                if (change if higher_is_worse else -change) > threshold:
+                    regressions.append(
+                        f"{target} {name}: {key} {old:g} -> {new:g} "
+                        f"({change:+.0f}%)"
+                    )
+    return regressions
+
+
+def benchmark(args) -> int:
+    try:
+        import httpx
+    except ImportError:
+        sys.exit("benchmark.py needs httpx: pip install -r requirements.txt")
+
+    import main as api
+
+    endpoints = build_endpoints(api, args.seed)
+    if args.endpoints:
+        wanted = set(args.endpoints.split(","))
+        unknown = wanted - {endpoint.name for endpoint in endpoints}
+        if unknown:
+            sys.exit(
+                f"Unknown endpoint(s): {', '.join(sorted(unknown))}; choose from "
+                f"{', '.join(endpoint.name for endpoint in endpoints)}"
+            )
+        endpoints = [endpoint for endpoint in endpoints if endpoint.name in wanted]
+
+    targets = ["asgi", "uvicorn"] if args.target == "both" else [args.target]
+    results = {}
+    for target in targets:
+        print_header(
+            f"{target}: {args.requests} requests per endpoint, "
+            f"concurrency {args.concurrency}"
+        )
+        if target == "asgi":
+            results[target] = asyncio.run(
+                run_all(asgi_client(httpx, api.app), endpoints, args)
+            )
+            continue
+
+        server = launch_uvicorn(args.port, args.workers)
+        try:
+            results[target] = asyncio.run(
+                run_all(
+                    lambda: httpx.AsyncClient(
+                        base_url=f"http://127.0.0.1:{args.port}",
+                        limits=httpx.Limits(max_connections=args.concurrency),
+                    ),
+                    endpoints,
+                    args,
+                )
+            )
+        finally:
+            server.terminate()
+            server.wait()
+
+    report = {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "seed": args.seed,
+            "uvicorn_workers": args.workers,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = find_regressions(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) over {args.threshold:g}%:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print(f"\n✅ No regression over {args.threshold:g}% against {args.baseline}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--target",
+        choices=("asgi", "uvicorn", "both"),
+        default="asgi",
+        help="In-process ASGI app, a launched uvicorn server, or both",
+    )
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument(
+        "--requests", type=int, default=500, help="Measured requests per endpoint"
+    )
+    parser.add_argument(
+        "--warmup", type=int, default=50, help="Unmeasured requests per endpoint"
+    )
+    parser.add_argument(
+        "--endpoints", help="Comma-separated endpoint names (default: all)"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Payload sampling seed")
+    parser.add_argument(
+        "--port", type=int, default=8010, help="Port for --target uvicorn"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1, help="uvicorn workers for --target uvicorn"
+    )
+    parser.add_argument("--output", type=Path, help="Write the results as JSON")
+    parser.add_argument(
+        "--baseline", type=Path, help="Results JSON to compare against"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=25.0,
+        help="Allowed regression against --baseline, in percent (default 25)",
+    )
+    args = parser.parse_args()
+    if args.concurrency < 1 or args.requests < 1 or args.warmup < 0:
+        parser.error(
+            "--concurrency and --requests must be at least 1, --warmup at least 0"
+        )
+    sys.exit(benchmark(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Columnar binary bodies (Arrow IPC, .npy) for bulk scoring
+
+JSON is the bottleneck when a nightly job sends tens of thousands of rows:
+every value becomes a Python object on the way in and on the way out. The
+/bulk endpoints take the rows as columns instead and answer in the same
+format:
+
+- application/vnd.apache.arrow.stream (or .arrow.file): an Arrow IPC table,
+  columns matched to the model's feature order by name (requires pyarrow)
+- application/x-npy: a NumPy .npy file, either a structured array (columns
+  matched by name) or a plain (n, n_features) array in feature_names.pkl order
+- multipart/form-data with the file in a "file" field; its format comes from
+  the part's content type or the file extension (.arrow, .arrows, .feather,
+  .npy)
+
+Columns are copied straight into the float64 feature matrix and validated
+with VectorSchema; results are written back as whole columns.
+"""
+
+import io
+from pathlib import PurePath
+from typing import Dict, Optional
+
+import numpy as np
+from fastapi import HTTPException, Request
+from fastapi.responses import Response
+
+from feature_vectors import VectorSchema, invalid_body
+from metrics import Counter, registry, timed_import
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+ARROW_FILE = "application/vnd.apache.arrow.file"
+NPY = "application/x-npy"
+
+EXTENSIONS = {
+    ".arrows": ARROW_STREAM,
+    ".arrow": ARROW_FILE,
+    ".feather": ARROW_FILE,
+    ".npy": NPY,
+}
+NPY_MAGIC = b"\x93NUMPY"
+ARROW_FILE_MAGIC = b"ARROW1"
+
+rows_counter = registry.register(
+    Counter(
+        "api_columnar_rows_total",
+        "Rows scored through the columnar bulk endpoints",
+        ("format",),
+    )
+)
+
+
+def sniff_format(body: bytes) -> Optional[str]:
+    """Format of an untyped (application/octet-stream) body, from its magic bytes"""
+    if body.startswith(NPY_MAGIC):
+        return NPY
+    if body.startswith(ARROW_FILE_MAGIC):
+        return ARROW_FILE
+    if body.startswith(b"\xff\xff\xff\xff"):
+        return ARROW_STREAM
+    return None
+
+
+def import_pyarrow():
+    try:
+        pa = timed_import("pyarrow")
+        timed_import("pyarrow.ipc")
+        return pa
+    except ImportError:
+        raise HTTPException(
+            status_code=415,
+            detail="Arrow bodies need pyarrow, which is not installed; send .npy",
+        )
+
+
+class ColumnarUpload:
+    """A columnar request body and the format to answer in"""
+
+    def __init__(self, media_type: str, body: bytes):
+        self.media_type = media_type
+        self.body = body
+
+    def decode(self, schema: VectorSchema) -> np.ndarray:
+        """Validated (n, n_features) float64 matrix"""
+        if self.media_type == NPY:
+            X = self._decode_npy(schema)
+        else:
+            X = schema.from_columns(self._arrow_columns())
+        rows_counter.inc(("npy" if self.media_type == NPY else "arrow",), X.shape[0])
+        return X
+
+    def _decode_npy(self, schema: VectorSchema) -> np.ndarray:
+        if not self.body.startswith(NPY_MAGIC):
+            # np.load would try to unpickle it
+            raise HTTPException(status_code=400, detail="Body is not a .npy file")
+        try:
+            array = np.load(io.BytesIO(self.body), allow_pickle=False)
+        except (ValueError, OSError, EOFError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid .npy body: {e}")
+        if array.dtype.names:
+            return schema.from_columns(
+                {name: array[name] for name in array.dtype.names}
+            )
+
+        if array.ndim == 1:
+            array = array.reshape(1, -1)
+        if array.ndim != 2 or array.shape[1] != schema.n_features or not len(array):
+            raise invalid_body(
+                [],
+                f"Expected an (n, {schema.n_features}) array in feature_names.pkl "
+                f"order or a structured array, got shape {array.shape}",
+                "length_mismatch",
+            )
+        if array.dtype.kind not in "biuf":
+            raise invalid_body([], "Array must be numeric", "float_type")
+        X = array.astype(np.float64)
+        schema.check(X)
+        return X
+
+    def _arrow_columns(self) -> Dict[str, np.ndarray]:
+        pa = import_pyarrow()
+        try:
+            if self.media_type == ARROW_FILE:
+                table = pa.ipc.open_file(pa.py_buffer(self.body)).read_all()
+            else:
+                table = pa.ipc.open_stream(pa.py_buffer(self.body)).read_all()
+        except (pa.ArrowInvalid, OSError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid Arrow body: {e}")
+        # Nulls become NaN and are rejected as non-finite by the schema check
+        return {
+            name: column.to_numpy()
+            for name, column in zip(table.column_names, table.columns)
+        }
+
+    def respond(self, columns: Dict[str, np.ndarray], headers: dict) -> Response:
+        """Result columns in the request's format"""
+        if self.media_type == NPY:
+            result = np.empty(
+                len(next(iter(columns.values()))),
+                dtype=[(name, values.dtype) for name, values in columns.items()],
+            )
+            for name, values in columns.items():
+                result[name] = values
+            buffer = io.BytesIO()
+            np.save(buffer, result, allow_pickle=False)
+            content = buffer.getvalue()
+        else:
+            pa = import_pyarrow()
+            batch = pa.record_batch(
+                [pa.array(values) for values in columns.values()],
+                names=list(columns),
+            )
+            sink = pa.BufferOutputStream()
+            open_writer = (
+                pa.ipc.new_file if self.media_type == ARROW_FILE else pa.ipc.new_stream
+            )
+            with open_writer(sink, batch.schema) as writer:
+                writer.write_batch(batch)
+            content = sink.getvalue().to_pybytes()
+        return Response(content=content, media_type=self.media_type, headers=headers)
+
+
+async def read_upload(request: Request) -> ColumnarUpload:
+    """Read a raw or multipart columnar body (415 for other formats)"""
+    content_type = request.headers.get("content-type", "")
+    media_type = content_type.split(";", 1)[0].strip().lower()
+
+    if media_type == "multipart/form-data":
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise invalid_body(
+                ["file"], "Expected a file in the 'file' field", "missing"
+            )
+        body = await upload.read()
+        media_type = (upload.content_type or "").split(";", 1)[0].strip().lower()
+        if media_type not in (ARROW_STREAM, ARROW_FILE, NPY):
+            media_type = EXTENSIONS.get(
+                PurePath(upload.filename or "").suffix.lower()
+            ) or sniff_format(body)
+    else:
+        body = await request.body()
+        if media_type == "application/octet-stream":
+            media_type = sniff_format(body)
+
+    if media_type not in (ARROW_STREAM, ARROW_FILE, NPY):
+        raise HTTPException(
+            status_code=415,
+            detail=f"Send {ARROW_STREAM}, {ARROW_FILE} or {NPY} "
+            "(raw or as a multipart 'file')",
+        )
+    return ColumnarUpload(media_type, body)
@@ -0,0 +1,288 @@
+"""
+Compiled evaluators for serving scikit-learn models
+
+sklearn's predict/predict_proba validate their input and dispatch through
+several layers on every call, which dominates the cost when scoring one or
+a few rows. The compilers here turn fitted models into plain NumPy arrays at
+load time, so scoring becomes a handful of array operations.
+
+Every compiler self-checks against sklearn on synthetic rows drawn from the
+scaler statistics and returns None on mismatch; callers then keep using the
+sklearn path. Set API_COMPILED_MODELS=0 to disable compiled evaluation.
+"""
+
+import os
+from functools import partial
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+
+COMPILED_MODELS_ENABLED = os.environ.get("API_COMPILED_MODELS", "1") != "0"
+
+
+def synthetic_rows(scaler, n_rows: int = 256, seed: int = 0) -> np.ndarray:
+    """Rows drawn around the scaler's fitted mean/scale, for self-checks"""
+    rng = np.random.default_rng(seed)
+    return scaler.mean_ + rng.standard_normal((n_rows, len(scaler.mean_))) * scaler.scale_
+
+
+# ============================================================================
+# LINEAR MODELS (LogisticRegression[CV], RidgeClassifier[CV])
+# ============================================================================
+
+
+def compile_linear_models(scaler, models: dict) -> Optional[dict]:
+    """
+    Fold a shared StandardScaler into binary linear classifiers
+
+    For each model, ((x - mean) / scale) @ w + c == x @ (w / scale) + c',
+    with c' = c - (mean / scale) @ w. The folded weights of all models are
+    stacked into one (n_models, n_features) matrix so every model can be
+    evaluated with a single matmul. Models that are not binary linear
+    classifiers are left out (they keep using sklearn).
+
+    Models with predict_proba get sigmoid(decision) as probability; others
+    (RidgeClassifierCV) use the predicted class, matching the endpoints.
+    """
+    names, coefs, intercepts, has_proba, classes = [], [], [], [], []
+    for name, model in models.items():
+        coef = getattr(model, "coef_", None)
+        if coef is None or len(getattr(model, "classes_", ())) != 2:
+            continue
+        coef = np.asarray(coef, dtype=np.float64).reshape(-1)
+        if coef.shape[0] != len(scaler.mean_):
+            continue
+        intercept = float(np.ravel(model.intercept_)[0])
+
+        names.append(name)
+        coefs.append(coef / scaler.scale_)
+        intercepts.append(intercept - (scaler.mean_ / scaler.scale_) @ coef)
+        has_proba.append(hasattr(model, "predict_proba"))
+        classes.append(model.classes_)
+
+    if not names:
+        return None
+
+    # Imported once here, not per prediction (or at import time: importing
+    # this module should not pull in scipy)
+    from scipy.special import expit
+
+    compiled = {
+        "names": names,
+        "index": {name: i for i, name in enumerate(names)},
+        "coef": np.ascontiguousarray(np.stack(coefs)),
+        "intercept": np.array(intercepts),
+        "has_proba": np.array(has_proba),
+        "classes": np.stack(classes).astype(np.float64),
+        "sigmoid": expit,
+    }
+    return compiled if _check_linear(compiled, scaler, models) else None
+
+
+def predict_linear(
+    compiled: dict, X: np.ndarray, model_name: Optional[str] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Score raw (unscaled) rows with one or all compiled linear models
+
+    Returns (predictions, probabilities): shape (n_rows,) for a single
+    model_name, or (n_models, n_rows) for all models.
+    """
+    if model_name is not None:
+        i = compiled["index"][model_name]
+        rows = slice(i, i + 1)
+    else:
+        rows = slice(None)
+
+    decision = compiled["coef"][rows] @ X.T + compiled["intercept"][rows, np.newaxis]
+    classes = compiled["classes"][rows]
+    predictions = np.where(decision > 0, classes[:, 1:2], classes[:, 0:1])
+    probabilities = np.where(
+        compiled["has_proba"][rows, np.newaxis],
+        compiled["sigmoid"](decision),
+        predictions,
+    )
+
+    if model_name is not None:
+        return predictions[0].astype(int), probabilities[0]
+    return predictions.astype(int), probabilities
+
+
+def _check_linear(compiled: dict, scaler, models: dict) -> bool:
+    X = synthetic_rows(scaler)
+    X_scaled = scaler.transform(X)
+    predictions, probabilities = predict_linear(compiled, X)
+    decision = compiled["coef"] @ X.T + compiled["intercept"][:, np.newaxis]
+
+    for i, name in enumerate(compiled["names"]):
+        model = models[name]
+        reference = np.ravel(model.decision_function(X_scaled))
+        if not np.allclose(decision[i], reference, rtol=1e-7, atol=1e-7):
+            return False
+        # Only compare labels away from the decision boundary
+        decided = np.abs(reference) > 1e-7
+        if not np.array_equal(predictions[i][decided], model.predict(X_scaled)[decided]):
+            return False
+        if compiled["has_proba"][i] and not np.allclose(
+            probabilities[i], model.predict_proba(X_scaled)[:, 1], rtol=1e-7, atol=1e-9
+        ):
+            return False
+    return True
+
+
+# ============================================================================
+# RANDOM FORESTS (RandomForestClassifier)
+# ============================================================================
+
+
+# Rows per traversal block: 4096 rows x 100 trees keeps the intp node and
+# offset arrays (and their temporaries) at a few MB each
+FOREST_BLOCK_ROWS = 4096
+
+
+def compile_forest(scaler, forest) -> Optional[dict]:
+    """
+    Flatten a binary RandomForestClassifier into contiguous node arrays
+
+    The nodes of all trees are concatenated into feature, threshold,
+    children and leaf-value arrays (child indices offset into the shared
+    arrays), so all (row, tree) pairs descend the forest together with
+    vectorized indexing, one tree level per step.
+
+    Matches sklearn's predict_proba: rows are scaled in float64 and compared
+    as float32 (as sklearn's tree code does), and per-tree leaf
+    probabilities are summed in tree order before dividing by the number
+    of trees.
+    """
+    if getattr(forest, "n_outputs_", 1) != 1 or len(forest.classes_) != 2:
+        return None
+
+    features, thresholds, children, values, leaves, roots = [], [], [], [], [], []
+    offset = 0
+    for estimator in forest.estimators_:
+        tree = estimator.tree_
+        is_leaf = tree.children_left == -1
+
+        # Older sklearn stored class counts in the leaves, newer fractions
+        value = tree.value[:, 0, :].astype(np.float64)
+        normalizer = value.sum(axis=1, keepdims=True)
+        if not np.allclose(normalizer, 1.0):
+            normalizer[normalizer == 0.0] = 1.0
+            value = value / normalizer
+
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(tree.threshold)
+        # children[2 * node] is the left child, children[2 * node + 1] the right
+        children.append(
+            np.stack([tree.children_left, tree.children_right], axis=1).ravel()
+            + np.where(np.repeat(is_leaf, 2), 0, offset)
+        )
+        values.append(value[:, 1])
+        leaves.append(is_leaf)
+        roots.append(offset)
+        offset += tree.node_count
+
+    compiled = {
+        "mean": scaler.mean_,
+        "scale": scaler.scale_,
+        "feature": np.concatenate(features).astype(np.intp),
+        "threshold": np.concatenate(thresholds),
+        "children": np.concatenate(children).astype(np.intp),
+        "is_leaf": np.concatenate(leaves),
+        "value": np.concatenate(values),
+        "roots": np.array(roots, dtype=np.intp),
+        "classes": forest.classes_,
+    }
+    return compiled if _check_forest(compiled, scaler, forest) else None
+
+
+def predict_forest(compiled: dict, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Score raw (unscaled) rows; returns (predictions, positive-class probabilities)
+
+    Rows are evaluated in blocks of FOREST_BLOCK_ROWS, so the per-(row, tree)
+    traversal state stays a few MB however many rows a bulk upload sends.
+    """
+    if len(X) <= FOREST_BLOCK_ROWS:
+        return _predict_forest_block(compiled, X)
+    blocks = [
+        _predict_forest_block(compiled, X[start : start + FOREST_BLOCK_ROWS])
+        for start in range(0, len(X), FOREST_BLOCK_ROWS)
+    ]
+    return (
+        np.concatenate([predictions for predictions, _ in blocks]),
+        np.concatenate([probabilities for _, probabilities in blocks]),
+    )
+
+
+def _predict_forest_block(
+    compiled: dict, X: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    X_scaled = ((X - compiled["mean"]) / compiled["scale"]).astype(np.float32)
+    n_rows, n_features = X_scaled.shape
+    n_trees = len(compiled["roots"])
+    flat_X = X_scaled.ravel()
+
+    # Tree-major layout: position p holds tree p // n_rows for row p % n_rows
+    nodes = np.repeat(compiled["roots"], n_rows)
+    row_offset = np.tile(np.arange(n_rows, dtype=np.intp) * n_features, n_trees)
+
+    feature, threshold = compiled["feature"], compiled["threshold"]
+    children, is_leaf = compiled["children"], compiled["is_leaf"]
+    active = np.flatnonzero(~is_leaf[nodes])
+    while active.size:
+        current = nodes[active]
+        go_right = ~(flat_X[row_offset[active] + feature[current]] <= threshold[current])
+        current = children[2 * current + go_right]
+        nodes[active] = current
+        active = active[~is_leaf[current]]
+
+    # cumsum adds one tree at a time, in sklearn's accumulation order (sum()
+    # switches to pairwise summation for a single row and can differ by an ulp)
+    leaf_values = compiled["value"][nodes].reshape(n_trees, n_rows)
+    probabilities = np.cumsum(leaf_values, axis=0)[-1] / n_trees
+
+    # argmax of [1 - p, p]: sklearn picks the first class on ties
+    predictions = compiled["classes"][(probabilities > 1.0 - probabilities).astype(int)]
+    return predictions.astype(int), probabilities
+
+
+def _check_forest(compiled: dict, scaler, forest) -> bool:
+    # More than one block, so the block boundaries are checked too
+    X = synthetic_rows(scaler, n_rows=FOREST_BLOCK_ROWS + 1024)
+    X_scaled = scaler.transform(X)
+    predictions, probabilities = predict_forest(compiled, X)
+    reference = forest.predict_proba(X_scaled)[:, 1]
+    if not np.array_equal(probabilities, reference) or not np.array_equal(
+        predictions, forest.predict(X_scaled).astype(int)
+    ):
+        return False
+    # Single rows take a different reduction path than batches
+    return all(
+        predict_forest(compiled, X[i : i + 1])[1][0] == reference[i] for i in range(16)
+    )
+
+
+# ============================================================================
+# DISPATCH
+# ============================================================================
+
+
+def compile_classifier(
+    scaler, model_name: str, model
+) -> Optional[Callable[[np.ndarray], Tuple[np.ndarray, np.ndarray]]]:
+    """
+    Compile a binary classifier with its own scaler, if supported
+
+    Returns a function mapping raw (unscaled) rows to (predictions,
+    positive-class probabilities), or None when the model type is not
+    supported or fails its self-check.
+    """
+    if hasattr(model, "estimators_") and hasattr(model.estimators_[0], "tree_"):
+        compiled = compile_forest(scaler, model)
+        return partial(predict_forest, compiled) if compiled is not None else None
+    if hasattr(model, "coef_"):
+        compiled = compile_linear_models(scaler, {model_name: model})
+        if compiled is not None:
+            return partial(predict_linear, compiled, model_name=model_name)
+    return None
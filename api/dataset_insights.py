@@ -0,0 +1,137 @@
+"""
+Cached dataset profiles for /prosit5/datasets/insights
+
+The insights endpoint describes the Prosit 5 CSV files (shape, size, misconduct
+distribution, ...). Parsing them on every call is wasted work: the files only
+change when the data is refreshed. Each file is parsed once into a profile
+(rows, columns, and per-column dtype, null rate, cardinality and numeric
+quantiles, plus any requested value counts), kept in memory and in a JSON file
+on disk, and recomputed only when the file's size or mtime changes.
+
+The assembled endpoint response is cached by results_cache, so a request whose
+files are unchanged costs one stat() per file.
+"""
+
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Iterable
+
+from artifacts import CACHE_DIR
+from logging_config import LOGGER_NAME
+from metrics import Counter, registry, timed_import
+from results_cache import file_key
+
+# Bump when the layout of a profile changes
+PROFILE_VERSION = 1
+PROFILE_CACHE = CACHE_DIR / "dataset_profiles.json"
+
+QUANTILES = {"min": 0.0, "p25": 0.25, "p50": 0.5, "p75": 0.75, "max": 1.0}
+
+profiles_counter = registry.register(
+    Counter(
+        "api_dataset_profiles_computed_total",
+        "Dataset files parsed and profiled (cache misses)",
+        ("dataset",),
+    )
+)
+
+logger = logging.getLogger(f"{LOGGER_NAME}.insights")
+
+
+def profile_csv(path: Path, value_counts: Iterable[str] = ()) -> dict:
+    """Parse a CSV once and summarize every column"""
+    pd = timed_import("pandas")
+    df = pd.read_csv(path)
+
+    null_rates = df.isna().mean() if len(df) else pd.Series(0.0, index=df.columns)
+    cardinality = df.nunique()
+    numeric = df.select_dtypes(include="number", exclude="bool")
+    quantiles = numeric.quantile(list(QUANTILES.values())) if len(numeric) else None
+
+    column_stats = {}
+    for name in df.columns:
+        stats = {
+            "dtype": str(df[name].dtype),
+            "null_rate": round(float(null_rates[name]), 4),
+            "cardinality": int(cardinality[name]),
+        }
+        if quantiles is not None and name in quantiles and null_rates[name] < 1:
+            stats["quantiles"] = {
+                label: float(value)
+                for label, value in zip(QUANTILES, quantiles[name].tolist())
+            }
+        column_stats[str(name)] = stats
+
+    return {
+        "rows": int(df.shape[0]),
+        "columns": int(df.shape[1]),
+        "column_stats": column_stats,
+        "value_counts": {
+            name: {str(k): int(v) for k, v in df[name].value_counts().items()}
+            for name in value_counts
+        },
+    }
+
+
+class DatasetProfiles:
+    """Profiles keyed by file path, validated against size and mtime"""
+
+    def __init__(self, cache_path: Path):
+        self.cache_path = cache_path
+        self.entries = None  # path -> {"key": [size, mtime_ns], "profile": {...}}
+        self.lock = threading.Lock()
+
+    def profile(self, path: Path, value_counts: Iterable[str] = ()) -> dict:
+        """Profile of a CSV file, recomputed only when the file changed"""
+        value_counts = list(value_counts)
+        key = file_key(path)
+        with self.lock:
+            if self.entries is None:
+                self.entries = self._load()
+            entry = self.entries.get(str(path))
+            if (
+                entry is not None
+                and entry["key"] == key
+                and list(entry["profile"]["value_counts"]) == value_counts
+            ):
+                return entry["profile"]
+
+        profile = profile_csv(path, value_counts)
+        profiles_counter.inc((path.name,))
+        with self.lock:
+            self.entries[str(path)] = {"key": key, "profile": profile}
+            self._save()
+        return profile
+
+    def _load(self) -> dict:
+        try:
+            with open(self.cache_path) as f:
+                cached = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError):
+            logger.warning("Ignoring unreadable %s", self.cache_path, exc_info=True)
+            return {}
+        if cached.get("version") != PROFILE_VERSION:
+            return {}
+        return cached["profiles"]
+
+    def _save(self):
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.cache_path.with_name(
+                f"{self.cache_path.name}.{os.getpid()}.tmp"
+            )
+            with open(tmp_path, "w") as f:
+                json.dump({"version": PROFILE_VERSION, "profiles": self.entries}, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError:
+            logger.warning(
+                "Could not write dataset profiles to %s", self.cache_path, exc_info=True
+            )
+
+
+dataset_profiles = DatasetProfiles(PROFILE_CACHE)
@@ -0,0 +1,215 @@
+"""
+Bounded worker pools for CPU-bound and file-backed endpoint work
+
+Endpoints decorated with ``@offload(pool)`` are plain ``def`` functions whose
+body runs on a dedicated thread pool instead of the asyncio event loop, so a
+slow request no longer stalls every other request on the worker. Inference
+and file I/O use separate pools: a burst of /prosit5/datasets/insights calls
+queues behind other file reads, not behind predictions. Bulk scoring jobs
+(POST /jobs/score) get a third pool, so a long job never holds an inference
+thread.
+
+Threads rather than processes: the models live in module globals loaded at
+startup, and NumPy/scikit-learn release the GIL inside their numeric kernels.
+
+Configured from the environment:
+
+- API_INFERENCE_WORKERS: inference threads (default: CPU count, max 8)
+- API_IO_WORKERS: file-backed endpoint threads (default 2)
+- API_MAX_QUEUE_DEPTH: requests allowed to wait per pool before new ones
+  are rejected with 503 (default 256, 0 = unbounded)
+- API_JOB_WORKERS / API_MAX_QUEUED_JOBS: scoring job threads (default 1) and
+  jobs allowed to wait for one (default 16)
+- API_JOB_NICE: niceness of the job threads (default 10, 0 = unchanged)
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial, wraps
+from time import perf_counter
+
+from fastapi import HTTPException
+
+from logging_config import LOGGER_NAME
+from metrics import Counter, Gauge, Histogram, record_stage, registry
+
+logger = logging.getLogger(f"{LOGGER_NAME}.executors")
+
+queued_gauge = registry.register(
+    Gauge(
+        "api_executor_queued",
+        "Requests waiting for a worker thread",
+        ("pool",),
+    )
+)
+active_gauge = registry.register(
+    Gauge(
+        "api_executor_active",
+        "Requests currently running on a worker thread",
+        ("pool",),
+    )
+)
+rejected_counter = registry.register(
+    Counter(
+        "api_executor_rejected_total",
+        "Requests rejected because the pool queue was full",
+        ("pool",),
+    )
+)
+wait_histogram = registry.register(
+    Histogram(
+        "api_executor_queue_wait_seconds",
+        "Time requests spent queued before a worker picked them up",
+        ("pool",),
+    )
+)
+
+
+class ExecutorSaturated(HTTPException):
+    """Raised when a pool's queue is full; served as 503 Service Unavailable"""
+
+    def __init__(self, pool_name: str):
+        super().__init__(
+            status_code=503,
+            detail=f"Server busy: the {pool_name} queue is full, retry shortly",
+            headers={"Retry-After": "1"},
+        )
+
+
+class BoundedExecutor:
+    """Thread pool with a bounded wait queue and queue-depth metrics"""
+
+    def __init__(
+        self, name: str, max_workers: int, max_queue_depth: int, initializer=None
+    ):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue_depth = max_queue_depth
+        self.pool = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix=f"{name}-worker",
+            initializer=initializer,
+        )
+        self.lock = threading.Lock()
+        self.queued = 0
+        self.active = 0
+        self._publish()
+
+    def _publish(self):
+        queued_gauge.set((self.name,), self.queued)
+        active_gauge.set((self.name,), self.active)
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        """Queue fn(*args, **kwargs) on the pool, carrying the current context"""
+        with self.lock:
+            if self.max_queue_depth and self.queued >= self.max_queue_depth:
+                rejected_counter.inc((self.name,))
+                raise ExecutorSaturated(self.name)
+            self.queued += 1
+            self._publish()
+
+        submitted = perf_counter()
+        context = contextvars.copy_context()
+        started = False
+
+        def call():
+            nonlocal started
+            waited = perf_counter() - submitted
+            with self.lock:
+                started = True
+                self.queued -= 1
+                self.active += 1
+                wait_histogram.observe((self.name,), waited)
+                self._publish()
+            try:
+                context.run(record_stage, "queue", waited)
+                return context.run(fn, *args, **kwargs)
+            finally:
+                with self.lock:
+                    self.active -= 1
+                    self._publish()
+
+        def done(future: Future):
+            # Cancelled while queued (client went away): call() never runs,
+            # so its queue slot has to be given back here
+            if future.cancelled():
+                with self.lock:
+                    if not started:
+                        self.queued -= 1
+                        self._publish()
+
+        try:
+            future = self.pool.submit(call)
+        except RuntimeError:
+            # Pool already shut down
+            with self.lock:
+                self.queued -= 1
+                self._publish()
+            raise
+        future.add_done_callback(done)
+        return future
+
+    async def run(self, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) on the pool, carrying the request context"""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        # Cancelled futures release their own slots; this covers the rest
+        with self.lock:
+            self.queued = 0
+            self._publish()
+
+
+def offload(executor: BoundedExecutor):
+    """Decorator: serve a synchronous endpoint body on `executor`"""
+
+    def decorator(fn):
+        @wraps(fn)
+        async def endpoint(*args, **kwargs):
+            return await executor.run(partial(fn, *args, **kwargs))
+
+        return endpoint
+
+    return decorator
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.environ.get(name, default))
+
+
+def set_thread_niceness(niceness: int):
+    """
+    Pool initializer: give the calling thread an absolute niceness (Linux
+    applies it per thread). Set once per thread, so reused threads keep it.
+    """
+    if niceness <= 0 or not hasattr(os, "setpriority"):
+        return
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), niceness)
+    except OSError:
+        logger.warning("Could not set worker thread niceness to %d", niceness)
+
+
+inference_pool = BoundedExecutor(
+    "inference",
+    max_workers=_env_int("API_INFERENCE_WORKERS", min(os.cpu_count() or 1, 8)),
+    max_queue_depth=_env_int("API_MAX_QUEUE_DEPTH", 256),
+)
+io_pool = BoundedExecutor(
+    "io",
+    max_workers=_env_int("API_IO_WORKERS", 2),
+    max_queue_depth=_env_int("API_MAX_QUEUE_DEPTH", 256),
+)
+job_pool = BoundedExecutor(
+    "jobs",
+    max_workers=_env_int("API_JOB_WORKERS", 1),
+    max_queue_depth=_env_int("API_MAX_QUEUED_JOBS", 16),
+    # Online requests win the CPU between the GIL switches (best effort: the
+    # job threads still share this process's GIL with the request handlers)
+    initializer=partial(set_thread_niceness, _env_int("API_JOB_NICE", 10)),
+)
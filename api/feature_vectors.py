@@ -0,0 +1,230 @@
+"""
+Raw numeric feature vectors as an alternative to named-field JSON
+
+The named-field schemas (Prosit2Features: 32 fields, Prosit3Features: 23) make
+Pydantic build a model object per record, which the handlers then read back
+attribute by attribute. Vector endpoints take the values positionally instead,
+in the order of the prosit's feature_names.pkl:
+
+    {"features": [v1, v2, ...]}                  one record
+    {"features": [[v1, v2, ...], [...], ...]}    several records
+    [[v1, v2, ...], [...], ...]                  bare 2-D array
+
+The body is decoded with json.loads and copied into a preallocated float64
+matrix; length, finiteness, the named schema's ge/gt/le/lt bounds and integer
+fields are then checked on the whole matrix at once with NumPy. Columnar
+uploads (see columnar.py) go through the same checks after their columns are
+matched to that order by name.
+"""
+
+import json
+from typing import Dict, List, Optional, Type, Union
+
+import annotated_types
+import numpy as np
+from fastapi import HTTPException
+from pydantic import BaseModel, Field
+
+# Validation errors reported per request (the rest are counted)
+MAX_REPORTED_ERRORS = 10
+
+
+class FeatureVectorRequest(BaseModel):
+    """Feature values in feature_names.pkl order (documentation schema only)"""
+
+    features: Union[List[float], List[List[float]]] = Field(
+        ..., description="One feature vector, or a list of feature vectors"
+    )
+
+
+class VectorSchema:
+    """Positional layout and bounds of a named-field feature schema"""
+
+    def __init__(
+        self, model: Type[BaseModel], field_order: List[str], feature_names: List[str]
+    ):
+        if len(feature_names) != len(field_order):
+            raise ValueError(
+                f"feature_names.pkl lists {len(feature_names)} features, "
+                f"{model.__name__} has {len(field_order)}"
+            )
+        self.field_order = list(field_order)
+        self.feature_names = list(feature_names)
+        self.n_features = len(field_order)
+        # Column name (feature_names.pkl name or schema field name) -> position
+        self.positions = {name: i for i, name in enumerate(field_order)}
+        self.positions.update((name, i) for i, name in enumerate(self.feature_names))
+        self.lower = np.full(self.n_features, -np.inf)
+        self.upper = np.full(self.n_features, np.inf)
+        self.lower_inclusive = np.ones(self.n_features, dtype=bool)
+        self.upper_inclusive = np.ones(self.n_features, dtype=bool)
+        self.integer = np.zeros(self.n_features, dtype=bool)
+
+        for i, name in enumerate(field_order):
+            field = model.model_fields[name]
+            self.integer[i] = field.annotation is int
+            for constraint in field.metadata:
+                if isinstance(constraint, annotated_types.Ge):
+                    self.lower[i] = constraint.ge
+                elif isinstance(constraint, annotated_types.Gt):
+                    self.lower[i], self.lower_inclusive[i] = constraint.gt, False
+                elif isinstance(constraint, annotated_types.Le):
+                    self.upper[i] = constraint.le
+                elif isinstance(constraint, annotated_types.Lt):
+                    self.upper[i], self.upper_inclusive[i] = constraint.lt, False
+
+    def parse(self, body: bytes) -> np.ndarray:
+        """Request body -> validated (n, n_features) float64 matrix (422 on error)"""
+        try:
+            payload = json.loads(body)
+        except ValueError as e:
+            raise invalid_body([], f"Invalid JSON: {e}", "json_invalid")
+        features = payload.get("features") if isinstance(payload, dict) else payload
+        if not isinstance(features, list) or not features:
+            raise invalid_body(
+                ["features"],
+                "Expected a non-empty list of numbers or of lists",
+                "list_type",
+            )
+
+        rows = features if isinstance(features[0], list) else [features]
+        # Checked up front: NumPy would broadcast a length-1 row silently
+        if any(
+            not isinstance(row, list) or len(row) != self.n_features for row in rows
+        ):
+            raise self._shape_error(rows, rows is features)
+        X = np.empty((len(rows), self.n_features), dtype=np.float64)
+        try:
+            X[:] = rows
+        except (ValueError, TypeError):
+            raise invalid_body(["features"], "Features must be numbers", "float_type")
+        self.check(X)
+        return X
+
+    def from_columns(self, columns: Dict[str, np.ndarray]) -> np.ndarray:
+        """Named columns -> validated (n, n_features) matrix (extra columns ignored)"""
+        X = None
+        found = np.zeros(self.n_features, dtype=bool)
+        for name, values in columns.items():
+            i = self.positions.get(name)
+            if i is None:
+                continue
+            if found[i]:
+                raise invalid_body(
+                    [name], f"Column given twice as {name!r}", "duplicate_column"
+                )
+            if X is None:
+                X = np.empty((len(values), self.n_features), dtype=np.float64)
+            elif len(values) != X.shape[0]:
+                raise invalid_body(
+                    [name], "Columns differ in length", "length_mismatch"
+                )
+            if values.dtype.kind not in "biuf":
+                raise invalid_body([name], "Column must be numeric", "float_type")
+            try:
+                X[:, i] = values
+            except (ValueError, TypeError):
+                raise invalid_body([name], "Column must be numeric", "float_type")
+            found[i] = True
+
+        if not found.all():
+            missing = [self.feature_names[i] for i in np.flatnonzero(~found)]
+            raise invalid_body(
+                [],
+                f"Missing {len(missing)} feature column(s): {', '.join(missing)}",
+                "missing",
+            )
+        if X.shape[0] == 0:
+            raise invalid_body([], "No rows", "too_short")
+        self.check(X)
+        return X
+
+    def csv_columns(self, header: List[str]) -> List[Optional[str]]:
+        """Header column for each feature (by either name), None where absent"""
+        present = set(header)
+        columns = []
+        for field, feature in zip(self.field_order, self.feature_names):
+            if feature in present:
+                columns.append(feature)
+            elif field in present:
+                columns.append(field)
+            else:
+                columns.append(None)
+        return columns
+
+    def invalid(self, X: np.ndarray) -> np.ndarray:
+        """Boolean mask of the values that break the schema's rules"""
+        with np.errstate(invalid="ignore"):
+            bad = ~np.isfinite(X)
+            bad |= np.where(self.lower_inclusive, X < self.lower, X <= self.lower)
+            bad |= np.where(self.upper_inclusive, X > self.upper, X >= self.upper)
+            bad[:, self.integer] |= X[:, self.integer] != np.floor(X[:, self.integer])
+        return bad
+
+    def row_errors(self, X: np.ndarray) -> Dict[int, str]:
+        """Row index -> message for its first invalid value, for rows that fail"""
+        bad = self.invalid(X)
+        rows = np.flatnonzero(bad.any(axis=1))
+        return {
+            int(row): self._describe(int(col), X[row, col])
+            for row, col in zip(rows, bad[rows].argmax(axis=1))
+        }
+
+    def check(self, X: np.ndarray):
+        """Vectorized bounds/type checks over a whole feature matrix"""
+        bad = self.invalid(X)
+        if not bad.any():
+            return
+
+        rows, cols = np.nonzero(bad)
+        errors = [
+            {
+                "loc": ["body", "features", int(row), int(col)],
+                "msg": self._describe(int(col), X[row, col]),
+                "type": "value_error",
+            }
+            for row, col in zip(rows[:MAX_REPORTED_ERRORS], cols[:MAX_REPORTED_ERRORS])
+        ]
+        if len(rows) > MAX_REPORTED_ERRORS:
+            errors.append(
+                {
+                    "loc": ["body", "features"],
+                    "msg": f"{len(rows) - MAX_REPORTED_ERRORS} more invalid values",
+                    "type": "value_error",
+                }
+            )
+        raise HTTPException(status_code=422, detail=errors)
+
+    def _describe(self, col: int, value: float) -> str:
+        name = self.feature_names[col]
+        if not np.isfinite(value):
+            return f"{name}: value must be a finite number"
+        if self.integer[col] and value != np.floor(value):
+            return f"{name}: value must be an integer"
+        low = "[" if self.lower_inclusive[col] else "("
+        high = "]" if self.upper_inclusive[col] else ")"
+        return (
+            f"{name}: {value:g} is outside "
+            f"{low}{self.lower[col]:g}, {self.upper[col]:g}{high}"
+        )
+
+    def _shape_error(self, rows: list, nested: bool) -> HTTPException:
+        i, row = next(
+            (i, row)
+            for i, row in enumerate(rows)
+            if not isinstance(row, list) or len(row) != self.n_features
+        )
+        length = len(row) if isinstance(row, list) else "not a list"
+        return invalid_body(
+            ["features", i] if nested else ["features"],
+            f"Expected {self.n_features} features in feature_names.pkl order, "
+            f"got {length}",
+            "length_mismatch",
+        )
+
+
+def invalid_body(loc: list, msg: str, error_type: str) -> HTTPException:
+    return HTTPException(
+        status_code=422,
+        detail=[{"loc": ["body", *loc], "msg": msg, "type": error_type}],
+    )
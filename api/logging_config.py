@@ -0,0 +1,77 @@
+"""
+Non-blocking logging for the Student Analytics API
+
+Request handlers log through a QueueHandler, so a log call only enqueues the
+record; a QueueListener thread does the formatting-to-stream and the write,
+so the event loop never blocks on stdout/stderr.
+
+Configured from the environment:
+
+- API_LOG_LEVEL: logging level name (default INFO). DEBUG enables the
+  verbose per-request dumps (input features, PCA values, centroid distances)
+- API_LOG_SAMPLE_RATE: fraction of per-request records below WARNING that
+  are kept, between 0 and 1 (default 1.0). Warnings and errors are never
+  sampled out
+"""
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+
+LOGGER_NAME = "student_analytics"
+LOG_FORMAT = "%(asctime)s %(levelname)s [%(name)s] %(message)s"
+
+_listeners = []
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a random fraction of records below WARNING"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = min(max(rate, 0.0), 1.0)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or self.rate >= 1.0:
+            return True
+        return random.random() < self.rate
+
+
+def configure_logging() -> logging.Logger:
+    """Return the API logger, attaching the queue handler on first use"""
+    logger = logging.getLogger(LOGGER_NAME)
+    if logger.handlers:
+        return logger
+
+    level = os.environ.get("API_LOG_LEVEL", "INFO").upper()
+    sample_rate = float(os.environ.get("API_LOG_SAMPLE_RATE", "1.0"))
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(sample_rate))
+
+    listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    listener.start()
+    atexit.register(listener.stop)
+    # A worker forked by prefork.py inherits the queue but not the thread
+    os.register_at_fork(after_in_child=listener.start)
+    _listeners.append(listener)
+
+    logger.setLevel(level)
+    logger.addHandler(queue_handler)
+    logger.propagate = False
+    return logger
+
+
+def flush_logging():
+    """Write out queued records and stop the listener (before os._exit)"""
+    for listener in _listeners:
+        if listener._thread is not None:
+            listener.stop()
@@ -3,15 +3,54 @@ FastAPI Application for Student Analytics
 Comprehensive API for Prosit 2, 3, and 5 Machine Learning Models
 """
 
-from fastapi import FastAPI, HTTPException
+import time
+
+IMPORT_START = time.perf_counter()
+
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, Response
 from pydantic import BaseModel, Field
 import joblib
 import numpy as np
-import pandas as pd
+import hmac
+import itertools
 import json
+import logging
+import os
+import threading
 from pathlib import Path
-from typing import Literal, Dict, List, Optional
+from typing import Literal, Dict, List, Optional, Tuple
+
+from artifacts import MMAP_ENABLED, cached_artifact, load_pickle, process_memory
+from compiled_models import (
+    COMPILED_MODELS_ENABLED,
+    compile_classifier,
+    compile_linear_models,
+    predict_linear,
+)
+from dataset_insights import dataset_profiles
+from columnar import ARROW_FILE, ARROW_STREAM, NPY, ColumnarUpload, read_upload
+from executors import inference_pool, io_pool, job_pool, offload
+from feature_vectors import FeatureVectorRequest, VectorSchema
+from logging_config import configure_logging
+from metrics import (
+    PROMETHEUS_CONTENT_TYPE,
+    MetricsMiddleware,
+    TimedRoute,
+    registry,
+    stage,
+    timed_import,
+)
+from micro_batch import micro_batcher
+from model_registry import model_registry
+from ndjson_stream import MAX_CHUNK_ROWS, STREAM_CHUNK_ROWS, ndjson_response
+from prediction_cache import prediction_cache
+from results_cache import results_cache
+from scoring_jobs import JobModel, save_upload, scoring_jobs
+
+registry.record_startup("imports", time.perf_counter() - IMPORT_START)
 
 # ============================================================================
 # PYDANTIC MODELS - PROSIT 2 (CLUSTERING)
@@ -104,6 +143,40 @@ class ClusterResponse(BaseModel):
     is_outlier: bool = Field(
         default=False, description="Whether point is classified as outlier (DBSCAN)"
     )
+    model_version: Optional[str] = Field(
+        None, description="Version of the model set that produced this result"
+    )
+
+
+class Prosit2BatchRequest(BaseModel):
+    """Batch of student records for cluster assignment"""
+
+    records: List[Prosit2Features] = Field(
+        ..., min_length=1, description="Student records to assign in one pass"
+    )
+
+
+class ClusterAssignment(BaseModel):
+    """Cluster assignment for a single row of a batch"""
+
+    cluster: int = Field(..., description="Assigned cluster number")
+    is_outlier: bool = Field(
+        default=False, description="Whether point is classified as outlier (DBSCAN)"
+    )
+
+
+class BatchClusterResponse(BaseModel):
+    """Response model for batch cluster assignment"""
+
+    algorithm: str = Field(..., description="Clustering algorithm used")
+    n_clusters: int = Field(..., description="Total number of clusters")
+    n_records: int = Field(..., description="Number of records assigned")
+    assignments: List[ClusterAssignment] = Field(
+        ..., description="Per-record assignments, in request order"
+    )
+    model_version: Optional[str] = Field(
+        None, description="Version of the model set that produced this result"
+    )
 
 
 # ============================================================================
@@ -163,6 +236,81 @@ class PredictionResponse(BaseModel):
     probability: float = Field(..., description="Probability of being at risk (0-1)")
     model_used: str = Field(..., description="Name of the model used")
     confidence: str = Field(..., description="Low/Medium/High confidence level")
+    model_version: Optional[str] = Field(
+        None, description="Version of the model set that produced this result"
+    )
+
+
+class Prosit3BatchRequest(BaseModel):
+    """Batch of student records for probation risk prediction"""
+
+    records: List[Prosit3Features] = Field(
+        ..., min_length=1, description="Student records to score in one pass"
+    )
+
+
+class BatchPredictionItem(BaseModel):
+    """Probation risk prediction for a single row of a batch"""
+
+    probation_risk: int = Field(..., description="0 = No risk, 1 = At risk")
+    probability: float = Field(..., description="Probability of being at risk (0-1)")
+    confidence: str = Field(..., description="Low/Medium/High confidence level")
+
+
+class BatchPredictionResponse(BaseModel):
+    """Response model for batch probation risk predictions"""
+
+    model_used: str = Field(..., description="Name of the model used")
+    n_records: int = Field(..., description="Number of records scored")
+    predictions: List[BatchPredictionItem] = Field(
+        ..., description="Per-record predictions, in request order"
+    )
+    model_version: Optional[str] = Field(
+        None, description="Version of the model set that produced this result"
+    )
+
+
+class ChainedClusters(BaseModel):
+    """
+    Prosit 2 cluster assignments of a chained Prosit 3 prediction (only
+    kmeans_cluster is fed to the model; the other two features get -1)
+    """
+
+    kmeans_cluster: int = Field(..., description="K-Means cluster assignment")
+    hierarchical_cluster: int = Field(
+        ..., description="Hierarchical cluster assignment"
+    )
+    gmm_cluster: int = Field(..., description="GMM cluster assignment")
+
+
+class ChainedPredictionResponse(PredictionResponse):
+    """Probation risk prediction from raw Prosit 2 features"""
+
+    clusters: ChainedClusters = Field(
+        ..., description="Prosit 2 cluster assignments of the student"
+    )
+    prosit2_version: Optional[str] = Field(
+        None, description="Version of the Prosit 2 model set that assigned them"
+    )
+
+
+class ChainedBatchPredictionItem(BatchPredictionItem):
+    """Chained probation risk prediction for a single row of a batch"""
+
+    clusters: ChainedClusters = Field(
+        ..., description="Prosit 2 cluster assignments of the student"
+    )
+
+
+class ChainedBatchPredictionResponse(BatchPredictionResponse):
+    """Response model for chained batch probation risk predictions"""
+
+    predictions: List[ChainedBatchPredictionItem] = Field(
+        ..., description="Per-record predictions, in request order"
+    )
+    prosit2_version: Optional[str] = Field(
+        None, description="Version of the Prosit 2 model set that assigned them"
+    )
 
 
 # ============================================================================
@@ -231,6 +379,24 @@ class Prosit5Response(BaseModel):
     model_used: str = Field(..., description="Model identifier")
     confidence: str = Field(..., description="Low/Medium/High confidence level")
     interpretation: str = Field(..., description="Human-readable interpretation")
+    model_version: Optional[str] = Field(
+        None, description="Version of the model set that produced this result"
+    )
+
+
+# Request schema of each Prosit 5 model, and the endpoint name that serves it
+PROSIT5_SCHEMAS = {
+    "q1_first_year_struggle": Prosit5Q1Features,
+    "q2_ajc_prediction": Prosit5Q2Features,
+    "q3_major_success": Prosit5Q3Features,
+    "q9_delayed_graduation": Prosit5Q9Features,
+}
+PROSIT5_TASKS = {
+    "first-year-struggle": "q1_first_year_struggle",
+    "ajc": "q2_ajc_prediction",
+    "major-success": "q3_major_success",
+    "delayed-graduation": "q9_delayed_graduation",
+}
 
 
 # ============================================================================
@@ -242,6 +408,8 @@ app = FastAPI(
     description="Comprehensive API for student clustering, probation risk prediction, and success prediction",
     version="2.0.0",
 )
+# Time request validation/serialization for /metrics (must precede routes)
+app.router.route_class = TimedRoute
 
 # Add CORS middleware
 app.add_middleware(
@@ -250,28 +418,53 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+# Per-endpoint/per-stage latency metrics and Server-Timing header
+app.add_middleware(MetricsMiddleware)
+
+# Queue-backed logger: request threads only enqueue records
+logger = configure_logging()
+
 # Global variables for models
 BASE_DIR = Path(__file__).parent.parent
 MODELS_DIR = BASE_DIR / "models"
 RESULTS_DIR = BASE_DIR / "results"
-
-# Prosit 2 models
-prosit2_models = {}
-prosit2_scaler = None
-prosit2_pca = None
-prosit2_metadata = None
-
-# Prosit 3 models
-prosit3_models = {}
-prosit3_scaler = None
-prosit3_metadata = None
-
-# Prosit 5 models
-prosit5_models = {}
-prosit5_scalers = {}
-prosit5_features = {}
+# Exported compiled models are rebuilt when this file changes
+COMPILED_MODELS_SOURCE = Path(__file__).with_name("compiled_models.py")
+
+# Score Q1/Q2 over every on-grid input at load time and serve those by lookup
+PROSIT5_GRID_ENABLED = os.environ.get("API_PROSIT5_GRID", "0") == "1"
+# Models whose features are (math_score, english_score, composite_score)
+PROSIT5_GRID_MODELS = ("q1_first_year_struggle", "q2_ajc_prediction")
+
+# eager: load everything at startup; lazy: load each prosit on first use;
+# background: start serving at once and load in a warm-up thread
+MODEL_LOADING = os.environ.get("API_MODEL_LOADING", "eager").lower()
+
+# Admin endpoints (model reload) are disabled unless a token is configured
+ADMIN_TOKEN = os.environ.get("API_ADMIN_TOKEN", "")
+# Seconds between polls of the model directories (0 = no hot reload watcher)
+MODEL_WATCH_INTERVAL = float(os.environ.get("API_MODEL_WATCH_INTERVAL", "0"))
+
+# Each prosit's models live in one model set (a dict), published atomically
+# by model_registry; handlers read model_registry.get(prosit) once per request.
+#
+# prosit2: models, scaler, pca, metadata,
+#          index (out-of-sample DBSCAN / hierarchical assignment),
+#          projection (fused scaler+PCA and scaler+PCA+KMeans affine maps),
+#          vectors (positional schema for raw feature vectors)
+# prosit3: models, scaler, metadata,
+#          linear (scaler-folded, stacked linear models; None = use sklearn),
+#          vectors
+# prosit5: models, scalers, features,
+#          compiled (raw features -> (predictions, probabilities) evaluators),
+#          grids (precomputed Q1/Q2 score grid, API_PROSIT5_GRID=1),
+#          vectors (per model)
+#
+# plus "version" (content hash of the prosit's model directory) and
+# "fingerprint" (file sizes/mtimes, for the watcher), set by the registry.
 
 
 # ============================================================================
@@ -279,72 +472,286 @@ prosit5_features = {}
 # ============================================================================
 
 
-@app.on_event("startup")
-async def load_all_models():
-    """Load all models from Prosit 2, 3, and 5"""
-    global prosit2_models, prosit2_scaler, prosit2_pca, prosit2_metadata
-    global prosit3_models, prosit3_scaler, prosit3_metadata
-    global prosit5_models, prosit5_scalers, prosit5_features
+def load_artifact(path: Path):
+    """Load a model pickle (memory-mapped if enabled), timing it for /metrics"""
+    start = time.perf_counter()
+    artifact = load_pickle(path)
+    registry.record_model_load(
+        path.relative_to(MODELS_DIR).as_posix(), time.perf_counter() - start
+    )
+    return artifact
 
-    try:
-        # ===== PROSIT 2: CLUSTERING MODELS =====
-        prosit2_dir = MODELS_DIR / "prosit 2"
-        prosit2_metadata = joblib.load(prosit2_dir / "metadata.pkl")
-        prosit2_scaler = joblib.load(prosit2_dir / "scaler.pkl")
-        prosit2_pca = joblib.load(prosit2_dir / "pca.pkl")
-
-        prosit2_models = {
-            "kmeans": joblib.load(prosit2_dir / "kmeans_model.pkl"),
-            "dbscan": joblib.load(prosit2_dir / "dbscan_model.pkl"),
-            "hierarchical": joblib.load(prosit2_dir / "hierarchical_model.pkl"),
-            "gmm": joblib.load(prosit2_dir / "gmm_model.pkl"),
-        }
-        print(f"✅ Loaded {len(prosit2_models)} Prosit 2 clustering models")
-
-        # ===== PROSIT 3: PROBATION RISK MODELS =====
-        prosit3_dir = MODELS_DIR / "prosit 3"
-        prosit3_metadata = joblib.load(prosit3_dir / "metadata.pkl")
-        prosit3_scaler = joblib.load(prosit3_dir / "scaler.pkl")
-
-        # Only load the working fitted models
-        model_files = {
-            "baseline_logistic": "baseline_logistic.pkl",
-            "lasso_logistic": "lasso_logistic.pkl",
-            "ridge_logistic": "ridge_logistic.pkl",
-            "elastic_net_logistic": "elastic_net_logistic.pkl",
-        }
 
-        for model_name, filename in model_files.items():
-            prosit3_models[model_name] = joblib.load(prosit3_dir / filename)
-        print(f"✅ Loaded {len(prosit3_models)} Prosit 3 classification models")
+def load_prosit2() -> dict:
+    """Load the Prosit 2 clustering models and build their fast paths"""
+    prosit2_dir = MODELS_DIR / "prosit 2"
+    metadata = load_artifact(prosit2_dir / "metadata.pkl")
+    scaler = load_artifact(prosit2_dir / "scaler.pkl")
+    pca = load_artifact(prosit2_dir / "pca.pkl")
+
+    models = {
+        "kmeans": load_artifact(prosit2_dir / "kmeans_model.pkl"),
+        "dbscan": load_artifact(prosit2_dir / "dbscan_model.pkl"),
+        "hierarchical": load_artifact(prosit2_dir / "hierarchical_model.pkl"),
+        "gmm": load_artifact(prosit2_dir / "gmm_model.pkl"),
+    }
+    start = time.perf_counter()
+    index = cached_artifact(
+        "prosit2_index",
+        [
+            prosit2_dir / "dbscan_model.pkl",
+            prosit2_dir / "hierarchical_model.pkl",
+            Path(__file__),
+        ],
+        lambda: build_prosit2_index(models["dbscan"], models["hierarchical"]),
+    )
+    registry.record_model_load("prosit 2/assignment_index", time.perf_counter() - start)
+
+    print(f"✅ Loaded {len(models)} Prosit 2 clustering models")
+    return {
+        "models": models,
+        "scaler": scaler,
+        "pca": pca,
+        "metadata": metadata,
+        "index": index,
+        "projection": build_prosit2_projection(scaler, pca, models["kmeans"]),
+        "vectors": VectorSchema(
+            Prosit2Features,
+            PROSIT2_FIELD_ORDER,
+            load_artifact(prosit2_dir / "feature_names.pkl"),
+        ),
+    }
 
-        # ===== PROSIT 5: PREDICTIVE MODELS =====
-        prosit5_dir = MODELS_DIR / "prosit 5"
 
-        model_configs = {
-            "q1_first_year_struggle": "q1_first_year_struggle",
-            "q2_ajc_prediction": "q2_ajc_prediction",
-            "q3_major_success": "q3_major_success",
-            "q9_delayed_graduation": "q9_delayed_graduation",
-        }
+def load_prosit3() -> dict:
+    """Load the Prosit 3 probation risk models"""
+    prosit3_dir = MODELS_DIR / "prosit 3"
+    metadata = load_artifact(prosit3_dir / "metadata.pkl")
+    scaler = load_artifact(prosit3_dir / "scaler.pkl")
 
-        for model_key, prefix in model_configs.items():
-            prosit5_models[model_key] = joblib.load(prosit5_dir / f"{prefix}_model.pkl")
-            prosit5_scalers[model_key] = joblib.load(
-                prosit5_dir / f"{prefix}_scaler.pkl"
-            )
-            prosit5_features[model_key] = joblib.load(
-                prosit5_dir / f"{prefix}_features.pkl"
+    # Only load the working fitted models
+    model_files = {
+        "baseline_logistic": "baseline_logistic.pkl",
+        "lasso_logistic": "lasso_logistic.pkl",
+        "ridge_logistic": "ridge_logistic.pkl",
+        "elastic_net_logistic": "elastic_net_logistic.pkl",
+    }
+    models = {
+        model_name: load_artifact(prosit3_dir / filename)
+        for model_name, filename in model_files.items()
+    }
+
+    linear = None
+    if COMPILED_MODELS_ENABLED:
+        linear = compile_linear_models(scaler, models)
+        if linear is None:
+            logger.error(
+                "Compiled Prosit 3 linear models failed the sklearn self-check; "
+                "serving through sklearn"
             )
+    print(f"✅ Loaded {len(models)} Prosit 3 classification models")
+    return {
+        "models": models,
+        "scaler": scaler,
+        "metadata": metadata,
+        "linear": linear,
+        "vectors": VectorSchema(
+            Prosit3Features,
+            PROSIT3_FIELD_ORDER,
+            load_artifact(prosit3_dir / "feature_names.pkl"),
+        ),
+    }
+
+
+def load_prosit5() -> dict:
+    """Load the Prosit 5 predictive models"""
+    prosit5_dir = MODELS_DIR / "prosit 5"
+
+    model_configs = {
+        "q1_first_year_struggle": "q1_first_year_struggle",
+        "q2_ajc_prediction": "q2_ajc_prediction",
+        "q3_major_success": "q3_major_success",
+        "q9_delayed_graduation": "q9_delayed_graduation",
+    }
 
-        print(f"✅ Loaded {len(prosit5_models)} Prosit 5 predictive models")
-        print(
-            f"✅ Total models loaded: {len(prosit2_models) + len(prosit3_models) + len(prosit5_models)}"
+    models, scalers, features, compiled, vectors = {}, {}, {}, {}, {}
+    for model_key, prefix in model_configs.items():
+        models[model_key] = load_artifact(prosit5_dir / f"{prefix}_model.pkl")
+        scalers[model_key] = load_artifact(prosit5_dir / f"{prefix}_scaler.pkl")
+        features[model_key] = load_artifact(prosit5_dir / f"{prefix}_features.pkl")
+        # The request schemas' field names are the stored feature names
+        vectors[model_key] = VectorSchema(
+            PROSIT5_SCHEMAS[model_key], features[model_key], features[model_key]
         )
+        if COMPILED_MODELS_ENABLED:
+            evaluator = cached_artifact(
+                f"prosit5_{model_key}",
+                [
+                    prosit5_dir / f"{prefix}_model.pkl",
+                    prosit5_dir / f"{prefix}_scaler.pkl",
+                    COMPILED_MODELS_SOURCE,
+                ],
+                lambda: compile_classifier(
+                    scalers[model_key], model_key, models[model_key]
+                ),
+            )
+            if evaluator is None:
+                logger.error(
+                    "Compiled Prosit 5 model %s failed the sklearn self-check; "
+                    "serving through sklearn",
+                    model_key,
+                )
+            else:
+                compiled[model_key] = evaluator
+
+    p5 = {
+        "models": models,
+        "scalers": scalers,
+        "features": features,
+        "compiled": compiled,
+        "vectors": vectors,
+        "grids": {},
+    }
+    if PROSIT5_GRID_ENABLED:
+        start = time.perf_counter()
+        p5["grids"] = {
+            model_key: build_prosit5_grid(p5, model_key)
+            for model_key in PROSIT5_GRID_MODELS
+        }
+        registry.record_model_load("prosit 5/score_grid", time.perf_counter() - start)
+    print(f"✅ Loaded {len(models)} Prosit 5 predictive models")
+    return p5
+
+
+def warm_up_prosit2(p2: dict):
+    """Assign one synthetic row with every algorithm (first-call overheads)"""
+    X = p2["scaler"].mean_.reshape(1, -1)
+    for algorithm in p2["models"]:
+        cluster_prosit2_matrix(p2, algorithm, X)
+
+
+def warm_up_prosit3(p3: dict):
+    """Score one synthetic row with every model and the ensemble"""
+    X = p3["scaler"].mean_.reshape(1, -1)
+    for model_name in p3["models"]:
+        compute_prosit3(p3, model_name, X)
+    compute_prosit3_ensemble(p3, X)
+
+
+def warm_up_prosit5(p5: dict):
+    """Score one synthetic row with every model"""
+    for model_key, scaler in p5["scalers"].items():
+        compute_prosit5(p5, model_key, scaler.mean_.reshape(1, -1))
+
+
+# prosit -> (loader, model directory, sklearn modules its pickles import, warm-up)
+PROSIT_LOADERS = {
+    "prosit2": (
+        load_prosit2,
+        MODELS_DIR / "prosit 2",
+        (
+            "sklearn.preprocessing",
+            "sklearn.decomposition",
+            "sklearn.cluster",
+            "sklearn.mixture",
+            "sklearn.neighbors",
+        ),
+        warm_up_prosit2,
+    ),
+    "prosit3": (
+        load_prosit3,
+        MODELS_DIR / "prosit 3",
+        ("sklearn.preprocessing", "sklearn.linear_model"),
+        warm_up_prosit3,
+    ),
+    "prosit5": (
+        load_prosit5,
+        MODELS_DIR / "prosit 5",
+        ("sklearn.preprocessing", "sklearn.linear_model", "sklearn.ensemble"),
+        warm_up_prosit5,
+    ),
+}
+for prosit, (loader, directory, modules, warm_up) in PROSIT_LOADERS.items():
+    model_registry.register(prosit, loader, directory, modules, warm_up)
+# Cached results were computed by the models just replaced
+model_registry.on_publish.append(prediction_cache.invalidate)
+
+
+def ensure_loaded(prosit: str):
+    """Load a prosit's models once; concurrent callers wait for the first"""
+    seconds = model_registry.ensure_loaded(prosit)
+    if seconds:
+        registry.record_startup(prosit, seconds)
+
+
+def load_every_prosit():
+    """Load all prosits now (eager startup, and the pre-fork parent process)"""
+    for prosit in PROSIT_LOADERS:
+        ensure_loaded(prosit)
+
+
+def requires(prosit: str):
+    """Route dependency that loads a prosit's models before the handler runs"""
+
+    async def load_models():
+        if prosit in model_registry:
+            return
+        try:
+            with stage("load"):
+                await run_in_threadpool(ensure_loaded, prosit)
+        except Exception as e:
+            logger.exception("Loading %s models failed", prosit)
+            raise HTTPException(
+                status_code=503, detail=f"Models unavailable: {str(e)}"
+            )
+
+    return Depends(load_models)
+
+
+def warm_up_models():
+    """Background warm-up: load every prosit in turn"""
+    for prosit in PROSIT_LOADERS:
+        try:
+            ensure_loaded(prosit)
+        except Exception:
+            # Left unloaded: the next request for it retries (and reports a 503)
+            logger.exception("Background loading of %s models failed", prosit)
+    logger.info("Background model warm-up finished")
+
+
+@app.on_event("startup")
+async def load_all_models():
+    """Load models from Prosit 2, 3, and 5 (eagerly, lazily or in the background)"""
+    start = time.perf_counter()
+    if MODEL_LOADING == "lazy":
+        print("⏳ Lazy model loading: each prosit loads on first use")
+    elif MODEL_LOADING == "background":
+        threading.Thread(
+            target=warm_up_models, name="model-warm-up", daemon=True
+        ).start()
+        print("⏳ Loading models in the background")
+    else:
+        try:
+            load_every_prosit()
+            total = sum(
+                len(model_registry.get(prosit)["models"]) for prosit in PROSIT_LOADERS
+            )
+            print(f"✅ Total models loaded: {total}")
+        except Exception as e:
+            print(f"❌ Error loading models: {e}")
+            raise
+    if MODEL_WATCH_INTERVAL > 0:
+        model_registry.watch(MODEL_WATCH_INTERVAL)
+        print(f"👀 Watching model directories every {MODEL_WATCH_INTERVAL:g}s")
+    registry.record_startup("startup_event", time.perf_counter() - start)
 
-    except Exception as e:
-        print(f"❌ Error loading models: {e}")
-        raise
+
+@app.on_event("shutdown")
+async def shutdown_executors():
+    """Stop the inference, file I/O and scoring job worker pools"""
+    inference_pool.shutdown()
+    io_pool.shutdown()
+    job_pool.shutdown()
 
 
 # ============================================================================
@@ -362,75 +769,656 @@ def get_confidence_level(probability: float) -> str:
         return "Low"
 
 
+# Field order expected by the Prosit 2 scaler
+PROSIT2_FIELD_ORDER = [
+    "mark",
+    "gpa_y",
+    "cgpa_y",
+    "grade_point",
+    "subject_credit",
+    "cgpa_x",
+    "yeargroup",
+    "gpa_x",
+    "education_block_1_level",
+    "latest_education_level",
+    "offer_course_name",
+    "offer_type",
+    "extra_question_level_education_3",
+    "extra_question_is_alive_3",
+    "extra_question_level_education_2",
+    "education_block_2_level",
+    "extra_question_is_alive_2",
+    "extra_question_family_admission",
+    "extra_question_is_alive",
+    "extra_question_is_alive_1",
+    "academic_year_x",
+    "semester_year_x",
+    "extra_question_type_of_exam",
+    "gender",
+    "semester_year_y",
+    "grade_system",
+    "grade",
+    "academic_year_y",
+    "course_offering_plan_name",
+    "nationality",
+    "admission_year",
+    "program",
+]
+
+
 def prepare_prosit2_features(data: Prosit2Features) -> np.ndarray:
     """Convert Prosit2Features to numpy array in correct order"""
-    features = [
-        data.mark,
-        data.gpa_y,
-        data.cgpa_y,
-        data.grade_point,
-        data.subject_credit,
-        data.cgpa_x,
-        data.yeargroup,
-        data.gpa_x,
-        data.education_block_1_level,
-        data.latest_education_level,
-        data.offer_course_name,
-        data.offer_type,
-        data.extra_question_level_education_3,
-        data.extra_question_is_alive_3,
-        data.extra_question_level_education_2,
-        data.education_block_2_level,
-        data.extra_question_is_alive_2,
-        data.extra_question_family_admission,
-        data.extra_question_is_alive,
-        data.extra_question_is_alive_1,
-        data.academic_year_x,
-        data.semester_year_x,
-        data.extra_question_type_of_exam,
-        data.gender,
-        data.semester_year_y,
-        data.grade_system,
-        data.grade,
-        data.academic_year_y,
-        data.course_offering_plan_name,
-        data.nationality,
-        data.admission_year,
-        data.program,
-    ]
+    features = [getattr(data, field) for field in PROSIT2_FIELD_ORDER]
     return np.array(features).reshape(1, -1)
 
 
+def prepare_prosit2_batch(records: List[Prosit2Features]) -> np.ndarray:
+    """Convert a list of Prosit2Features to an (n, 32) float matrix"""
+    X = np.empty((len(records), len(PROSIT2_FIELD_ORDER)), dtype=np.float64)
+    for i, record in enumerate(records):
+        X[i] = [getattr(record, field) for field in PROSIT2_FIELD_ORDER]
+    return X
+
+
+def build_prosit2_index(dbscan, hierarchical) -> dict:
+    """
+    Build the out-of-sample assignment index for DBSCAN and hierarchical
+
+    Neither estimator has a predict method. DBSCAN keeps a copy of its core
+    samples (components_) in PCA space; every training row of the clustering
+    sample is a core sample, so components_ is also the embedding that
+    AgglomerativeClustering was fit on and lines up with its labels_.
+
+    - DBSCAN: a KD-tree over the core samples; a point joins the cluster of
+      its nearest core sample if that sample is within eps, else it is noise
+    - Hierarchical: one centroid per cluster; a point joins the nearest one
+    """
+    KDTree = timed_import("sklearn.neighbors").KDTree
+
+    core_samples = np.ascontiguousarray(dbscan.components_, dtype=np.float64)
+    index = {
+        "dbscan_tree": KDTree(core_samples, metric=dbscan.metric),
+        "dbscan_core_labels": dbscan.labels_[dbscan.core_sample_indices_],
+        "dbscan_eps": float(dbscan.eps),
+    }
+    index["dbscan_n_clusters"] = len(
+        set(index["dbscan_core_labels"].tolist()) - {-1}
+    )
+
+    if len(dbscan.core_sample_indices_) != len(hierarchical.labels_):
+        raise ValueError(
+            "DBSCAN core samples do not cover the hierarchical training sample; "
+            "cannot rebuild hierarchical centroids"
+        )
+    labels = hierarchical.labels_
+    clusters = np.unique(labels)
+    centroids = np.stack([core_samples[labels == k].mean(axis=0) for k in clusters])
+    index["hierarchical_clusters"] = clusters
+    index["hierarchical_centroids"] = centroids
+    index["hierarchical_centroid_sq"] = np.einsum("ij,ij->i", centroids, centroids)
+    return index
+
+
+def assign_hierarchical(index: dict, X_pca: np.ndarray) -> np.ndarray:
+    """Assign rows of X_pca to the nearest hierarchical cluster centroid"""
+    centroids = index["hierarchical_centroids"]
+    # ||x - c||^2 up to the per-row constant ||x||^2
+    distances = index["hierarchical_centroid_sq"] - 2.0 * (X_pca @ centroids.T)
+    return index["hierarchical_clusters"][np.argmin(distances, axis=1)]
+
+
+def assign_dbscan(index: dict, X_pca: np.ndarray) -> np.ndarray:
+    """Assign rows of X_pca via DBSCAN core samples within eps (-1 = outlier)"""
+    distances, nearest = index["dbscan_tree"].query(X_pca, k=1)
+    labels = index["dbscan_core_labels"][nearest[:, 0]]
+    return np.where(distances[:, 0] <= index["dbscan_eps"], labels, -1)
+
+
+def assign_kmeans(projection: dict, X_pca: np.ndarray) -> np.ndarray:
+    """Assign rows of X_pca to the nearest KMeans center"""
+    # ||x - c||^2 up to the per-row constant ||x||^2, as for hierarchical
+    distances = projection["kmeans_centers_sq"] - 2.0 * (
+        X_pca @ projection["kmeans_centers_T"]
+    )
+    return np.argmin(distances, axis=1)
+
+
+def assign_prosit2_matrix(p2: dict, algorithm: str, X_pca: np.ndarray) -> np.ndarray:
+    """Assign every row of a PCA-space matrix to a cluster"""
+    if algorithm == "kmeans" and p2["projection"]:
+        return assign_kmeans(p2["projection"], X_pca)
+    if algorithm == "dbscan":
+        return assign_dbscan(p2["index"], X_pca)
+    if algorithm == "hierarchical":
+        return assign_hierarchical(p2["index"], X_pca)
+    return p2["models"][algorithm].predict(X_pca)
+
+
+def build_prosit2_projection(scaler, pca, kmeans) -> dict:
+    """
+    Fold StandardScaler + PCA (and the KMeans assignment) into affine maps
+
+    Both transforms are affine, so for raw features x:
+
+        pca((x - mean) / scale) = x @ W + b
+
+    and since KMeans picks argmin_k ||z - c_k||^2 = argmin_k (||c_k||^2 - 2 z.c_k),
+    the whole KMeans assignment is argmin(x @ W_k + b_k) with W_k = -2 W C^T
+    and b_k = ||C||^2 - 2 b C^T.
+
+    A self-check compares both maps with the sklearn chain on synthetic rows
+    drawn from the scaler's statistics; on mismatch the fused path is
+    disabled and the sklearn chain is used instead.
+    """
+    components = pca.components_
+    if pca.whiten:
+        components = components / np.sqrt(pca.explained_variance_)[:, np.newaxis]
+
+    W = (components / scaler.scale_).T
+    b = -(scaler.mean_ / scaler.scale_ + pca.mean_) @ components.T
+
+    centers = kmeans.cluster_centers_
+    W_kmeans = -2.0 * (W @ centers.T)
+    b_kmeans = np.einsum("ij,ij->i", centers, centers) - 2.0 * (b @ centers.T)
+
+    projection = {
+        "W": np.ascontiguousarray(W),
+        "b": b,
+        "W_kmeans": np.ascontiguousarray(W_kmeans),
+        "b_kmeans": b_kmeans,
+        # KMeans from PCA space, for callers that have projected already
+        "kmeans_centers_T": np.ascontiguousarray(centers.T),
+        "kmeans_centers_sq": np.einsum("ij,ij->i", centers, centers),
+    }
+
+    rng = np.random.default_rng(0)
+    X_check = scaler.mean_ + rng.standard_normal((256, len(scaler.mean_))) * scaler.scale_
+    X_reference = pca.transform(scaler.transform(X_check))
+    fused_ok = np.allclose(X_check @ W + b, X_reference, rtol=1e-7, atol=1e-9)
+    kmeans_labels = kmeans.predict(X_reference)
+    kmeans_ok = np.array_equal(
+        np.argmin(X_check @ W_kmeans + b_kmeans, axis=1), kmeans_labels
+    ) and np.array_equal(assign_kmeans(projection, X_reference), kmeans_labels)
+    if not (fused_ok and kmeans_ok):
+        logger.error(
+            "Fused Prosit 2 projection does not match sklearn (pca=%s, kmeans=%s); "
+            "falling back to scaler.transform + pca.transform",
+            fused_ok,
+            kmeans_ok,
+        )
+        return {}
+    return projection
+
+
+def project_prosit2(p2: dict, X: np.ndarray) -> np.ndarray:
+    """Raw (n, 32) features -> (n, 10) PCA space"""
+    projection = p2["projection"]
+    if projection:
+        return X @ projection["W"] + projection["b"]
+    return p2["pca"].transform(p2["scaler"].transform(X))
+
+
+def cluster_prosit2_matrix(p2: dict, algorithm: str, X: np.ndarray) -> np.ndarray:
+    """Raw (n, 32) features -> cluster labels, timing project/predict stages"""
+    projection = p2["projection"]
+    if algorithm == "kmeans" and projection:
+        with stage("predict"):
+            scores = X @ projection["W_kmeans"] + projection["b_kmeans"]
+            return np.argmin(scores, axis=1)
+
+    with stage("project"):
+        X_pca = project_prosit2(p2, X)
+    with stage("predict"):
+        return assign_prosit2_matrix(p2, algorithm, X_pca)
+
+
+def log_cluster_debug(
+    p2: dict, algorithm: str, data: Prosit2Features, X_pca: np.ndarray, cluster: int
+):
+    """Verbose per-request clustering dump (only called at DEBUG level)"""
+    lines = [
+        f"PROSIT 2 PREDICTION - {algorithm.upper()}",
+        "Key Input Features:",
+        f"  Mark: {data.mark}",
+        f"  GPA_y: {data.gpa_y}",
+        f"  CGPA_y: {data.cgpa_y}",
+        f"  Grade Point: {data.grade_point}",
+        f"  Yeargroup: {data.yeargroup}",
+        f"PCA Transformed (first 5 components): {X_pca[0][:5]}",
+    ]
+    if algorithm == "kmeans":
+        distances = p2["models"][algorithm].transform(X_pca)[0]
+        lines.append("Distances to cluster centers:")
+        lines.extend(f"  Cluster {i}: {dist:.4f}" for i, dist in enumerate(distances))
+    lines.append(f"Predicted Cluster: {cluster}")
+    logger.debug("\n".join(lines))
+
+
+def get_prosit2_n_clusters(p2: dict, algorithm: str) -> int:
+    """Number of clusters an algorithm can assign (excluding outliers)"""
+    if algorithm == "dbscan":
+        return p2["index"]["dbscan_n_clusters"]
+    if algorithm == "hierarchical":
+        return len(p2["index"]["hierarchical_clusters"])
+    algo_key = "KMeans" if algorithm == "kmeans" else "GMM"
+    return p2["metadata"]["algorithms"][algo_key]["n_clusters"]
+
+
+# Field order expected by the Prosit 3 scaler and models
+PROSIT3_FIELD_ORDER = [
+    "mark",
+    "subject_credit",
+    "cgpa_y",
+    "gpa_y",
+    "grade_point",
+    "cgpa_x",
+    "yeargroup",
+    "gpa_x",
+    "semester_year_y",
+    "academic_year_y",
+    "grade",
+    "course_offering_plan_name",
+    "admission_year",
+    "grade_system",
+    "academic_year_x",
+    "offer_type",
+    "offer_course_name",
+    "extra_question_type_of_exam",
+    "semester_year_x",
+    "program",
+    "kmeans_cluster",
+    "hierarchical_cluster",
+    "gmm_cluster",
+]
+
+# Prosit 3 cluster feature -> the Prosit 2 algorithm that assigns it
+PROSIT3_CLUSTER_ALGORITHMS = {
+    "kmeans_cluster": "kmeans",
+    "hierarchical_cluster": "hierarchical",
+    "gmm_cluster": "gmm",
+}
+# Hierarchical clustering and the GMM were fit on a sample of the Prosit 2
+# rows, and the Prosit 3 models were trained with -1 in these two features
+# for every row outside that sample (most rows: the Prosit 3 scaler's means
+# for them are -0.86 and -0.72). Chained predictions give the models that
+# training value; the assigned clusters are only reported.
+PROSIT3_UNSAMPLED_CLUSTER = -1
+PROSIT3_SAMPLED_CLUSTER_FIELDS = ("hierarchical_cluster", "gmm_cluster")
+# Every other Prosit 3 feature is also a Prosit 2 feature: (Prosit 3
+# positions, matching Prosit 2 positions) to copy them across
+PROSIT3_SHARED_COLUMNS = tuple(
+    np.array(positions)
+    for positions in zip(
+        *(
+            (i, PROSIT2_FIELD_ORDER.index(field))
+            for i, field in enumerate(PROSIT3_FIELD_ORDER)
+            if field not in PROSIT3_CLUSTER_ALGORITHMS
+        )
+    )
+)
+
+
 def prepare_prosit3_features(data: Prosit3Features) -> np.ndarray:
     """Convert Prosit3Features to numpy array in correct order"""
-    features = [
-        data.mark,
-        data.subject_credit,
-        data.cgpa_y,
-        data.gpa_y,
-        data.grade_point,
-        data.cgpa_x,
-        data.yeargroup,
-        data.gpa_x,
-        data.semester_year_y,
-        data.academic_year_y,
-        data.grade,
-        data.course_offering_plan_name,
-        data.admission_year,
-        data.grade_system,
-        data.academic_year_x,
-        data.offer_type,
-        data.offer_course_name,
-        data.extra_question_type_of_exam,
-        data.semester_year_x,
-        data.program,
-        data.kmeans_cluster,
-        data.hierarchical_cluster,
-        data.gmm_cluster,
-    ]
+    features = [getattr(data, field) for field in PROSIT3_FIELD_ORDER]
     return np.array(features).reshape(1, -1)
 
 
+def prepare_prosit3_batch(records: List[Prosit3Features]) -> np.ndarray:
+    """Convert a list of Prosit3Features to an (n, 23) float matrix"""
+    X = np.empty((len(records), len(PROSIT3_FIELD_ORDER)), dtype=np.float64)
+    for i, record in enumerate(records):
+        X[i] = [getattr(record, field) for field in PROSIT3_FIELD_ORDER]
+    return X
+
+
+def predict_classifier_matrix(
+    model, X_scaled: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Score a scaled feature matrix with a single sklearn call
+
+    Returns (predictions, probabilities). Models without predict_proba
+    (RidgeClassifierCV) use the prediction itself as the probability,
+    matching the single-row endpoints.
+    """
+    if hasattr(model, "predict_proba"):
+        proba = model.predict_proba(X_scaled)
+        predictions = model.classes_[np.argmax(proba, axis=1)]
+        probabilities = proba[:, 1]
+    else:
+        predictions = model.predict(X_scaled)
+        probabilities = predictions.astype(np.float64)
+    return predictions.astype(int), probabilities.astype(np.float64)
+
+
+def predict_prosit3_ensemble(
+    models: dict, X_scaled: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Majority vote and mean probability across all Prosit 3 models
+
+    Each model is called once; votes and probabilities are stacked into
+    (n_models, n_rows) matrices and reduced along the model axis.
+    """
+    n_rows = X_scaled.shape[0]
+    votes = np.empty((len(models), n_rows), dtype=np.float64)
+    probabilities = np.empty((len(models), n_rows), dtype=np.float64)
+
+    for i, model in enumerate(models.values()):
+        votes[i], probabilities[i] = predict_classifier_matrix(model, X_scaled)
+
+    final_predictions = np.round(votes.mean(axis=0)).astype(int)
+    final_probabilities = probabilities.mean(axis=0)
+    return final_predictions, final_probabilities
+
+
+def compute_prosit3(
+    p3: dict, model_name: str, X: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Raw (n, 23) features -> (predictions, probabilities) for one model"""
+    linear = p3["linear"]
+    if linear is not None and model_name in linear["index"]:
+        with stage("predict"):
+            return predict_linear(linear, X, model_name)
+
+    with stage("scale"):
+        X_scaled = p3["scaler"].transform(X)
+    with stage("predict"):
+        return predict_classifier_matrix(p3["models"][model_name], X_scaled)
+
+
+def compute_prosit3_ensemble(p3: dict, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Raw (n, 23) features -> ensemble (predictions, probabilities)"""
+    linear = p3["linear"]
+    if linear is not None and len(linear["names"]) == len(p3["models"]):
+        with stage("predict"):
+            votes, probabilities = predict_linear(linear, X)
+            return np.round(votes.mean(axis=0)).astype(int), probabilities.mean(axis=0)
+
+    with stage("scale"):
+        X_scaled = p3["scaler"].transform(X)
+    with stage("predict"):
+        return predict_prosit3_ensemble(p3["models"], X_scaled)
+
+
+def chain_prosit2_features(
+    p2: dict, X: np.ndarray
+) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """
+    Raw (n, 32) Prosit 2 features -> (n, 23) Prosit 3 features
+
+    The three clusters come from one shared scale + PCA projection instead
+    of a /prosit2/cluster call (and projection) per algorithm. Only the
+    K-Means cluster is fed to Prosit 3; the hierarchical and GMM features get
+    PROSIT3_UNSAMPLED_CLUSTER, as in training. Returns the Prosit 3 matrix
+    and the assigned clusters by Prosit 3 field name.
+    """
+    with stage("project"):
+        X_pca = project_prosit2(p2, X)
+    with stage("cluster"):
+        clusters = {
+            field: assign_prosit2_matrix(p2, algorithm, X_pca).astype(np.int64)
+            for field, algorithm in PROSIT3_CLUSTER_ALGORITHMS.items()
+        }
+    X3 = np.empty((X.shape[0], len(PROSIT3_FIELD_ORDER)), dtype=np.float64)
+    to_columns, from_columns = PROSIT3_SHARED_COLUMNS
+    X3[:, to_columns] = X[:, from_columns]
+    for field, labels in clusters.items():
+        X3[:, PROSIT3_FIELD_ORDER.index(field)] = (
+            PROSIT3_UNSAMPLED_CLUSTER
+            if field in PROSIT3_SAMPLED_CLUSTER_FIELDS
+            else labels
+        )
+    return X3, clusters
+
+
+def compute_prosit5(
+    p5: dict, model_key: str, X: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Raw Prosit 5 features -> (predictions, probabilities) for one model"""
+    evaluator = p5["compiled"].get(model_key)
+    if evaluator is not None:
+        with stage("predict"):
+            return evaluator(X)
+
+    with stage("scale"):
+        X_scaled = p5["scalers"][model_key].transform(X)
+    with stage("predict"):
+        return predict_classifier_matrix(p5["models"][model_key], X_scaled)
+
+
+# Entrance exam grades map onto these scores in the Prosit 5 pipeline
+# (wassce_map, ib_map and olevel_map in scripts/generate_prosit_5_final.py)
+PROSIT5_GRADE_SCORES = (40.0, 50.0, 60.0, 65.0, 70.0, 75.0, 80.0, 85.0, 90.0, 100.0)
+
+
+def prosit5_composite_scores() -> List[float]:
+    """
+    Composite scores reachable from grade scores: the mean of math, english
+    and science (or of two when science is missing), plus every whole
+    number for composites entered by hand
+    """
+    grades = PROSIT5_GRADE_SCORES
+    composites = {float(score) for score in range(101)}
+    composites.update((a + b) / 2 for a, b in itertools.product(grades, repeat=2))
+    composites.update(
+        (a + b + c) / 3 for a, b, c in itertools.product(grades, repeat=3)
+    )
+    return sorted(composites)
+
+
+def build_prosit5_grid(p5: dict, model_key: str) -> dict:
+    """
+    Score every (math, english, composite) grid point once
+
+    Returns a dict index from feature tuple to row, plus the predictions and
+    probabilities of all rows, computed through the same path as a request.
+    """
+    grid = np.array(
+        list(
+            itertools.product(
+                PROSIT5_GRADE_SCORES, PROSIT5_GRADE_SCORES, prosit5_composite_scores()
+            )
+        )
+    )
+    predictions, probabilities = compute_prosit5(p5, model_key, grid)
+    return {
+        "index": {row: i for i, row in enumerate(map(tuple, grid.tolist()))},
+        "predictions": predictions,
+        "probabilities": probabilities,
+    }
+
+
+def lookup_prosit5_grid(p5: dict, model_key: str, X: np.ndarray):
+    """(predictions, probabilities) for an on-grid single row, else None"""
+    table = p5["grids"].get(model_key)
+    if table is None or X.shape[0] != 1:
+        return None
+    i = table["index"].get(tuple(X[0].tolist()))
+    if i is None:
+        return None
+    return table["predictions"][i : i + 1], table["probabilities"][i : i + 1]
+
+
+# Single-row scoring goes through the prediction cache (when enabled), keyed
+# by model set version so a result is never served from a replaced model
+
+
+def score_prosit3(
+    p3: dict, model_name: str, X: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    return prediction_cache.get_or_compute(
+        "prosit3",
+        model_name,
+        X,
+        lambda: compute_prosit3(p3, model_name, X),
+        version=p3["version"],
+    )
+
+
+def score_prosit3_ensemble(p3: dict, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    return prediction_cache.get_or_compute(
+        "prosit3",
+        "ensemble",
+        X,
+        lambda: compute_prosit3_ensemble(p3, X),
+        version=p3["version"],
+    )
+
+
+def score_prosit5(
+    p5: dict, model_key: str, X: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    if p5["grids"]:
+        with stage("lookup"):
+            result = lookup_prosit5_grid(p5, model_key, X)
+        if result is not None:
+            return result
+    return prediction_cache.get_or_compute(
+        "prosit5",
+        model_key,
+        X,
+        lambda: compute_prosit5(p5, model_key, X),
+        version=p5["version"],
+    )
+
+
+async def score_prosit3_row(
+    p3: dict, model_name: str, X: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Score a single row, micro-batched with concurrent requests if enabled"""
+    # A cache hit is answered here, without queueing on the inference pool
+    result = prediction_cache.lookup("prosit3", model_name, X, version=p3["version"])
+    if result is not None:
+        return result
+
+    def score(X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        if model_name == "ensemble":
+            return compute_prosit3_ensemble(p3, X)
+        return compute_prosit3(p3, model_name, X)
+
+    result = await micro_batcher.score(
+        f"prosit3/{model_name}", p3["version"], X, score
+    )
+    prediction_cache.store("prosit3", model_name, X, result, version=p3["version"])
+    return result
+
+
+async def score_prosit5_row(
+    p5: dict, model_key: str, X: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Score a single row, micro-batched with concurrent requests if enabled"""
+    if p5["grids"]:
+        # An on-grid row is a table lookup; it need not wait for a batch
+        with stage("lookup"):
+            result = lookup_prosit5_grid(p5, model_key, X)
+        if result is not None:
+            return result
+
+    result = prediction_cache.lookup("prosit5", model_key, X, version=p5["version"])
+    if result is not None:
+        return result
+
+    def score(X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        return compute_prosit5(p5, model_key, X)
+
+    result = await micro_batcher.score(f"prosit5/{model_key}", p5["version"], X, score)
+    prediction_cache.store("prosit5", model_key, X, result, version=p5["version"])
+    return result
+
+
+def prosit2_batch_response(
+    p2: dict, algorithm: str, clusters: List[int]
+) -> BatchClusterResponse:
+    return BatchClusterResponse(
+        algorithm=algorithm,
+        n_clusters=get_prosit2_n_clusters(p2, algorithm),
+        n_records=len(clusters),
+        assignments=[
+            ClusterAssignment(
+                cluster=cluster,
+                is_outlier=(algorithm == "dbscan" and cluster == -1),
+            )
+            for cluster in clusters
+        ],
+        model_version=p2["version"],
+    )
+
+
+def prosit3_batch_response(
+    p3: dict, model_used: str, predictions: np.ndarray, probabilities: np.ndarray
+) -> BatchPredictionResponse:
+    confidences = get_confidence_levels(probabilities)
+    return BatchPredictionResponse(
+        model_used=model_used,
+        n_records=len(predictions),
+        predictions=[
+            BatchPredictionItem(probation_risk=risk, probability=prob, confidence=conf)
+            for risk, prob, conf in zip(
+                predictions.tolist(), probabilities.tolist(), confidences
+            )
+        ],
+        model_version=p3["version"],
+    )
+
+
+# Request body of the raw feature vector endpoints (parsed by VectorSchema,
+# not by FastAPI, so it is only declared for the docs)
+FEATURE_VECTOR_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/json": {"schema": FeatureVectorRequest.model_json_schema()}
+        },
+    }
+}
+
+
+# Request body of the columnar bulk endpoints (read by columnar.read_upload)
+BINARY_SCHEMA = {"type": "string", "format": "binary"}
+COLUMNAR_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            ARROW_STREAM: {"schema": BINARY_SCHEMA},
+            ARROW_FILE: {"schema": BINARY_SCHEMA},
+            NPY: {"schema": BINARY_SCHEMA},
+            "multipart/form-data": {
+                "schema": {"type": "object", "properties": {"file": BINARY_SCHEMA}}
+            },
+        },
+    }
+}
+
+
+# Request body of the NDJSON streaming endpoints (read by ndjson_stream)
+NDJSON_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/x-ndjson": {
+                "schema": {
+                    "type": "string",
+                    "description": "One named-field record per line",
+                }
+            }
+        },
+    }
+}
+
+
+def get_confidence_levels(probabilities: np.ndarray) -> List[str]:
+    """Vectorized get_confidence_level for an array of probabilities"""
+    p = np.asarray(probabilities, dtype=np.float64)
+    levels = np.where(
+        (p < 0.3) | (p > 0.7),
+        "High",
+        np.where((p < 0.4) | (p > 0.6), "Medium", "Low"),
+    )
+    return levels.tolist()
+
+
 # ============================================================================
 # ROOT & HEALTH ENDPOINTS
 # ============================================================================
@@ -439,6 +1427,9 @@ def prepare_prosit3_features(data: Prosit3Features) -> np.ndarray:
 @app.get("/", tags=["Health"])
 async def root():
     """API overview and health check"""
+    prosit2_models = model_registry.sets.get("prosit2", {}).get("models", {})
+    prosit3_models = model_registry.sets.get("prosit3", {}).get("models", {})
+    prosit5_models = model_registry.sets.get("prosit5", {}).get("models", {})
     return {
         "status": "healthy",
         "title": "Student Analytics API",
@@ -460,6 +1451,11 @@ async def root():
                 "models": list(prosit5_models.keys()),
             },
         },
+        "model_loading": {
+            "mode": MODEL_LOADING,
+            "loaded": model_registry.loaded(),
+            "versions": model_registry.versions(),
+        },
         "endpoints": {
             "prosit_2": "/prosit2/*",
             "prosit_3": "/prosit3/*",
@@ -469,140 +1465,311 @@ async def root():
     }
 
 
-# ============================================================================
-# PROSIT 2 ENDPOINTS - CLUSTERING
-# ============================================================================
-
-
-@app.post(
-    "/prosit2/cluster/{algorithm}",
-    response_model=ClusterResponse,
-    tags=["Prosit 2 - Clustering"],
-)
-async def assign_cluster(
-    algorithm: Literal["kmeans", "dbscan", "hierarchical", "gmm"], data: Prosit2Features
-):
+@app.get("/metrics", tags=["Health"])
+async def get_metrics():
     """
-    Assign a cluster to new student data using specified algorithm
+    Prometheus metrics: per-endpoint and per-stage latency histograms,
+    request/error counts and model-load timings
+    """
+    return Response(content=registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
 
-    - **algorithm**: One of: kmeans, dbscan, hierarchical, gmm
-    - **data**: Student features (32 features)
 
-    Note: For DBSCAN and Hierarchical, we assign to nearest cluster centroid
+@app.get("/memory", tags=["Health"])
+async def get_memory():
     """
-    if algorithm not in prosit2_models:
+    Resident memory of the worker serving this request, split into pages
+    shared with other processes (memory-mapped artifacts) and private pages
+    """
+    try:
+        usage = process_memory()
+    except OSError:
         raise HTTPException(
-            status_code=404, detail=f"Algorithm '{algorithm}' not found"
+            status_code=501, detail="Memory report requires /proc (Linux)"
         )
+    return {"pid": os.getpid(), "mmap_models": MMAP_ENABLED, **usage}
 
-    try:
-        # Prepare and scale features
-        X = prepare_prosit2_features(data)
-
-        # DEBUG: Log key input features
-        print(f"\n{'='*60}")
-        print(f"PROSIT 2 PREDICTION - {algorithm.upper()}")
-        print(f"{'='*60}")
-        print(f"Key Input Features:")
-        print(f"  Mark: {data.mark}")
-        print(f"  GPA_y: {data.gpa_y}")
-        print(f"  CGPA_y: {data.cgpa_y}")
-        print(f"  Grade Point: {data.grade_point}")
-        print(f"  Yeargroup: {data.yeargroup}")
-
-        X_scaled = prosit2_scaler.transform(X)
-        X_pca = prosit2_pca.transform(X_scaled)
-
-        # DEBUG: Log PCA values
-        print(f"\nPCA Transformed (first 5 components): {X_pca[0][:5]}")
-
-        # Get model
-        model = prosit2_models[algorithm]
-
-        # Predict cluster based on algorithm type
-        if algorithm == "gmm":
-            cluster = model.predict(X_pca)[0]
-        elif algorithm == "kmeans":
-            cluster = model.predict(X_pca)[0]
-            # DEBUG: Log distances to each cluster center
-            distances = model.transform(X_pca)[0]
-            print(f"\nDistances to cluster centers:")
-            for i, dist in enumerate(distances):
-                print(f"  Cluster {i}: {dist:.4f}")
-            print(f"\nPredicted Cluster: {cluster}")
-        elif algorithm in ["dbscan", "hierarchical"]:
-            # These algorithms don't have predict method
-            # We'll assign to nearest cluster based on stored labels
-            # For now, return a message that this requires fitting on full dataset
-            labels_file = MODELS_DIR / "prosit 2" / f"{algorithm}_labels.pkl"
-            labels = joblib.load(labels_file)
-
-            # Get unique clusters
-            unique_clusters = sorted(set(labels))
-            if -1 in unique_clusters:
-                unique_clusters.remove(-1)  # Remove outlier label
-
-            # For simplicity, assign to cluster 0 (would need full dataset for proper assignment)
-            cluster = unique_clusters[0] if unique_clusters else 0
-
-            print(f"\nPredicted Cluster: {cluster} (default for {algorithm})")
-            print(f"{'='*60}\n")
-
-            return ClusterResponse(
-                cluster=int(cluster),
-                algorithm=algorithm,
-                n_clusters=len(unique_clusters),
-                is_outlier=False,
-            )
 
-        # Get cluster info
-        if algorithm == "kmeans":
-            algo_key = "KMeans"
-        elif algorithm == "gmm":
-            algo_key = "GMM"
-        else:
-            algo_key = algorithm.upper()
+@app.get("/startup", tags=["Health"])
+async def get_startup_timings():
+    """
+    Startup timing breakdown in seconds: module imports, each prosit's
+    loading, deferred imports and every model artifact
+    """
+    return {
+        "model_loading": MODEL_LOADING,
+        "loaded": model_registry.loaded(),
+        **registry.startup_report(),
+    }
 
-        n_clusters = prosit2_metadata["algorithms"][algo_key]["n_clusters"]
-        is_outlier = (cluster == -1) if algorithm == "dbscan" else False
 
-        print(f"{'='*60}\n")
+# ============================================================================
+# ADMIN ENDPOINTS
+# ============================================================================
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Admin routes are disabled without API_ADMIN_TOKEN and check X-Admin-Token"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(
+            status_code=403,
+            detail="Admin endpoints are disabled (set API_ADMIN_TOKEN)",
+        )
+    if not hmac.compare_digest((x_admin_token or "").encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+@app.post(
+    "/admin/models/reload", tags=["Admin"], dependencies=[Depends(require_admin)]
+)
+async def reload_models(
+    prosit: Optional[Literal["prosit2", "prosit3", "prosit5"]] = None
+):
+    """
+    Hot-reload model sets from the models directory
+
+    The new models are loaded and warmed up in a background thread while the
+    current ones keep serving, then swapped in atomically. Reloads every
+    loaded prosit, or only **prosit**. Only the worker handling this request
+    reloads; with several workers, set API_MODEL_WATCH_INTERVAL instead.
+    """
+    results, failed = {}, False
+    for name in [prosit] if prosit else model_registry.loaded():
+        previous = model_registry.sets.get(name)
+        previous_version = previous["version"] if previous else None
+        start = time.perf_counter()
+        try:
+            model_set = await run_in_threadpool(model_registry.reload, name)
+        except Exception as e:
+            logger.exception("Reloading %s models failed", name)
+            failed = True
+            results[name] = {"version": previous_version, "error": str(e)}
+            continue
+        results[name] = {
+            "previous_version": previous_version,
+            "version": model_set["version"],
+            "seconds": round(time.perf_counter() - start, 3),
+        }
+
+    return JSONResponse(
+        status_code=500 if failed else 200,
+        content={"pid": os.getpid(), "reloaded": results},
+    )
+
+
+# ============================================================================
+# PROSIT 2 ENDPOINTS - CLUSTERING
+# ============================================================================
+
+
+@app.post(
+    "/prosit2/cluster/{algorithm}",
+    response_model=ClusterResponse,
+    tags=["Prosit 2 - Clustering"],
+    dependencies=[requires("prosit2")],
+)
+@offload(inference_pool)
+def assign_cluster(
+    algorithm: Literal["kmeans", "dbscan", "hierarchical", "gmm"], data: Prosit2Features
+):
+    """
+    Assign a cluster to new student data using specified algorithm
+
+    - **algorithm**: One of: kmeans, dbscan, hierarchical, gmm
+    - **data**: Student features (32 features)
+
+    Note: DBSCAN assigns via the nearest training core sample within eps
+    (otherwise the point is an outlier); Hierarchical assigns to the nearest
+    cluster centroid
+    """
+    p2 = model_registry.get("prosit2")
+    if algorithm not in p2["models"]:
+        raise HTTPException(
+            status_code=404, detail=f"Algorithm '{algorithm}' not found"
+        )
+
+    try:
+        # Prepare and scale features
+        with stage("features"):
+            X = prepare_prosit2_features(data)
+
+        cluster = int(cluster_prosit2_matrix(p2, algorithm, X)[0])
+
+        if logger.isEnabledFor(logging.DEBUG):
+            log_cluster_debug(p2, algorithm, data, project_prosit2(p2, X), cluster)
+        logger.info("Prosit 2 %s: assigned cluster %d", algorithm, cluster)
+
+        n_clusters = get_prosit2_n_clusters(p2, algorithm)
+        is_outlier = (cluster == -1) if algorithm == "dbscan" else False
 
         return ClusterResponse(
-            cluster=int(cluster),
+            cluster=cluster,
             algorithm=algorithm,
             n_clusters=n_clusters,
             is_outlier=is_outlier,
+            model_version=p2["version"],
+        )
+
+    except Exception as e:
+        logger.exception("Prosit 2 %s clustering failed", algorithm)
+        raise HTTPException(status_code=500, detail=f"Clustering error: {str(e)}")
+
+
+@app.post(
+    "/prosit2/cluster/{algorithm}/batch",
+    response_model=BatchClusterResponse,
+    tags=["Prosit 2 - Clustering"],
+    dependencies=[requires("prosit2")],
+)
+@offload(inference_pool)
+def assign_cluster_batch(
+    algorithm: Literal["kmeans", "dbscan", "hierarchical", "gmm"],
+    batch: Prosit2BatchRequest,
+):
+    """Assign clusters to many students in one request"""
+    p2 = model_registry.get("prosit2")
+    if algorithm not in p2["models"]:
+        raise HTTPException(
+            status_code=404, detail=f"Algorithm '{algorithm}' not found"
+        )
+
+    try:
+        with stage("features"):
+            X = prepare_prosit2_batch(batch.records)
+        clusters = cluster_prosit2_matrix(p2, algorithm, X).tolist()
+        return prosit2_batch_response(p2, algorithm, clusters)
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Clustering error: {str(e)}")
+
+
+@app.post(
+    "/prosit2/cluster/{algorithm}/vector",
+    response_model=BatchClusterResponse,
+    tags=["Prosit 2 - Clustering"],
+    dependencies=[requires("prosit2")],
+    openapi_extra=FEATURE_VECTOR_BODY,
+)
+async def assign_cluster_vector(
+    algorithm: Literal["kmeans", "dbscan", "hierarchical", "gmm"], request: Request
+):
+    """
+    Assign clusters to raw feature vectors
+
+    Takes {"features": [...]} (one student) or {"features": [[...], ...]}
+    with the 32 values in /prosit2/features order, skipping per-field
+    Pydantic validation; bounds are checked on the whole matrix at once
+    """
+    p2 = model_registry.get("prosit2")
+    if algorithm not in p2["models"]:
+        raise HTTPException(
+            status_code=404, detail=f"Algorithm '{algorithm}' not found"
         )
+    body = await request.body()
+    return await inference_pool.run(cluster_prosit2_vectors, p2, algorithm, body)
 
+
+def cluster_prosit2_vectors(
+    p2: dict, algorithm: str, body: bytes
+) -> BatchClusterResponse:
+    with stage("features"):
+        X = p2["vectors"].parse(body)
+    try:
+        clusters = cluster_prosit2_matrix(p2, algorithm, X).tolist()
+        return prosit2_batch_response(p2, algorithm, clusters)
     except Exception as e:
-        print(f"ERROR: {str(e)}")
-        print(f"{'='*60}\n")
         raise HTTPException(status_code=500, detail=f"Clustering error: {str(e)}")
 
 
-@app.get("/prosit2/models/info", tags=["Prosit 2 - Clustering"])
+@app.post(
+    "/prosit2/cluster/{algorithm}/bulk",
+    response_class=Response,
+    tags=["Prosit 2 - Clustering"],
+    dependencies=[requires("prosit2")],
+    openapi_extra=COLUMNAR_BODY,
+)
+async def assign_cluster_bulk(
+    algorithm: Literal["kmeans", "dbscan", "hierarchical", "gmm"], request: Request
+):
+    """
+    Assign clusters to an Arrow IPC or .npy table of students
+
+    Columns are matched to /prosit2/features by name (feature_names.pkl or
+    Prosit2Features field names); the response is a table in the same
+    format with `cluster` and `is_outlier` columns
+    """
+    p2 = model_registry.get("prosit2")
+    if algorithm not in p2["models"]:
+        raise HTTPException(
+            status_code=404, detail=f"Algorithm '{algorithm}' not found"
+        )
+    upload = await read_upload(request)
+    return await inference_pool.run(cluster_prosit2_columnar, p2, algorithm, upload)
+
+
+def cluster_prosit2_columnar(
+    p2: dict, algorithm: str, upload: ColumnarUpload
+) -> Response:
+    with stage("features"):
+        X = upload.decode(p2["vectors"])
+    try:
+        clusters = cluster_prosit2_matrix(p2, algorithm, X).astype(np.int64)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Clustering error: {str(e)}")
+    return upload.respond(
+        {
+            "cluster": clusters,
+            "is_outlier": (clusters == -1) & (algorithm == "dbscan"),
+        },
+        {"X-Model-Used": algorithm, "X-Model-Version": p2["version"]},
+    )
+
+
+@app.get(
+    "/prosit2/models/info",
+    tags=["Prosit 2 - Clustering"],
+    dependencies=[requires("prosit2")],
+)
 async def get_prosit2_info():
     """Get information about Prosit 2 clustering models"""
+    p2 = model_registry.get("prosit2")
+    metadata = p2["metadata"]
     return {
-        "algorithms": list(prosit2_models.keys()),
-        "n_features": prosit2_metadata["n_features"],
-        "n_samples": prosit2_metadata["n_samples"],
-        "scaler_type": prosit2_metadata["scaler_type"],
-        "pca_components": prosit2_metadata["pca_components"],
-        "algorithm_details": prosit2_metadata["algorithms"],
+        "algorithms": list(p2["models"].keys()),
+        "n_features": metadata["n_features"],
+        "n_samples": metadata["n_samples"],
+        "scaler_type": metadata["scaler_type"],
+        "pca_components": metadata["pca_components"],
+        "algorithm_details": metadata["algorithms"],
+        "model_version": p2["version"],
     }
 
 
+@app.get("/prosit2/features", tags=["Prosit 2 - Clustering"])
+@offload(io_pool)
+def get_prosit2_features(request: Request):
+    """Get the ordered feature list used by the raw vector endpoint"""
+    features_file = MODELS_DIR / "prosit 2" / "feature_names.pkl"
+
+    def build():
+        feature_names = joblib.load(features_file)
+        return {"feature_count": len(feature_names), "features": feature_names}
+
+    return results_cache.respond(request, "prosit2_features", [features_file], build)
+
+
 @app.get("/prosit2/results/metrics", tags=["Prosit 2 - Clustering"])
-async def get_prosit2_metrics():
+@offload(io_pool)
+def get_prosit2_metrics(request: Request):
     """Get clustering performance metrics"""
-    try:
-        metrics_file = RESULTS_DIR / "prosit 2" / "clustering_metrics.csv"
-        df = pd.read_csv(metrics_file)
+    metrics_file = RESULTS_DIR / "prosit 2" / "clustering_metrics.csv"
+
+    def build():
+        pd = timed_import("pandas")
         # Fill NaN values with empty string for JSON serialization
-        df = df.fillna("")
-        return df.to_dict(orient="records")
+        return pd.read_csv(metrics_file).fillna("").to_dict(orient="records")
+
+    try:
+        return results_cache.respond(request, "prosit2_metrics", [metrics_file], build)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error loading metrics: {str(e)}")
 
@@ -616,48 +1783,60 @@ async def get_prosit2_metrics():
     "/prosit3/predict/ensemble",
     response_model=PredictionResponse,
     tags=["Prosit 3 - Probation Risk"],
+    dependencies=[requires("prosit3")],
 )
 async def predict_ensemble(student_data: Prosit3Features):
     """Make prediction using ensemble voting (majority vote from all models)"""
+    p3 = model_registry.get("prosit3")
     try:
-        X = prepare_prosit3_features(student_data)
-        X_scaled = prosit3_scaler.transform(X)
-
-        predictions = []
-        probabilities = []
-
-        for model in prosit3_models.values():
-            pred = model.predict(X_scaled)[0]
-            predictions.append(pred)
-
-            # Only use probability if model supports it
-            if hasattr(model, "predict_proba"):
-                prob = model.predict_proba(X_scaled)[0][1]
-                probabilities.append(prob)
-            else:
-                # For models without predict_proba, use prediction as probability
-                probabilities.append(float(pred))
-
-        final_prediction = int(np.round(np.mean(predictions)))
-        final_probability = float(np.mean(probabilities))
+        with stage("features"):
+            X = prepare_prosit3_features(student_data)
+        predictions, probabilities = await score_prosit3_row(p3, "ensemble", X)
+        final_probability = float(probabilities[0])
 
         return PredictionResponse(
-            probation_risk=final_prediction,
+            probation_risk=int(predictions[0]),
             probability=final_probability,
             model_used="ensemble_voting",
             confidence=get_confidence_level(final_probability),
+            model_version=p3["version"],
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Ensemble prediction error: {str(e)}"
         )
 
 
+@app.post(
+    "/prosit3/predict/ensemble/batch",
+    response_model=BatchPredictionResponse,
+    tags=["Prosit 3 - Probation Risk"],
+    dependencies=[requires("prosit3")],
+)
+@offload(inference_pool)
+def predict_ensemble_batch(batch: Prosit3BatchRequest):
+    """Ensemble voting for many students in one request"""
+    p3 = model_registry.get("prosit3")
+    try:
+        with stage("features"):
+            X = prepare_prosit3_batch(batch.records)
+        predictions, probabilities = score_prosit3_ensemble(p3, X)
+        return prosit3_batch_response(p3, "ensemble_voting", predictions, probabilities)
+
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Ensemble batch prediction error: {str(e)}"
+        )
+
+
 @app.post(
     "/prosit3/predict/{model_name}",
     response_model=PredictionResponse,
     tags=["Prosit 3 - Probation Risk"],
+    dependencies=[requires("prosit3")],
 )
 async def predict_probation_risk(model_name: str, student_data: Prosit3Features):
     """
@@ -667,55 +1846,371 @@ async def predict_probation_risk(model_name: str, student_data: Prosit3Features)
                       elastic_net_logistic, random_forest, gradient_boosting
     - **student_data**: Student features (23 features including cluster assignments)
     """
-    if model_name not in prosit3_models:
+    p3 = model_registry.get("prosit3")
+    if model_name not in p3["models"]:
         raise HTTPException(
             status_code=404,
-            detail=f"Model '{model_name}' not found. Available: {list(prosit3_models.keys())}",
+            detail=f"Model '{model_name}' not found. Available: {list(p3['models'].keys())}",
         )
 
     try:
-        # Prepare and scale features
-        X = prepare_prosit3_features(student_data)
-        X_scaled = prosit3_scaler.transform(X)
-
-        # Get model and predict
-        model = prosit3_models[model_name]
-        prediction = model.predict(X_scaled)[0]
-
-        # Handle probability prediction
-        if hasattr(model, "predict_proba"):
-            probability = model.predict_proba(X_scaled)[0][1]
-        else:
-            # For models without predict_proba, use prediction as probability
-            probability = float(prediction)
+        # Prepare features, then scale and predict
+        with stage("features"):
+            X = prepare_prosit3_features(student_data)
+        predictions, probabilities = await score_prosit3_row(p3, model_name, X)
+        probability = float(probabilities[0])
 
         return PredictionResponse(
-            probation_risk=int(prediction),
-            probability=float(probability),
+            probation_risk=int(predictions[0]),
+            probability=probability,
             model_used=model_name,
             confidence=get_confidence_level(probability),
+            model_version=p3["version"],
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
+
+
+@app.post(
+    "/prosit3/predict/{model_name}/batch",
+    response_model=BatchPredictionResponse,
+    tags=["Prosit 3 - Probation Risk"],
+    dependencies=[requires("prosit3")],
+)
+@offload(inference_pool)
+def predict_probation_risk_batch(model_name: str, batch: Prosit3BatchRequest):
+    """
+    Predict probation risk for many students in one request
+
+    Builds a single (n, 23) matrix and scores it in one pass (one matmul
+    for the compiled linear models), instead of one HTTP round-trip per
+    student.
+
+    - **model_name**: Any model accepted by /prosit3/predict/{model_name}
+    - **batch**: {"records": [...]} with one Prosit3Features object per student
+    """
+    p3 = model_registry.get("prosit3")
+    if model_name not in p3["models"]:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Model '{model_name}' not found. Available: {list(p3['models'].keys())}",
+        )
+
+    try:
+        with stage("features"):
+            X = prepare_prosit3_batch(batch.records)
+        predictions, probabilities = score_prosit3(p3, model_name, X)
+        return prosit3_batch_response(p3, model_name, predictions, probabilities)
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Batch prediction error: {str(e)}")
+
+
+@app.post(
+    "/prosit3/predict/{model_name}/vector",
+    response_model=BatchPredictionResponse,
+    tags=["Prosit 3 - Probation Risk"],
+    dependencies=[requires("prosit3")],
+    openapi_extra=FEATURE_VECTOR_BODY,
+)
+async def predict_probation_risk_vector(model_name: str, request: Request):
+    """
+    Predict probation risk for raw feature vectors
+
+    Takes {"features": [...]} (one student) or {"features": [[...], ...]}
+    with the 23 values in /prosit3/features order, skipping per-field
+    Pydantic validation; bounds are checked on the whole matrix at once.
+
+    - **model_name**: Any model accepted by /prosit3/predict/{model_name},
+      or "ensemble"
+    """
+    p3 = model_registry.get("prosit3")
+    if model_name != "ensemble" and model_name not in p3["models"]:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Model '{model_name}' not found. Available: {list(p3['models'].keys())}",
+        )
+    body = await request.body()
+    return await inference_pool.run(score_prosit3_vectors, p3, model_name, body)
+
+
+def score_prosit3_vectors(
+    p3: dict, model_name: str, body: bytes
+) -> BatchPredictionResponse:
+    with stage("features"):
+        X = p3["vectors"].parse(body)
+    try:
+        if model_name == "ensemble":
+            predictions, probabilities = score_prosit3_ensemble(p3, X)
+            return prosit3_batch_response(
+                p3, "ensemble_voting", predictions, probabilities
+            )
+        predictions, probabilities = score_prosit3(p3, model_name, X)
+        return prosit3_batch_response(p3, model_name, predictions, probabilities)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
+
+
+@app.post(
+    "/prosit3/predict/{model_name}/bulk",
+    response_class=Response,
+    tags=["Prosit 3 - Probation Risk"],
+    dependencies=[requires("prosit3")],
+    openapi_extra=COLUMNAR_BODY,
+)
+async def predict_probation_risk_bulk(model_name: str, request: Request):
+    """
+    Predict probation risk for an Arrow IPC or .npy table of students
+
+    Columns are matched to /prosit3/features by name; the response is a
+    table in the same format with `probation_risk` and `probability` columns.
+
+    - **model_name**: Any model accepted by /prosit3/predict/{model_name},
+      or "ensemble"
+    """
+    p3 = model_registry.get("prosit3")
+    if model_name != "ensemble" and model_name not in p3["models"]:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Model '{model_name}' not found. Available: {list(p3['models'].keys())}",
         )
+    upload = await read_upload(request)
+    return await inference_pool.run(score_prosit3_columnar, p3, model_name, upload)
 
+
+def score_prosit3_columnar(
+    p3: dict, model_name: str, upload: ColumnarUpload
+) -> Response:
+    with stage("features"):
+        X = upload.decode(p3["vectors"])
+    try:
+        if model_name == "ensemble":
+            model_name = "ensemble_voting"
+            predictions, probabilities = score_prosit3_ensemble(p3, X)
+        else:
+            predictions, probabilities = score_prosit3(p3, model_name, X)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
+    return upload.respond(
+        {
+            "probation_risk": np.asarray(predictions, dtype=np.int64),
+            "probability": np.asarray(probabilities, dtype=np.float64),
+        },
+        {"X-Model-Used": model_name, "X-Model-Version": p3["version"]},
+    )
+
+
+@app.post(
+    "/prosit3/predict/{model_name}/stream",
+    tags=["Prosit 3 - Probation Risk"],
+    dependencies=[requires("prosit3")],
+    openapi_extra=NDJSON_BODY,
+)
+async def predict_probation_risk_stream(
+    model_name: str,
+    request: Request,
+    chunk_rows: int = Query(STREAM_CHUNK_ROWS, ge=1, le=MAX_CHUNK_ROWS),
+):
+    """
+    Predict probation risk for an NDJSON stream of students
 
+    Each line is a Prosit3Features object (optionally with an "id"). Records
+    are scored in chunks of chunk_rows while the upload is still arriving,
+    and one result line per record is streamed back, followed by a summary.
 
-@app.get("/prosit3/models/info", tags=["Prosit 3 - Probation Risk"])
+    - **model_name**: Any model accepted by /prosit3/predict/{model_name},
+      or "ensemble"
+    """
+    p3 = model_registry.get("prosit3")
+    if model_name != "ensemble" and model_name not in p3["models"]:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Model '{model_name}' not found. Available: {list(p3['models'].keys())}",
+        )
+
+    def score(X: np.ndarray) -> Dict[str, list]:
+        if model_name == "ensemble":
+            predictions, probabilities = score_prosit3_ensemble(p3, X)
+        else:
+            predictions, probabilities = score_prosit3(p3, model_name, X)
+        return {
+            "probation_risk": np.asarray(predictions).tolist(),
+            "probability": np.asarray(probabilities).tolist(),
+            "confidence": get_confidence_levels(probabilities),
+        }
+
+    return ndjson_response(
+        request,
+        p3["vectors"],
+        score,
+        chunk_rows,
+        "ensemble_voting" if model_name == "ensemble" else model_name,
+        p3["version"],
+    )
+
+
+@app.get(
+    "/prosit3/models/info",
+    tags=["Prosit 3 - Probation Risk"],
+    dependencies=[requires("prosit3")],
+)
 async def get_prosit3_info():
     """Get information about Prosit 3 models"""
+    p3 = model_registry.get("prosit3")
+    metadata = p3["metadata"]
     return {
-        "available_models": list(prosit3_models.keys()),
-        "n_features": prosit3_metadata["n_features"],
-        "target_variable": prosit3_metadata["target_variable"],
-        "scaler_type": prosit3_metadata["scaler_type"],
+        "available_models": list(p3["models"].keys()),
+        "n_features": metadata["n_features"],
+        "target_variable": metadata["target_variable"],
+        "scaler_type": metadata["scaler_type"],
+        "model_version": p3["version"],
     }
 
 
 @app.get("/prosit3/features", tags=["Prosit 3 - Probation Risk"])
-async def get_prosit3_features():
+@offload(io_pool)
+def get_prosit3_features(request: Request):
     """Get list of required features for Prosit 3"""
-    feature_names = joblib.load(MODELS_DIR / "prosit 3" / "feature_names.pkl")
-    return {"feature_count": len(feature_names), "features": feature_names}
+    features_file = MODELS_DIR / "prosit 3" / "feature_names.pkl"
+
+    def build():
+        feature_names = joblib.load(features_file)
+        return {"feature_count": len(feature_names), "features": feature_names}
+
+    return results_cache.respond(request, "prosit3_features", [features_file], build)
+
+
+# ============================================================================
+# CHAINED ENDPOINTS - PROSIT 2 CLUSTERS INTO PROSIT 3 RISK
+# ============================================================================
+
+
+def score_prosit3_chained(p2: dict, p3: dict, model_name: str, X: np.ndarray):
+    """Raw Prosit 2 features -> (model used, predictions, probabilities, clusters)"""
+    X3, clusters = chain_prosit2_features(p2, X)
+    if model_name == "ensemble":
+        predictions, probabilities = score_prosit3_ensemble(p3, X3)
+        return "ensemble_voting", predictions, probabilities, clusters
+    predictions, probabilities = score_prosit3(p3, model_name, X3)
+    return model_name, predictions, probabilities, clusters
+
+
+@app.post(
+    "/prosit3/predict/{model_name}/chained",
+    response_model=ChainedPredictionResponse,
+    tags=["Prosit 3 - Probation Risk"],
+    dependencies=[requires("prosit2"), requires("prosit3")],
+)
+@offload(inference_pool)
+def predict_probation_risk_chained(model_name: str, student_data: Prosit2Features):
+    """
+    Predict probation risk from raw features, clustering them first
+
+    Takes the 32 Prosit 2 features (which include every non-cluster Prosit 3
+    feature). The K-Means, hierarchical and GMM clusters are assigned from a
+    single scale + PCA pass, in place of three /prosit2/cluster calls. The
+    K-Means cluster is fed to the Prosit 3 model; hierarchical_cluster and
+    gmm_cluster get -1, the value most training rows had (both clusterings
+    were fit on a sample). The result equals /prosit3/predict on the same
+    features with those three cluster values.
+
+    - **model_name**: Any model accepted by /prosit3/predict/{model_name},
+      or "ensemble"
+    """
+    p2 = model_registry.get("prosit2")
+    p3 = model_registry.get("prosit3")
+    if model_name != "ensemble" and model_name not in p3["models"]:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Model '{model_name}' not found. Available: {list(p3['models'].keys())}",
+        )
+
+    try:
+        with stage("features"):
+            X = prepare_prosit2_features(student_data)
+        model_used, predictions, probabilities, clusters = score_prosit3_chained(
+            p2, p3, model_name, X
+        )
+        probability = float(probabilities[0])
+
+        return ChainedPredictionResponse(
+            probation_risk=int(predictions[0]),
+            probability=probability,
+            model_used=model_used,
+            confidence=get_confidence_level(probability),
+            model_version=p3["version"],
+            clusters=ChainedClusters(
+                **{field: int(labels[0]) for field, labels in clusters.items()}
+            ),
+            prosit2_version=p2["version"],
+        )
+
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Chained prediction error: {str(e)}"
+        )
+
+
+@app.post(
+    "/prosit3/predict/{model_name}/chained/batch",
+    response_model=ChainedBatchPredictionResponse,
+    tags=["Prosit 3 - Probation Risk"],
+    dependencies=[requires("prosit2"), requires("prosit3")],
+)
+@offload(inference_pool)
+def predict_probation_risk_chained_batch(
+    model_name: str, batch: Prosit2BatchRequest
+):
+    """
+    Chained cluster assignment and probation risk for many students
+
+    - **model_name**: Any model accepted by /prosit3/predict/{model_name},
+      or "ensemble"
+    - **batch**: {"records": [...]} with one Prosit2Features object per student
+    """
+    p2 = model_registry.get("prosit2")
+    p3 = model_registry.get("prosit3")
+    if model_name != "ensemble" and model_name not in p3["models"]:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Model '{model_name}' not found. Available: {list(p3['models'].keys())}",
+        )
+
+    try:
+        with stage("features"):
+            X = prepare_prosit2_batch(batch.records)
+        model_used, predictions, probabilities, clusters = score_prosit3_chained(
+            p2, p3, model_name, X
+        )
+        confidences = get_confidence_levels(probabilities)
+        columns = {field: labels.tolist() for field, labels in clusters.items()}
+        return ChainedBatchPredictionResponse(
+            model_used=model_used,
+            n_records=len(predictions),
+            predictions=[
+                ChainedBatchPredictionItem(
+                    probation_risk=risk,
+                    probability=prob,
+                    confidence=conf,
+                    clusters=ChainedClusters(
+                        **{field: labels[i] for field, labels in columns.items()}
+                    ),
+                )
+                for i, (risk, prob, conf) in enumerate(
+                    zip(predictions.tolist(), probabilities.tolist(), confidences)
+                )
+            ],
+            model_version=p3["version"],
+            prosit2_version=p2["version"],
+        )
+
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Chained batch prediction error: {str(e)}"
+        )
 
 
 # ============================================================================
@@ -727,6 +2222,7 @@ async def get_prosit3_features():
     "/prosit5/predict/first-year-struggle",
     response_model=Prosit5Response,
     tags=["Prosit 5 - Predictions"],
+    dependencies=[requires("prosit5")],
 )
 async def predict_first_year_struggle(data: Prosit5Q1Features):
     """
@@ -734,13 +2230,13 @@ async def predict_first_year_struggle(data: Prosit5Q1Features):
 
     Based on entrance exam scores (math, english, composite)
     """
+    p5 = model_registry.get("prosit5")
     try:
         model_key = "q1_first_year_struggle"
-        X = np.array([[data.math_score, data.english_score, data.composite_score]])
-        X_scaled = prosit5_scalers[model_key].transform(X)
-
-        prediction = prosit5_models[model_key].predict(X_scaled)[0]
-        probability = prosit5_models[model_key].predict_proba(X_scaled)[0][1]
+        with stage("features"):
+            X = np.array([[data.math_score, data.english_score, data.composite_score]])
+        predictions, probabilities = await score_prosit5_row(p5, model_key, X)
+        prediction, probability = predictions[0], probabilities[0]
 
         interpretation = (
             "Student likely to struggle (GPA < 2.5)"
@@ -754,8 +2250,11 @@ async def predict_first_year_struggle(data: Prosit5Q1Features):
             model_used=model_key,
             confidence=get_confidence_level(probability),
             interpretation=interpretation,
+            model_version=p5["version"],
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
 
@@ -803,6 +2302,7 @@ async def get_prosit3_metrics():
     "/prosit5/predict/ajc",
     response_model=Prosit5Response,
     tags=["Prosit 5 - Predictions"],
+    dependencies=[requires("prosit5")],
 )
 async def predict_ajc(data: Prosit5Q2Features):
     """
@@ -810,13 +2310,13 @@ async def predict_ajc(data: Prosit5Q2Features):
 
     Based on entrance exam scores (math, english, composite)
     """
+    p5 = model_registry.get("prosit5")
     try:
         model_key = "q2_ajc_prediction"
-        X = np.array([[data.math_score, data.english_score, data.composite_score]])
-        X_scaled = prosit5_scalers[model_key].transform(X)
-
-        prediction = prosit5_models[model_key].predict(X_scaled)[0]
-        probability = prosit5_models[model_key].predict_proba(X_scaled)[0][1]
+        with stage("features"):
+            X = np.array([[data.math_score, data.english_score, data.composite_score]])
+        predictions, probabilities = await score_prosit5_row(p5, model_key, X)
+        prediction, probability = predictions[0], probabilities[0]
 
         interpretation = (
             "High risk of AJC case" if prediction == 1 else "Low risk of AJC case"
@@ -828,8 +2328,11 @@ async def predict_ajc(data: Prosit5Q2Features):
             model_used=model_key,
             confidence=get_confidence_level(probability),
             interpretation=interpretation,
+            model_version=p5["version"],
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
 
@@ -838,6 +2341,7 @@ async def predict_ajc(data: Prosit5Q2Features):
     "/prosit5/predict/major-success",
     response_model=Prosit5Response,
     tags=["Prosit 5 - Predictions"],
+    dependencies=[requires("prosit5")],
 )
 async def predict_major_success(data: Prosit5Q3Features):
     """
@@ -845,13 +2349,13 @@ async def predict_major_success(data: Prosit5Q3Features):
 
     Based on entrance exam scores and first year GPA
     """
+    p5 = model_registry.get("prosit5")
     try:
         model_key = "q3_major_success"
-        X = np.array([[data.math_score, data.english_score, data.first_year_gpa]])
-        X_scaled = prosit5_scalers[model_key].transform(X)
-
-        prediction = prosit5_models[model_key].predict(X_scaled)[0]
-        probability = prosit5_models[model_key].predict_proba(X_scaled)[0][1]
+        with stage("features"):
+            X = np.array([[data.math_score, data.english_score, data.first_year_gpa]])
+        predictions, probabilities = await score_prosit5_row(p5, model_key, X)
+        prediction, probability = predictions[0], probabilities[0]
 
         interpretation = (
             "Likely to succeed in major (GPA ≥ 3.0)"
@@ -865,8 +2369,11 @@ async def predict_major_success(data: Prosit5Q3Features):
             model_used=model_key,
             confidence=get_confidence_level(probability),
             interpretation=interpretation,
+            model_version=p5["version"],
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
 
@@ -875,6 +2382,7 @@ async def predict_major_success(data: Prosit5Q3Features):
     "/prosit5/predict/delayed-graduation",
     response_model=Prosit5Response,
     tags=["Prosit 5 - Predictions"],
+    dependencies=[requires("prosit5")],
 )
 async def predict_delayed_graduation(data: Prosit5Q9Features):
     """
@@ -882,22 +2390,22 @@ async def predict_delayed_graduation(data: Prosit5Q9Features):
 
     Based on entrance exam scores, first year GPA, and failed courses
     """
+    p5 = model_registry.get("prosit5")
     try:
         model_key = "q9_delayed_graduation"
-        X = np.array(
-            [
+        with stage("features"):
+            X = np.array(
                 [
-                    data.math_score,
-                    data.english_score,
-                    data.first_year_gpa,
-                    data.failed_courses,
+                    [
+                        data.math_score,
+                        data.english_score,
+                        data.first_year_gpa,
+                        data.failed_courses,
+                    ]
                 ]
-            ]
-        )
-        X_scaled = prosit5_scalers[model_key].transform(X)
-
-        prediction = prosit5_models[model_key].predict(X_scaled)[0]
-        probability = prosit5_models[model_key].predict_proba(X_scaled)[0][1]
+            )
+        predictions, probabilities = await score_prosit5_row(p5, model_key, X)
+        prediction, probability = predictions[0], probabilities[0]
 
         interpretation = (
             "High risk of delayed graduation"
@@ -911,232 +2419,477 @@ async def predict_delayed_graduation(data: Prosit5Q9Features):
             model_used=model_key,
             confidence=get_confidence_level(probability),
             interpretation=interpretation,
+            model_version=p5["version"],
         )
 
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
+
+
+@app.post(
+    "/prosit5/predict/{task}/bulk",
+    response_class=Response,
+    tags=["Prosit 5 - Predictions"],
+    dependencies=[requires("prosit5")],
+    openapi_extra=COLUMNAR_BODY,
+)
+async def predict_prosit5_bulk(
+    task: Literal["first-year-struggle", "ajc", "major-success", "delayed-graduation"],
+    request: Request,
+):
+    """
+    Score an Arrow IPC or .npy table with one Prosit 5 model
+
+    Columns are matched by name to the model's features (see
+    /prosit5/models/info); the response is a table in the same format with
+    `prediction` and `probability` columns
+    """
+    p5 = model_registry.get("prosit5")
+    upload = await read_upload(request)
+    return await inference_pool.run(
+        score_prosit5_columnar, p5, PROSIT5_TASKS[task], upload
+    )
+
+
+def score_prosit5_columnar(
+    p5: dict, model_key: str, upload: ColumnarUpload
+) -> Response:
+    with stage("features"):
+        X = upload.decode(p5["vectors"][model_key])
+    try:
+        predictions, probabilities = score_prosit5(p5, model_key, X)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
+    return upload.respond(
+        {
+            "prediction": np.asarray(predictions, dtype=np.int64),
+            "probability": np.asarray(probabilities, dtype=np.float64),
+        },
+        {"X-Model-Used": model_key, "X-Model-Version": p5["version"]},
+    )
+
+
+@app.post(
+    "/prosit5/predict/{task}/stream",
+    tags=["Prosit 5 - Predictions"],
+    dependencies=[requires("prosit5")],
+    openapi_extra=NDJSON_BODY,
+)
+async def predict_prosit5_stream(
+    task: Literal["first-year-struggle", "ajc", "major-success", "delayed-graduation"],
+    request: Request,
+    chunk_rows: int = Query(STREAM_CHUNK_ROWS, ge=1, le=MAX_CHUNK_ROWS),
+):
+    """
+    Score an NDJSON stream of students with one Prosit 5 model
+
+    Each line is the model's request object (e.g. Prosit5Q1Features for
+    first-year-struggle), optionally with an "id"; results are streamed back
+    chunk by chunk, followed by a summary line
+    """
+    p5 = model_registry.get("prosit5")
+    model_key = PROSIT5_TASKS[task]
 
+    def score(X: np.ndarray) -> Dict[str, list]:
+        predictions, probabilities = score_prosit5(p5, model_key, X)
+        return {
+            "prediction": np.asarray(predictions).tolist(),
+            "probability": np.asarray(probabilities).tolist(),
+            "confidence": get_confidence_levels(probabilities),
+        }
+
+    return ndjson_response(
+        request,
+        p5["vectors"][model_key],
+        score,
+        chunk_rows,
+        model_key,
+        p5["version"],
+    )
 
-@app.get("/prosit5/models/info", tags=["Prosit 5 - Predictions"])
+
+@app.get(
+    "/prosit5/models/info",
+    tags=["Prosit 5 - Predictions"],
+    dependencies=[requires("prosit5")],
+)
 async def get_prosit5_info():
     """Get information about all Prosit 5 models"""
+    p5 = model_registry.get("prosit5")
     model_info = {}
-    for model_key in prosit5_models.keys():
+    for model_key in p5["models"].keys():
         model_info[model_key] = {
-            "features": prosit5_features[model_key],
-            "n_features": len(prosit5_features[model_key]),
+            "features": p5["features"][model_key],
+            "n_features": len(p5["features"][model_key]),
         }
     return model_info
 
 
 @app.get("/prosit5/results/metrics", tags=["Prosit 5 - Predictions"])
-async def get_prosit5_metrics():
+@offload(io_pool)
+def get_prosit5_metrics(request: Request):
     """Get performance metrics for all Prosit 5 models"""
-    try:
-        metrics_file = RESULTS_DIR / "prosit 5" / "performance_metrics.json"
+    metrics_file = RESULTS_DIR / "prosit 5" / "performance_metrics.json"
+
+    def build():
         with open(metrics_file, "r") as f:
-            metrics = json.load(f)
-        return metrics
+            return json.load(f)
+
+    try:
+        return results_cache.respond(request, "prosit5_metrics", [metrics_file], build)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error loading metrics: {str(e)}")
 
 
 @app.get("/prosit5/results/findings", tags=["Prosit 5 - Predictions"])
-async def get_prosit5_findings():
+@offload(io_pool)
+def get_prosit5_findings(request: Request):
     """Get research findings summary"""
-    try:
-        findings_file = RESULTS_DIR / "prosit 5" / "findings_summary.txt"
+    findings_file = RESULTS_DIR / "prosit 5" / "findings_summary.txt"
+
+    def build():
         with open(findings_file, "r") as f:
-            findings = f.read()
-        return {"findings": findings}
+            return {"findings": f.read()}
+
+    try:
+        return results_cache.respond(
+            request, "prosit5_findings", [findings_file], build
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error loading findings: {str(e)}")
 
 
+PROSIT5_DATA_DIR = BASE_DIR / "data" / "prosit 5"
+MAIN_DATASET_FILE = BASE_DIR / "data" / "merged_cleaned_encoded.csv"
+AJC_DATASET_FILE = PROSIT5_DATA_DIR / "anon_AJC.csv"
+PROSIT5_ADMISSIONS_FILES = {
+    "WASSCE_C2023-C2028-anon.csv": {
+        "name": "WASSCE Admissions",
+        "description": "West African Senior School Certificate Examination results",
+        "importance": "critical",
+        "region": "West Africa",
+    },
+    "IB_C2023-C2028-anon.csv": {
+        "name": "IB Admissions",
+        "description": "International Baccalaureate results",
+        "importance": "high",
+        "region": "International",
+    },
+    "O&A_Level_C2023-C2028-anon.csv": {
+        "name": "O & A Level Admissions",
+        "description": "Ordinary and Advanced Level examination results",
+        "importance": "high",
+        "region": "Commonwealth",
+    },
+    "HSDiploma_C2023-C2028-anon.csv": {
+        "name": "High School Diploma",
+        "description": "US High School Diploma records",
+        "importance": "medium",
+        "region": "North America",
+    },
+    "FrenchBacc_C2023-C2028-anon.csv": {
+        "name": "French Baccalaureate",
+        "description": "French Baccalaureate examination results",
+        "importance": "medium",
+        "region": "Francophone",
+    },
+    "Other_C2023-C2028-anon.csv": {
+        "name": "Other Qualifications",
+        "description": "Other international qualifications",
+        "importance": "low",
+        "region": "Various",
+    },
+}
+# The insights response is rebuilt when any of these changes
+PROSIT5_DATASET_FILES = [
+    MAIN_DATASET_FILE,
+    AJC_DATASET_FILE,
+    *(PROSIT5_DATA_DIR / filename for filename in PROSIT5_ADMISSIONS_FILES),
+]
+
+
 @app.get("/prosit5/datasets/insights", tags=["Prosit 5 - Predictions"])
-async def get_dataset_insights():
-    """Get comprehensive insights about Prosit 5 datasets"""
+@offload(io_pool)
+def get_dataset_insights(request: Request):
+    """
+    Get comprehensive insights about Prosit 5 datasets
+
+    Computed once and served from cache until one of the data files changes
+    """
     try:
-        data_dir = BASE_DIR / "data" / "prosit 5"
+        return results_cache.respond(
+            request,
+            "prosit5_insights",
+            PROSIT5_DATASET_FILES,
+            build_dataset_insights,
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Error loading dataset insights: {str(e)}"
+        )
 
-        # Dataset information
-        datasets = []
 
-        # Main merged dataset
-        main_file = BASE_DIR / "data" / "merged_cleaned_encoded.csv"
-        if main_file.exists():
-            df_main = pd.read_csv(main_file, nrows=1)
-            main_size = main_file.stat().st_size
-            datasets.append(
-                {
-                    "name": "Main Student Records",
-                    "filename": "merged_cleaned_encoded.csv",
-                    "description": "Comprehensive student academic records from Prosit 2",
-                    "rows": 538147,
-                    "columns": df_main.shape[1],
-                    "size_mb": round(main_size / (1024 * 1024), 2),
-                    "importance": "critical",
-                    "usage": "Primary dataset for all academic performance analysis",
-                    "key_features": [
-                        "StudentRef",
-                        "GPA",
-                        "CGPA",
-                        "Mark",
-                        "Grade",
-                        "Program",
-                        "Yeargroup",
+def build_dataset_insights() -> dict:
+    """Assemble the insights response from the cached per-file profiles"""
+    # Dataset information
+    datasets = []
+
+    # Main merged dataset (header only: profiling 538k rows is not needed
+    # for the counts shown)
+    main_file = MAIN_DATASET_FILE
+    if main_file.exists():
+        pd = timed_import("pandas")
+        df_main = pd.read_csv(main_file, nrows=1)
+        main_size = main_file.stat().st_size
+        datasets.append(
+            {
+                "name": "Main Student Records",
+                "filename": "merged_cleaned_encoded.csv",
+                "description": "Comprehensive student academic records from Prosit 2",
+                "rows": 538147,
+                "columns": df_main.shape[1],
+                "size_mb": round(main_size / (1024 * 1024), 2),
+                "importance": "critical",
+                "usage": "Primary dataset for all academic performance analysis",
+                "key_features": [
+                    "StudentRef",
+                    "GPA",
+                    "CGPA",
+                    "Mark",
+                    "Grade",
+                    "Program",
+                    "Yeargroup",
+                ],
+            }
+        )
+
+    # AJC (Conduct) Data
+    ajc_file = AJC_DATASET_FILE
+    if ajc_file.exists():
+        ajc = dataset_profiles.profile(ajc_file, ["Type of Misconduct"])
+        ajc_size = ajc_file.stat().st_size
+        misconduct_dist = ajc["value_counts"]["Type of Misconduct"]
+        datasets.append(
+            {
+                "name": "Academic Judicial Committee Records",
+                "filename": "anon_AJC.csv",
+                "description": "Student conduct and misconduct cases",
+                "rows": ajc["rows"],
+                "columns": ajc["columns"],
+                "size_mb": round(ajc_size / (1024 * 1024), 2),
+                "importance": "high",
+                "usage": "Conduct risk analysis and AJC case prediction (Q2)",
+                "key_features": [
+                    "StudentRef",
+                    "Type of Misconduct",
+                    "Verdict",
+                    "Sanction",
+                ],
+                "distribution": {
+                    "misconduct_types": misconduct_dist,
+                    "unique_students": ajc["column_stats"]["StudentRef"][
+                        "cardinality"
                     ],
-                }
-            )
+                },
+                "column_profiles": ajc["column_stats"],
+            }
+        )
+
+    # Admissions datasets
+    total_admissions_students = 0
+    for filename, info in PROSIT5_ADMISSIONS_FILES.items():
+        file_path = PROSIT5_DATA_DIR / filename
+        if file_path.exists():
+            profile = dataset_profiles.profile(file_path)
+            file_size = file_path.stat().st_size
+            total_admissions_students += profile["rows"]
 
-        # AJC (Conduct) Data
-        ajc_file = data_dir / "anon_AJC.csv"
-        if ajc_file.exists():
-            df_ajc = pd.read_csv(ajc_file)
-            ajc_size = ajc_file.stat().st_size
-            misconduct_dist = df_ajc["Type of Misconduct"].value_counts().to_dict()
             datasets.append(
                 {
-                    "name": "Academic Judicial Committee Records",
-                    "filename": "anon_AJC.csv",
-                    "description": "Student conduct and misconduct cases",
-                    "rows": df_ajc.shape[0],
-                    "columns": df_ajc.shape[1],
-                    "size_mb": round(ajc_size / (1024 * 1024), 2),
-                    "importance": "high",
-                    "usage": "Conduct risk analysis and AJC case prediction (Q2)",
+                    "name": info["name"],
+                    "filename": filename,
+                    "description": info["description"],
+                    "rows": profile["rows"],
+                    "columns": profile["columns"],
+                    "size_mb": round(file_size / (1024 * 1024), 2),
+                    "importance": info["importance"],
+                    "usage": "Entrance exam analysis and first-year performance prediction (Q1, Q3)",
+                    "region": info["region"],
                     "key_features": [
                         "StudentRef",
-                        "Type of Misconduct",
-                        "Verdict",
-                        "Sanction",
+                        "Exam Type",
+                        "Total Aggregate",
+                        "Proposed Major",
                     ],
-                    "distribution": {
-                        "misconduct_types": misconduct_dist,
-                        "unique_students": int(df_ajc["StudentRef"].nunique()),
-                    },
+                    "column_profiles": profile["column_stats"],
                 }
             )
 
-        # Admissions datasets
-        admissions_files = {
-            "WASSCE_C2023-C2028-anon.csv": {
-                "name": "WASSCE Admissions",
-                "description": "West African Senior School Certificate Examination results",
-                "importance": "critical",
-                "region": "West Africa",
-            },
-            "IB_C2023-C2028-anon.csv": {
-                "name": "IB Admissions",
-                "description": "International Baccalaureate results",
-                "importance": "high",
-                "region": "International",
-            },
-            "O&A_Level_C2023-C2028-anon.csv": {
-                "name": "O & A Level Admissions",
-                "description": "Ordinary and Advanced Level examination results",
-                "importance": "high",
-                "region": "Commonwealth",
-            },
-            "HSDiploma_C2023-C2028-anon.csv": {
-                "name": "High School Diploma",
-                "description": "US High School Diploma records",
-                "importance": "medium",
-                "region": "North America",
-            },
-            "FrenchBacc_C2023-C2028-anon.csv": {
-                "name": "French Baccalaureate",
-                "description": "French Baccalaureate examination results",
-                "importance": "medium",
-                "region": "Francophone",
-            },
-            "Other_C2023-C2028-anon.csv": {
-                "name": "Other Qualifications",
-                "description": "Other international qualifications",
-                "importance": "low",
-                "region": "Various",
-            },
-        }
+    # Summary statistics
+    summary = {
+        "total_datasets": len(datasets),
+        "total_size_mb": round(sum(d["size_mb"] for d in datasets), 2),
+        "total_students_main": 12207,
+        "total_students_admissions": total_admissions_students,
+        "students_with_ajc_cases": 134,
+        "dataset_categories": {
+            "academic_records": 1,
+            "conduct_records": 1,
+            "admissions_records": 6,
+        },
+        "exam_systems": [
+            "WASSCE",
+            "IB",
+            "O&A Level",
+            "HS Diploma",
+            "French Bacc",
+            "Other",
+        ],
+        "research_questions_coverage": {
+            "Q1": "First Year Struggle Prediction - Uses admissions data",
+            "Q2": "AJC Case Prediction - Uses admissions + AJC data",
+            "Q3": "Major Success Prediction - Uses admissions + academic data",
+            "Q4-Q8": "Various analyses - Uses academic + admissions data",
+            "Q9": "Delayed Graduation - Uses academic + admissions data",
+        },
+    }
 
-        total_admissions_students = 0
-        for filename, info in admissions_files.items():
-            file_path = data_dir / filename
-            if file_path.exists():
-                df = pd.read_csv(file_path)
-                file_size = file_path.stat().st_size
-                total_admissions_students += df.shape[0]
-
-                datasets.append(
-                    {
-                        "name": info["name"],
-                        "filename": filename,
-                        "description": info["description"],
-                        "rows": df.shape[0],
-                        "columns": df.shape[1],
-                        "size_mb": round(file_size / (1024 * 1024), 2),
-                        "importance": info["importance"],
-                        "usage": "Entrance exam analysis and first-year performance prediction (Q1, Q3)",
-                        "region": info["region"],
-                        "key_features": [
-                            "StudentRef",
-                            "Exam Type",
-                            "Total Aggregate",
-                            "Proposed Major",
-                        ],
-                    }
-                )
+    return {
+        "datasets": datasets,
+        "summary": summary,
+        "importance_levels": {
+            "critical": "Essential for core analysis",
+            "high": "Important for specific research questions",
+            "medium": "Supplementary data for comprehensive analysis",
+            "low": "Additional context and edge cases",
+        },
+    }
 
-        # Summary statistics
-        summary = {
-            "total_datasets": len(datasets),
-            "total_size_mb": round(sum(d["size_mb"] for d in datasets), 2),
-            "total_students_main": 12207,
-            "total_students_admissions": total_admissions_students,
-            "students_with_ajc_cases": 134,
-            "dataset_categories": {
-                "academic_records": 1,
-                "conduct_records": 1,
-                "admissions_records": 6,
-            },
-            "exam_systems": [
-                "WASSCE",
-                "IB",
-                "O&A Level",
-                "HS Diploma",
-                "French Bacc",
-                "Other",
-            ],
-            "research_questions_coverage": {
-                "Q1": "First Year Struggle Prediction - Uses admissions data",
-                "Q2": "AJC Case Prediction - Uses admissions + AJC data",
-                "Q3": "Major Success Prediction - Uses admissions + academic data",
-                "Q4-Q8": "Various analyses - Uses academic + admissions data",
-                "Q9": "Delayed Graduation - Uses academic + admissions data",
-            },
-        }
 
-        return {
-            "datasets": datasets,
-            "summary": summary,
-            "importance_levels": {
-                "critical": "Essential for core analysis",
-                "high": "Important for specific research questions",
-                "medium": "Supplementary data for comprehensive analysis",
-                "low": "Additional context and edge cases",
+# ============================================================================
+# SCORING JOBS
+# ============================================================================
+
+# Request body of POST /jobs/score (stored by scoring_jobs.save_upload)
+CSV_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "text/csv": {"schema": {"type": "string", "format": "binary"}},
+            "multipart/form-data": {
+                "schema": {"type": "object", "properties": {"file": BINARY_SCHEMA}}
             },
-        }
+        },
+    }
+}
 
-    except Exception as e:
+
+def prosit3_job_model(p3: dict, model_name: str) -> JobModel:
+    def score(X: np.ndarray) -> Dict[str, np.ndarray]:
+        if model_name == "ensemble":
+            predictions, probabilities = compute_prosit3_ensemble(p3, X)
+        else:
+            predictions, probabilities = compute_prosit3(p3, model_name, X)
+        return {"probation_risk": predictions, "probability": probabilities}
+
+    return JobModel("prosit3", p3["vectors"], score, p3["version"])
+
+
+def prosit5_job_model(p5: dict, task: str) -> JobModel:
+    model_key = PROSIT5_TASKS[task]
+
+    def score(X: np.ndarray) -> Dict[str, np.ndarray]:
+        predictions, probabilities = compute_prosit5(p5, model_key, X)
+        return {"prediction": predictions, "probability": probabilities}
+
+    # Output columns are named after the endpoint, e.g. ajc_probability
+    return JobModel(
+        task.replace("-", "_"), p5["vectors"][model_key], score, p5["version"]
+    )
+
+
+@app.post(
+    "/jobs/score",
+    status_code=202,
+    tags=["Jobs"],
+    dependencies=[requires("prosit3"), requires("prosit5")],
+    openapi_extra=CSV_BODY,
+)
+async def create_scoring_job(
+    request: Request, prosit3_model: str = "ensemble", id_column: str = "id"
+):
+    """
+    Score a cohort CSV in the background
+
+    Upload the CSV as the request body (text/csv) or as a multipart "file".
+    Prosit 3 (prosit3_model, default the ensemble) and the four Prosit 5
+    models score every row whose CSV has their feature columns; id_column,
+    if present, is copied to the result. Poll GET /jobs/{id} for progress.
+    Uploads over API_JOB_MAX_UPLOAD_MB are rejected with 413.
+    """
+    p3 = model_registry.get("prosit3")
+    p5 = model_registry.get("prosit5")
+    if prosit3_model != "ensemble" and prosit3_model not in p3["models"]:
         raise HTTPException(
-            status_code=500, detail=f"Error loading dataset insights: {str(e)}"
+            status_code=404,
+            detail=f"Model '{prosit3_model}' not found. Available: {list(p3['models'].keys())}",
         )
 
+    job = await io_pool.run(scoring_jobs.create)
+    try:
+        await save_upload(request, job.input_path)
+    except Exception:
+        await io_pool.run(scoring_jobs.discard, job)
+        raise
+    except BaseException:
+        # Cancelled: no awaiting from here on
+        scoring_jobs.discard(job)
+        raise
+    job.id_column = id_column
+    job.models = [prosit3_job_model(p3, prosit3_model)] + [
+        prosit5_job_model(p5, task) for task in PROSIT5_TASKS
+    ]
+    await io_pool.run(scoring_jobs.start, job)
+    return JSONResponse(
+        job.to_dict(), status_code=202, headers={"Location": f"/jobs/{job.id}"}
+    )
+
+
+@app.get("/jobs/{job_id}", tags=["Jobs"])
+@offload(io_pool)
+def get_scoring_job(job_id: str):
+    """Status and progress of a scoring job"""
+    return scoring_jobs.get(job_id)
+
+
+@app.get("/jobs/{job_id}/result", tags=["Jobs"])
+@offload(io_pool)
+def get_scoring_job_result(job_id: str):
+    """
+    Result CSV of a finished job: `row` (0-based), the id column, then
+    `<model>_<output>` and `<model>_error` columns per model
+    """
+    return FileResponse(
+        scoring_jobs.result_path(job_id),
+        media_type="text/csv",
+        filename=f"scores-{job_id}.csv",
+    )
+
 
 # ============================================================================
 # RUN THE APP
 # ============================================================================
 
 if __name__ == "__main__":
-    import uvicorn
+    workers = int(os.environ.get("API_WORKERS", "1"))
+    if workers > 1:
+        # Load once, then fork copy-on-write workers (see prefork.py)
+        from prefork import serve
+
+        serve(app, load_every_prosit, host="0.0.0.0", port=8000, workers=workers)
+    else:
+        import uvicorn
 
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+        uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,433 @@
+"""
+Lightweight in-process metrics for the Student Analytics API
+
+Per-endpoint and per-stage latency histograms, request and error counters
+and model-load timings, rendered in the Prometheus text exposition format.
+
+Every metric guards its series with its own lock, so executor and job
+threads can update one while /metrics renders it.
+
+Handlers time their work with ``with stage("scale"): ...``. A stage only
+appends ``(name, seconds)`` to the current request's timer; histograms are
+updated once per request by MetricsMiddleware, which also returns the same
+breakdown to the client in a ``Server-Timing`` header.
+"""
+
+import asyncio
+import importlib
+import math
+import sys
+import threading
+from bisect import bisect_left
+from contextvars import ContextVar
+from functools import wraps
+from time import perf_counter
+from typing import Dict, List, Optional, Tuple
+
+from fastapi.routing import APIRoute
+
+# Histogram buckets in seconds (upper bounds, +Inf is implicit)
+LATENCY_BUCKETS = (
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+# ============================================================================
+# METRIC TYPES
+# ============================================================================
+
+
+class Histogram:
+    """Fixed-bucket histogram keyed by a tuple of label values"""
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        label_names: Tuple[str, ...],
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        # labels -> [per-bucket counts (last is +Inf), sum, count]
+        self.series: Dict[tuple, list] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float):
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [
+                    [0] * (len(self.buckets) + 1),
+                    0.0,
+                    0,
+                ]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        with self.lock:
+            snapshot = sorted(
+                (labels, (list(counts), total, count))
+                for labels, (counts, total, count) in self.series.items()
+            )
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in snapshot:
+            base = _format_labels(self.label_names, labels)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(
+                    f'{self.name}_bucket{{{base},le="{bound:g}"}} {cumulative}'
+                )
+            lines.append(f'{self.name}_bucket{{{base},le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{base}}} {total:.9f}")
+            lines.append(f"{self.name}_count{{{base}}} {count}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter keyed by a tuple of label values"""
+
+    metric_type = "counter"
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.series: Dict[tuple, float] = {}
+        self.lock = threading.Lock()
+
+    def inc(self, labels: tuple, amount: float = 1):
+        with self.lock:
+            self.series[labels] = self.series.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        with self.lock:
+            snapshot = sorted(self.series.items())
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} {self.metric_type}",
+        ]
+        for labels, value in snapshot:
+            if self.label_names:
+                labels = _format_labels(self.label_names, labels)
+                lines.append(f"{self.name}{{{labels}}} {_format_value(value)}")
+            else:
+                lines.append(f"{self.name} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    """Last-value gauge keyed by a tuple of label values"""
+
+    metric_type = "gauge"
+
+    def set(self, labels: tuple, value: float):
+        with self.lock:
+            self.series[labels] = value
+
+    def remove(self, labels: tuple):
+        with self.lock:
+            self.series.pop(labels, None)
+
+
+def _format_value(value: float) -> str:
+    # :g keeps only 6 significant digits, so large counters (bytes, rows)
+    # would render rounded and appear to stall
+    value = float(value)
+    if value.is_integer():
+        return str(int(value))
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value)
+
+
+def _format_labels(names: Tuple[str, ...], values: tuple) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# ============================================================================
+# REGISTRY
+# ============================================================================
+
+
+class MetricsRegistry:
+    """All metrics exported on /metrics"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.request_duration = Histogram(
+            "api_request_duration_seconds",
+            "End-to-end request latency per endpoint",
+            ("method", "endpoint"),
+        )
+        self.stage_duration = Histogram(
+            "api_stage_duration_seconds",
+            "Latency of each processing stage per endpoint",
+            ("endpoint", "stage"),
+        )
+        self.requests = Counter(
+            "api_requests_total",
+            "Requests served per endpoint and status code",
+            ("method", "endpoint", "status"),
+        )
+        self.errors = Counter(
+            "api_request_errors_total",
+            "Requests that failed with a 5xx status or an unhandled exception",
+            ("method", "endpoint"),
+        )
+        self.model_load = Gauge(
+            "api_model_load_seconds",
+            "Time taken to load each model artifact",
+            ("artifact",),
+        )
+        self.import_duration = Gauge(
+            "api_import_seconds",
+            "Time taken to import each deferred module",
+            ("module",),
+        )
+        self.startup_duration = Gauge(
+            "api_startup_seconds",
+            "Time taken by each startup phase (module imports, per-prosit loading)",
+            ("phase",),
+        )
+        self.extra = []
+
+    def observe_request(
+        self, method: str, endpoint: str, status: int, seconds: float, stages: dict
+    ):
+        with self.lock:
+            self.request_duration.observe((method, endpoint), seconds)
+            self.requests.inc((method, endpoint, str(status)))
+            if status >= 500:
+                self.errors.inc((method, endpoint))
+            for name, stage_seconds in stages.items():
+                self.stage_duration.observe((endpoint, name), stage_seconds)
+
+    def record_model_load(self, artifact: str, seconds: float):
+        with self.lock:
+            self.model_load.set((artifact,), seconds)
+
+    def record_import(self, module: str, seconds: float):
+        with self.lock:
+            self.import_duration.set((module,), seconds)
+
+    def record_startup(self, phase: str, seconds: float):
+        with self.lock:
+            self.startup_duration.set((phase,), seconds)
+
+    def startup_report(self) -> Dict[str, Dict[str, float]]:
+        """Startup timings in seconds, by phase, import and artifact"""
+        with self.lock:
+            return {
+                "phases": {k[0]: v for k, v in self.startup_duration.series.items()},
+                "imports": {k[0]: v for k, v in self.import_duration.series.items()},
+                "artifacts": {k[0]: v for k, v in self.model_load.series.items()},
+            }
+
+    def register(self, metric):
+        """Export an additional Histogram/Counter/Gauge on /metrics"""
+        self.extra.append(metric)
+        return metric
+
+    def render(self) -> str:
+        with self.lock:
+            metrics = [
+                self.request_duration,
+                self.stage_duration,
+                self.requests,
+                self.errors,
+                self.model_load,
+                self.import_duration,
+                self.startup_duration,
+                *self.extra,
+            ]
+            lines = []
+            for metric in metrics:
+                lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+def timed_import(name: str):
+    """Import a module, recording the import time on first import"""
+    if name in sys.modules:
+        # Still go through importlib: it waits if another thread is mid-import
+        return importlib.import_module(name)
+    start = perf_counter()
+    module = importlib.import_module(name)
+    registry.record_import(name, perf_counter() - start)
+    return module
+
+
+# ============================================================================
+# PER-REQUEST TIMING
+# ============================================================================
+
+
+class RequestTimer:
+    """Stage timings collected while serving one request"""
+
+    __slots__ = ("start", "mark", "stages")
+
+    def __init__(self):
+        self.start = self.mark = perf_counter()
+        self.stages = []
+
+    def checkpoint(self, name: str):
+        """Record the time since the previous checkpoint as a stage"""
+        now = perf_counter()
+        self.stages.append((name, now - self.mark))
+        self.mark = now
+
+    def totals(self) -> Dict[str, float]:
+        """Stage durations summed by name, in first-seen order"""
+        totals = {}
+        for name, seconds in self.stages:
+            totals[name] = totals.get(name, 0.0) + seconds
+        return totals
+
+
+_current_timer: ContextVar[Optional[RequestTimer]] = ContextVar(
+    "current_timer", default=None
+)
+
+
+class stage:
+    """Time a block as a named stage of the current request"""
+
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        timer = _current_timer.get()
+        if timer is not None:
+            timer.stages.append((self.name, perf_counter() - self.start))
+        return False
+
+
+def record_stage(name: str, seconds: float):
+    """Record an externally measured stage on the current request, if any"""
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.stages.append((name, seconds))
+
+
+def server_timing_header(stages: Dict[str, float], total: float) -> str:
+    """Format stage durations as a Server-Timing header value (milliseconds)"""
+    parts = [f"{name};dur={seconds * 1000:.3f}" for name, seconds in stages.items()]
+    parts.append(f"total;dur={total * 1000:.3f}")
+    return ", ".join(parts)
+
+
+class TimedRoute(APIRoute):
+    """
+    APIRoute that marks when FastAPI hands a validated request to the handler
+
+    Everything between the request body arriving and the handler starting
+    (JSON decoding and Pydantic validation) is recorded as "validation";
+    everything between the handler returning and the response starting
+    (response model validation and serialization) as "serialize".
+    """
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        if asyncio.iscoroutinefunction(endpoint):
+            original = endpoint
+
+            @wraps(original)
+            async def endpoint(*args, **kw):
+                timer = _current_timer.get()
+                if timer is not None:
+                    timer.checkpoint("validation")
+                try:
+                    return await original(*args, **kw)
+                finally:
+                    if timer is not None:
+                        timer.mark = perf_counter()
+
+        super().__init__(path, endpoint, **kwargs)
+
+
+class MetricsMiddleware:
+    """ASGI middleware that records request metrics and sets Server-Timing"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timer = RequestTimer()
+        token = _current_timer.set(timer)
+        status = 500
+
+        async def timed_receive():
+            message = await receive()
+            if message["type"] == "http.request" and not message.get("more_body"):
+                timer.checkpoint("receive")
+            return message
+
+        async def timed_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                timer.checkpoint("serialize")
+                header = server_timing_header(
+                    timer.totals(), perf_counter() - timer.start
+                )
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", header.encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, timed_receive, timed_send)
+        finally:
+            _current_timer.reset(token)
+            route = scope.get("route")
+            endpoint = getattr(route, "path", "<unmatched>")
+            registry.observe_request(
+                scope["method"],
+                endpoint,
+                status,
+                perf_counter() - timer.start,
+                timer.totals(),
+            )
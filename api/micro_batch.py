@@ -0,0 +1,167 @@
+"""
+Dynamic micro-batching of concurrent single-row predictions
+
+Most traffic is single-row /prosit3/predict/* and /prosit5/predict/* calls,
+and each pays the full per-call overhead of the model (input checks,
+predict_proba dispatch) for one row. With API_MICRO_BATCH=1, a row is not
+scored on its own: it joins the open batch for its model, which is scored
+API_MICRO_BATCH_WINDOW_MS (default 2) after its first row arrived, or as
+soon as it holds API_MICRO_BATCH_MAX_SIZE rows (default 64). The batch is
+stacked into one matrix, scored with one call on the inference pool, and
+each waiting request gets its own row of the result.
+
+Batches are kept per model and model set version, so a hot reload never
+mixes rows for two model sets. Batching trades up to one window of latency
+per request for throughput under concurrency; it is off by default.
+
+Each batched request reports batch_wait (from joining the batch until its
+scoring started, including the inference queue) and batch_score in
+Server-Timing.
+"""
+
+import asyncio
+import contextvars
+import os
+from time import perf_counter
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from executors import BoundedExecutor, inference_pool
+from metrics import Histogram, record_stage, registry
+
+MICRO_BATCH_ENABLED = os.environ.get("API_MICRO_BATCH", "0") == "1"
+MICRO_BATCH_WINDOW = float(os.environ.get("API_MICRO_BATCH_WINDOW_MS", "2")) / 1000
+MICRO_BATCH_MAX_SIZE = int(os.environ.get("API_MICRO_BATCH_MAX_SIZE", "64"))
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+batch_size_histogram = registry.register(
+    Histogram(
+        "api_micro_batch_size",
+        "Rows scored together per micro-batch",
+        ("model",),
+        buckets=BATCH_SIZE_BUCKETS,
+    )
+)
+batch_wait_histogram = registry.register(
+    Histogram(
+        "api_micro_batch_wait_seconds",
+        "Time a row waited for its micro-batch to start scoring",
+        ("model",),
+    )
+)
+
+# (predictions, probabilities)
+Scores = Tuple[np.ndarray, np.ndarray]
+
+
+class _Batch:
+    """Rows waiting to be scored together, and the requests awaiting them"""
+
+    def __init__(self, score: Callable[[np.ndarray], Scores]):
+        self.score = score
+        self.rows: List[np.ndarray] = []
+        self.futures: List[asyncio.Future] = []
+        self.enqueued: List[float] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class MicroBatcher:
+    """Groups concurrent single-row predictions per model into one matrix"""
+
+    def __init__(
+        self,
+        executor: BoundedExecutor,
+        enabled: bool,
+        window: float,
+        max_size: int,
+    ):
+        self.executor = executor
+        self.enabled = enabled
+        self.window = window
+        self.max_size = max_size
+        # (model, version) -> the batch currently accepting rows
+        self.open: Dict[Tuple[str, str], _Batch] = {}
+        # The loop only keeps weak references to tasks; these keep running
+        # batches alive until they finish
+        self.running: Set[asyncio.Task] = set()
+
+    async def score(
+        self,
+        model: str,
+        version: str,
+        X: np.ndarray,
+        score: Callable[[np.ndarray], Scores],
+    ) -> Scores:
+        """
+        score(X) for a single-row X, on the inference pool
+
+        When batching is on, X is scored as one row of a matrix with the
+        other rows for the same model and version that arrive in the window;
+        `score` must then accept any number of rows.
+        """
+        if not self.enabled:
+            return await self.executor.run(score, X)
+
+        loop = asyncio.get_running_loop()
+        key = (model, version)
+        batch = self.open.get(key)
+        if batch is None:
+            batch = self.open[key] = _Batch(score)
+            # A fresh context: the batch is not part of this request's timing
+            batch.timer = loop.call_later(
+                self.window, self._flush, key, batch, context=contextvars.Context()
+            )
+        future = loop.create_future()
+        enqueued = perf_counter()
+        batch.rows.append(X[0])
+        batch.futures.append(future)
+        batch.enqueued.append(enqueued)
+        if len(batch.rows) >= self.max_size:
+            batch.timer.cancel()
+            contextvars.Context().run(self._flush, key, batch)
+
+        predictions, probabilities, started, seconds = await future
+        record_stage("batch_wait", started - enqueued)
+        record_stage("batch_score", seconds)
+        return predictions, probabilities
+
+    def _flush(self, key: Tuple[str, str], batch: _Batch):
+        if self.open.get(key) is batch:
+            del self.open[key]
+        task = asyncio.ensure_future(self._run(key[0], batch))
+        self.running.add(task)
+        task.add_done_callback(self.running.discard)
+
+    async def _run(self, model: str, batch: _Batch):
+        X = np.stack(batch.rows)
+        batch_size_histogram.observe((model,), len(X))
+        try:
+            (predictions, probabilities), started, seconds = await self.executor.run(
+                _timed, batch.score, X
+            )
+        except Exception as e:
+            for future in batch.futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for i, (future, enqueued) in enumerate(zip(batch.futures, batch.enqueued)):
+            batch_wait_histogram.observe((model,), started - enqueued)
+            # Cancelled if the client went away while waiting
+            if not future.done():
+                future.set_result(
+                    (predictions[i : i + 1], probabilities[i : i + 1], started, seconds)
+                )
+
+
+def _timed(score: Callable[[np.ndarray], Scores], X: np.ndarray):
+    started = perf_counter()
+    result = score(X)
+    return result, started, perf_counter() - started
+
+
+micro_batcher = MicroBatcher(
+    inference_pool, MICRO_BATCH_ENABLED, MICRO_BATCH_WINDOW, MICRO_BATCH_MAX_SIZE
+)
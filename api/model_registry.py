@@ -0,0 +1,228 @@
+"""
+Versioned model sets with hot reload
+
+Each prosit's fitted models, scalers and derived fast paths (compiled
+evaluators, assignment index, score grid) form one *model set*: a dict built
+by that prosit's loader and published with a single assignment. Handlers
+take the current set once per request and use only that set, so a reload
+swaps everything atomically: requests already running finish on the old
+set, later ones see the new one, and none see a mix.
+
+A model set's version is a content hash of the prosit's model directory, so
+every worker serving the same files reports the same version.
+
+Reloads build and warm up the new set on a background thread while the old
+one keeps serving; a reload that fails leaves the old set in place. They are
+triggered by POST /admin/models/reload or, with API_MODEL_WATCH_INTERVAL
+set, by a thread polling the model directories for changed files.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional
+
+from logging_config import LOGGER_NAME
+from metrics import Counter, Gauge, registry, timed_import
+
+reloads_counter = registry.register(
+    Counter(
+        "api_model_reloads_total",
+        "Model set reloads per prosit and outcome",
+        ("prosit", "outcome"),
+    )
+)
+reload_gauge = registry.register(
+    Gauge(
+        "api_model_reload_seconds",
+        "Time taken by the last successful reload, including warm-up",
+        ("prosit",),
+    )
+)
+version_gauge = registry.register(
+    Gauge(
+        "api_model_version_info",
+        "Version of the model set currently served (value is always 1)",
+        ("prosit", "version"),
+    )
+)
+
+logger = logging.getLogger(f"{LOGGER_NAME}.models")
+
+
+def directory_fingerprint(directory: Path) -> tuple:
+    """Cheap change detection: name, size and mtime of every file"""
+    return tuple(
+        (path.name, stat.st_size, stat.st_mtime_ns)
+        for path, stat in sorted(
+            (path, path.stat()) for path in directory.iterdir() if path.is_file()
+        )
+    )
+
+
+def directory_version(directory: Path) -> str:
+    """Content hash of every file in a model directory (12 hex digits)"""
+    digest = hashlib.sha256()
+    for path in sorted(p for p in directory.iterdir() if p.is_file()):
+        digest.update(path.name.encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()[:12]
+
+
+class ModelRegistry:
+    """The current model set of every prosit, loaded and reloaded on demand"""
+
+    def __init__(self):
+        # prosit -> (loader, model directory, modules to import, warm-up)
+        self.loaders = {}
+        self.sets: Dict[str, dict] = {}
+        self.locks: Dict[str, threading.Lock] = {}
+        # Called with the prosit name after each publish
+        self.on_publish = []
+        self.watcher: Optional[threading.Thread] = None
+
+    def register(
+        self,
+        prosit: str,
+        loader: Callable[[], dict],
+        directory: Path,
+        modules: Iterable[str] = (),
+        warm_up: Optional[Callable[[dict], None]] = None,
+    ):
+        self.loaders[prosit] = (loader, directory, tuple(modules), warm_up)
+        self.locks[prosit] = threading.Lock()
+
+    def __contains__(self, prosit: str) -> bool:
+        return prosit in self.sets
+
+    def get(self, prosit: str) -> dict:
+        """The current model set (KeyError if the prosit is not loaded yet)"""
+        return self.sets[prosit]
+
+    def loaded(self) -> list:
+        return [prosit for prosit in self.loaders if prosit in self.sets]
+
+    def versions(self) -> Dict[str, str]:
+        return {prosit: self.sets[prosit]["version"] for prosit in self.loaded()}
+
+    def ensure_loaded(self, prosit: str) -> float:
+        """
+        Load a prosit once; concurrent callers wait for the first
+
+        Returns the seconds spent loading (0.0 if it was already loaded).
+        """
+        if prosit in self.sets:
+            return 0.0
+        with self.locks[prosit]:
+            if prosit in self.sets:
+                return 0.0
+            start = time.perf_counter()
+            self._publish(prosit, self._build(prosit))
+            return time.perf_counter() - start
+
+    def reload(self, prosit: str) -> dict:
+        """
+        Build, warm up and swap in a fresh model set; returns the new set
+
+        The current set keeps serving until the swap. On failure it stays in
+        place and the exception propagates.
+        """
+        with self.locks[prosit]:
+            start = time.perf_counter()
+            try:
+                model_set = self._build(prosit)
+            except Exception:
+                reloads_counter.inc((prosit, "failed"))
+                raise
+            previous = self.sets.get(prosit)
+            self._publish(prosit, model_set)
+            seconds = time.perf_counter() - start
+            reloads_counter.inc((prosit, "success"))
+            reload_gauge.set((prosit,), seconds)
+            logger.info(
+                "Reloaded %s models: %s -> %s in %.2fs",
+                prosit,
+                previous["version"] if previous else None,
+                model_set["version"],
+                seconds,
+            )
+            return model_set
+
+    def _build(self, prosit: str) -> dict:
+        loader, directory, modules, warm_up = self.loaders[prosit]
+        for module in modules:
+            timed_import(module)
+        fingerprint = directory_fingerprint(directory)
+        version = directory_version(directory)
+        model_set = loader()
+        model_set["version"] = version
+        model_set["fingerprint"] = fingerprint
+        if warm_up is not None:
+            warm_up(model_set)
+        return model_set
+
+    def _publish(self, prosit: str, model_set: dict):
+        previous = self.sets.get(prosit)
+        # The swap: one reference assignment
+        self.sets[prosit] = model_set
+        if previous is not None:
+            version_gauge.remove((prosit, previous["version"]))
+        version_gauge.set((prosit, model_set["version"]), 1)
+        for callback in self.on_publish:
+            callback(prosit)
+
+    # ------------------------------------------------------------------------
+    # Directory watcher
+    # ------------------------------------------------------------------------
+
+    def watch(self, interval: float):
+        """Poll loaded prosits' directories and reload the ones that change"""
+        if self.watcher is not None:
+            return
+        self.watcher = threading.Thread(
+            target=self._watch, args=(interval,), name="model-watcher", daemon=True
+        )
+        self.watcher.start()
+
+    def _watch(self, interval: float):
+        # prosit -> fingerprint seen on the previous poll; a change is only
+        # acted on once two polls agree, so half-copied files are skipped
+        pending = {}
+        # prosit -> fingerprint whose reload failed; not retried until the
+        # directory changes again
+        failed = {}
+        while True:
+            time.sleep(interval)
+            for prosit in self.loaded():
+                directory = self.loaders[prosit][1]
+                try:
+                    fingerprint = directory_fingerprint(directory)
+                except OSError:
+                    continue
+                if fingerprint == self.sets[prosit]["fingerprint"]:
+                    pending.pop(prosit, None)
+                    failed.pop(prosit, None)
+                    continue
+                if failed.get(prosit) == fingerprint:
+                    continue
+                if pending.get(prosit) != fingerprint:
+                    pending[prosit] = fingerprint
+                    continue
+                pending.pop(prosit, None)
+                try:
+                    self.reload(prosit)
+                except Exception:
+                    failed[prosit] = fingerprint
+                    logger.exception(
+                        "Reloading %s models failed; still serving version %s "
+                        "until the directory changes again",
+                        prosit,
+                        self.sets[prosit]["version"],
+                    )
+                else:
+                    failed.pop(prosit, None)
+
+
+model_registry = ModelRegistry()
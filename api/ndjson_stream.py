@@ -0,0 +1,225 @@
+"""
+Streaming NDJSON scoring with bounded memory
+
+The /batch endpoints hold the whole request and response in memory, which
+does not scale to very large scoring jobs. The /stream endpoints read
+newline-delimited JSON records (one named-field object per line, as in the
+single-record endpoints) as the upload arrives, score them in micro-chunks
+of API_STREAM_CHUNK_ROWS records (default 256, or ?chunk_rows=) on the
+inference pool, and write one NDJSON result line per record back straight
+away:
+
+    {"line": 1, "probation_risk": 0, "probability": 0.12, "confidence": "High"}
+    {"line": 2, "error": "GPA_y: 5 is outside [0, 4]"}
+    ...
+    {"summary": {"records": 2, "scored": 1, "errors": 1, "model_used": ...}}
+
+Results are in input order and carry the record's "id" field when it has
+one. An invalid record gets an error line instead of failing the request,
+since the response has already started. Only the current chunk and one
+partial line (at most API_STREAM_MAX_LINE_BYTES, default 64 KiB) are held in
+memory, so memory use does not grow with the upload.
+"""
+
+import json
+import logging
+import os
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from fastapi import HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+from executors import inference_pool
+from feature_vectors import VectorSchema
+from logging_config import LOGGER_NAME
+from metrics import Counter, registry
+
+STREAM_CHUNK_ROWS = int(os.environ.get("API_STREAM_CHUNK_ROWS", "256"))
+MAX_CHUNK_ROWS = 10000
+MAX_LINE_BYTES = int(os.environ.get("API_STREAM_MAX_LINE_BYTES", "65536"))
+
+records_counter = registry.register(
+    Counter(
+        "api_stream_records_total",
+        "NDJSON records streamed, by outcome (scored, error)",
+        ("outcome",),
+    )
+)
+
+# (line number, raw line); None for a line dropped for being too long
+Line = Tuple[int, Optional[bytes]]
+
+logger = logging.getLogger(f"{LOGGER_NAME}.stream")
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse whose body may still be reading the request
+
+    Starlette's StreamingResponse listens for the client disconnecting by
+    calling receive() alongside the body iterator, which would swallow
+    request body messages the iterator has not read yet. Here receive() is
+    left to the iterator; a disconnect surfaces there as ClientDisconnect.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+async def read_lines(request: Request, chunk_rows: int) -> AsyncIterator[List[Line]]:
+    """Non-blank lines of the request body, in chunks of up to chunk_rows"""
+    buffer = bytearray()
+    chunk: List[Line] = []
+    number = 0
+    skipping = False  # inside a line already reported as too long
+
+    async for data in request.stream():
+        buffer += data
+        start = 0
+        while True:
+            end = buffer.find(b"\n", start)
+            if end < 0:
+                break
+            line = bytes(buffer[start:end])
+            start = end + 1
+            number += 1
+            if skipping:
+                skipping = False
+            elif line.strip():
+                chunk.append((number, line if len(line) <= MAX_LINE_BYTES else None))
+                if len(chunk) >= chunk_rows:
+                    yield chunk
+                    chunk = []
+        del buffer[:start]
+
+        if len(buffer) > MAX_LINE_BYTES and not skipping:
+            chunk.append((number + 1, None))
+            skipping = True
+        if skipping:
+            buffer.clear()
+
+    if buffer.strip() and not skipping:
+        chunk.append((number + 1, bytes(buffer)))
+    if chunk:
+        yield chunk
+
+
+def score_lines(
+    schema: VectorSchema,
+    score: Callable[[np.ndarray], Dict[str, list]],
+    lines: List[Line],
+) -> Tuple[bytes, int]:
+    """
+    Parse, validate and score one chunk of lines
+
+    Returns the NDJSON result lines and the number of records that failed.
+    """
+    numbers, ids, rows = [], [], []
+    errors = {}
+    for number, line in lines:
+        if line is None:
+            errors[number] = f"Line longer than {MAX_LINE_BYTES} bytes"
+            continue
+        record = None
+        try:
+            record = json.loads(line)
+            row = [float(record[name]) for name in schema.field_order]
+        except KeyError as e:
+            errors[number] = f"Missing field {e}"
+            continue
+        except (TypeError, ValueError) as e:
+            # UnicodeDecodeError: a line that is not UTF-8
+            if isinstance(e, (json.JSONDecodeError, UnicodeDecodeError)):
+                errors[number] = f"Invalid JSON: {e}"
+            elif not isinstance(record, dict):
+                errors[number] = "Expected a JSON object"
+            else:
+                errors[number] = "Features must be numbers"
+            continue
+        numbers.append(number)
+        ids.append(record.get("id"))
+        rows.append(row)
+
+    results = {}
+    if rows:
+        X = np.array(rows, dtype=np.float64)
+        invalid = schema.row_errors(X)
+        for row, message in invalid.items():
+            errors[numbers[row]] = message
+        keep = [row for row in range(len(rows)) if row not in invalid]
+        try:
+            columns = score(X[keep] if invalid else X) if keep else {}
+        except Exception as e:
+            for row in keep:
+                errors[numbers[row]] = f"Prediction error: {str(e)}"
+            keep = []
+        for i, row in enumerate(keep):
+            result = {"line": numbers[row]}
+            if ids[row] is not None:
+                result["id"] = ids[row]
+            result.update((name, values[i]) for name, values in columns.items())
+            results[numbers[row]] = result
+
+    for number, message in errors.items():
+        results[number] = {"line": number, "error": message}
+    body = "".join(
+        json.dumps(results[number], separators=(",", ":")) + "\n"
+        for number in sorted(results)
+    )
+    records_counter.inc(("scored",), len(results) - len(errors))
+    if errors:
+        records_counter.inc(("error",), len(errors))
+    return body.encode(), len(errors)
+
+
+async def stream_scores(
+    request: Request,
+    schema: VectorSchema,
+    score: Callable[[np.ndarray], Dict[str, list]],
+    chunk_rows: int,
+    model: dict,
+) -> AsyncIterator[bytes]:
+    """NDJSON result lines, one chunk at a time, then a summary line"""
+    records = failed = 0
+    async for lines in read_lines(request, chunk_rows):
+        records += len(lines)
+        try:
+            body, errors = await inference_pool.run(score_lines, schema, score, lines)
+        except Exception as e:
+            # The response has started; report the chunk's records instead
+            if isinstance(e, HTTPException):
+                message = e.detail
+            else:
+                logger.exception("Scoring a stream chunk failed")
+                message = f"Prediction error: {str(e)}"
+            errors = len(lines)
+            body = "".join(
+                json.dumps({"line": number, "error": message}, separators=(",", ":"))
+                + "\n"
+                for number, _ in lines
+            ).encode()
+        failed += errors
+        yield body
+    summary = {"records": records, "scored": records - failed, "errors": failed}
+    summary.update(model)
+    yield (json.dumps({"summary": summary}, separators=(",", ":")) + "\n").encode()
+
+
+def ndjson_response(
+    request: Request,
+    schema: VectorSchema,
+    score: Callable[[np.ndarray], Dict[str, list]],
+    chunk_rows: int,
+    model_used: str,
+    model_version: str,
+) -> DuplexStreamingResponse:
+    """Streamed results of score() over the request's NDJSON records"""
+    model = {"model_used": model_used, "model_version": model_version}
+    return DuplexStreamingResponse(
+        stream_scores(request, schema, score, chunk_rows, model),
+        media_type="application/x-ndjson",
+        headers={"X-Model-Used": model_used, "X-Model-Version": model_version},
+    )
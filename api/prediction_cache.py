@@ -0,0 +1,154 @@
+"""
+Bounded LRU/TTL cache for single-row predictions
+
+Advisors re-run the same student profiles from several dashboard views, so
+identical feature vectors reach the predict endpoints over and over. The
+cache maps (prosit, model version, model, feature vector) to the scored
+result; a hit skips scaling and the model entirely.
+
+Configured from the environment:
+
+- API_PREDICTION_CACHE_SIZE: maximum cached predictions (default 0 = off)
+- API_PREDICTION_CACHE_TTL: seconds an entry stays valid (default 3600,
+  0 = no expiry)
+
+Entries of a prosit are dropped whenever its models are (re)loaded.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from time import monotonic
+from typing import Callable
+
+import numpy as np
+
+from metrics import Counter, Gauge, registry, stage
+
+hits_counter = registry.register(
+    Counter(
+        "api_prediction_cache_hits_total",
+        "Predictions served from the cache",
+        ("model",),
+    )
+)
+misses_counter = registry.register(
+    Counter(
+        "api_prediction_cache_misses_total",
+        "Cacheable predictions that had to be computed",
+        ("model",),
+    )
+)
+evictions_counter = registry.register(
+    Counter(
+        "api_prediction_cache_evictions_total",
+        "Entries dropped from the prediction cache",
+        ("reason",),
+    )
+)
+entries_gauge = registry.register(
+    Gauge(
+        "api_prediction_cache_entries",
+        "Predictions currently cached",
+        (),
+    )
+)
+
+
+class PredictionCache:
+    """Thread-safe LRU cache with optional per-entry expiry"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries = OrderedDict()  # key -> (expires_at, result)
+        self.lock = threading.Lock()
+        entries_gauge.set((), 0)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get_or_compute(
+        self,
+        prosit: str,
+        model: str,
+        X: np.ndarray,
+        compute: Callable[[], tuple],
+        version: str = "",
+    ) -> tuple:
+        """
+        Return compute() for a single feature row, from the cache if possible
+
+        Batches (more than one row) are always computed. `version` identifies
+        the model set compute() uses, so requests still running on a replaced
+        set cannot cache results under the new one.
+        """
+        result = self.lookup(prosit, model, X, version)
+        if result is not None:
+            return result
+
+        result = compute()
+        self.store(prosit, model, X, result, version)
+        return result
+
+    def lookup(self, prosit: str, model: str, X: np.ndarray, version: str = ""):
+        """The cached result for a single feature row, or None"""
+        if not self.enabled or X.shape[0] != 1:
+            return None
+        with stage("cache"):
+            return self.get(self.key(prosit, version, model, X), model)
+
+    def store(
+        self, prosit: str, model: str, X: np.ndarray, result: tuple, version: str = ""
+    ):
+        """Cache the result computed for a single feature row"""
+        if self.enabled and X.shape[0] == 1:
+            self.put(self.key(prosit, version, model, X), result)
+
+    @staticmethod
+    def key(prosit: str, version: str, model: str, X: np.ndarray) -> tuple:
+        # + 0.0 folds -0.0 into 0.0, so equal vectors give equal bytes
+        row = (np.asarray(X, dtype=np.float64) + 0.0).tobytes()
+        return (prosit, version, model, row)
+
+    def get(self, key: tuple, model: str):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires_at, result = entry
+                if expires_at is None or monotonic() < expires_at:
+                    self.entries.move_to_end(key)
+                    hits_counter.inc((model,))
+                    return result
+                del self.entries[key]
+                evictions_counter.inc(("ttl",))
+                entries_gauge.set((), len(self.entries))
+            misses_counter.inc((model,))
+            return None
+
+    def put(self, key: tuple, result: tuple):
+        expires_at = monotonic() + self.ttl_seconds if self.ttl_seconds > 0 else None
+        with self.lock:
+            self.entries[key] = (expires_at, result)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                evictions_counter.inc(("capacity",))
+            entries_gauge.set((), len(self.entries))
+
+    def invalidate(self, prosit: str):
+        """Drop every entry of a prosit (its models were reloaded)"""
+        with self.lock:
+            stale = [key for key in self.entries if key[0] == prosit]
+            for key in stale:
+                del self.entries[key]
+            if stale:
+                evictions_counter.inc(("reload",), len(stale))
+            entries_gauge.set((), len(self.entries))
+
+
+prediction_cache = PredictionCache(
+    max_entries=int(os.environ.get("API_PREDICTION_CACHE_SIZE", "0")),
+    ttl_seconds=float(os.environ.get("API_PREDICTION_CACHE_TTL", "3600")),
+)
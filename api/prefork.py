@@ -0,0 +1,135 @@
+"""
+Pre-fork server: load the models once, then fork copy-on-write workers
+
+`uvicorn --workers N` starts N fresh processes that each import the app and
+run the startup loader, so startup time and model memory scale with N. Here
+the parent process loads every model, freezes the garbage collector and
+forks the workers, which share the parent's model pages until they write to
+them:
+
+    python prefork.py --workers 8 --port 8000
+    API_WORKERS=8 python main.py
+
+gc.freeze() moves every object allocated so far into a permanent generation
+that the collector never scans, so collections in the workers do not write
+GC bookkeeping into (and un-share) pages holding the models. Workers that
+exit unexpectedly are re-forked from the parent, without reloading.
+
+POSIX only (os.fork).
+"""
+
+import argparse
+import gc
+import os
+import signal
+import time
+
+import uvicorn
+
+from logging_config import configure_logging, flush_logging
+from metrics import registry
+
+logger = configure_logging()
+
+
+class Supervisor:
+    """Fork workers serving one shared listening socket, and keep them up"""
+
+    def __init__(self, config: uvicorn.Config, sock, workers: int):
+        self.config = config
+        self.sock = sock
+        self.workers = workers
+        self.children = set()
+        self.stopping = False
+
+    def spawn(self):
+        pid = os.fork()
+        if pid:
+            self.children.add(pid)
+            return
+
+        # Worker: default signal handling until uvicorn installs its own
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        exit_code = 0
+        try:
+            uvicorn.Server(self.config).run(sockets=[self.sock])
+        except BaseException:
+            logger.exception("Worker %d crashed", os.getpid())
+            exit_code = 1
+        finally:
+            flush_logging()
+            os._exit(exit_code)
+
+    def stop(self, signum, frame):
+        self.stopping = True
+        for pid in self.children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self):
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+        for _ in range(self.workers):
+            self.spawn()
+        logger.info(
+            "Serving on %s:%d with %d pre-forked workers",
+            self.config.host,
+            self.config.port,
+            self.workers,
+        )
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            self.children.discard(pid)
+            if not self.stopping:
+                logger.warning(
+                    "Worker %d exited with code %d, forking a replacement",
+                    pid,
+                    os.waitstatus_to_exitcode(status),
+                )
+                # Avoid a tight fork loop if workers die at startup
+                time.sleep(1)
+                self.spawn()
+        self.sock.close()
+
+
+def serve(app, preload, host: str = "0.0.0.0", port: int = 8000, workers: int = 2):
+    """Run preload() in this process, then serve `app` from forked workers"""
+    # Keep the collector from freeing objects in between the long-lived
+    # models (leaving holes that later allocations in the workers would
+    # dirty); freeze() below then takes everything out of its reach
+    gc.disable()
+    start = time.perf_counter()
+    preload()
+    registry.record_startup("prefork_preload", time.perf_counter() - start)
+
+    config = uvicorn.Config(app, host=host, port=port)
+    sock = config.bind_socket()
+    gc.freeze()
+    # The workers inherit an enabled collector that skips the frozen models
+    gc.enable()
+    Supervisor(config, sock, workers).run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--workers", type=int, default=int(os.environ.get("API_WORKERS", "2"))
+    )
+    args = parser.parse_args()
+
+    import main as api
+
+    serve(api.app, api.load_every_prosit, args.host, args.port, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+File-backed results cache with conditional GET
+
+The results endpoints (clustering metrics, performance metrics, findings,
+feature lists, dataset insights) serve data derived from files that change
+only when the analysis is re-run, yet dashboards poll them from several views.
+Each result is built once, serialized to JSON bytes and cached together with:
+
+- an ETag (hash of the body) and Last-Modified (newest source file mtime),
+  so a client revalidating with If-None-Match / If-Modified-Since gets an
+  empty 304 Not Modified
+- a gzip copy when the body is at least API_RESULTS_GZIP_MIN_BYTES (default
+  1024) bytes, served to clients that accept gzip under its own ETag (the
+  identity one with a -gzip suffix), as the two encodings are different
+  representations
+
+A result is rebuilt when one of its source files changes size or mtime
+(or appears, or disappears).
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from metrics import Counter, registry
+
+GZIP_MIN_BYTES = int(os.environ.get("API_RESULTS_GZIP_MIN_BYTES", "1024"))
+
+responses_counter = registry.register(
+    Counter(
+        "api_results_cache_responses_total",
+        "Results cache responses by outcome (hit, miss, not_modified)",
+        ("result", "outcome"),
+    )
+)
+
+
+def file_key(path: Path) -> Optional[list]:
+    """[size, mtime_ns] of a file, or None if it does not exist"""
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class CachedResult:
+    """A serialized result and its validators"""
+
+    def __init__(self, key: list, body: bytes):
+        self.key = key
+        self.body = body
+        self.etag = f'"{hashlib.sha256(body).hexdigest()[:20]}"'
+        mtimes = [k[1] for k in key if k is not None]
+        # HTTP dates have one-second resolution
+        self.last_modified_ts = int(max(mtimes) // 1_000_000_000) if mtimes else None
+        self.last_modified = (
+            formatdate(self.last_modified_ts, usegmt=True)
+            if self.last_modified_ts is not None
+            else None
+        )
+        self.gzip_body = (
+            gzip.compress(body, mtime=0) if len(body) >= GZIP_MIN_BYTES else None
+        )
+        self.gzip_etag = f'{self.etag[:-1]}-gzip"'
+
+
+class ResultsCache:
+    """Serialized results keyed by name, validated against their source files"""
+
+    def __init__(self):
+        self.entries = {}  # name -> CachedResult
+        self.lock = threading.Lock()
+
+    def get(
+        self, name: str, sources: Iterable[Path], build: Callable[[], object]
+    ) -> CachedResult:
+        """The cached result, rebuilt with build() if a source file changed"""
+        key = [file_key(Path(source)) for source in sources]
+        cached = self.entries.get(name)
+        if cached is not None and cached.key == key:
+            responses_counter.inc((name, "hit"))
+            return cached
+
+        with self.lock:
+            cached = self.entries.get(name)
+            if cached is not None and cached.key == key:
+                responses_counter.inc((name, "hit"))
+                return cached
+            body = json.dumps(build(), separators=(",", ":")).encode()
+            cached = self.entries[name] = CachedResult(key, body)
+            responses_counter.inc((name, "miss"))
+            return cached
+
+    def respond(
+        self,
+        request: Request,
+        name: str,
+        sources: Iterable[Path],
+        build: Callable[[], object],
+    ) -> Response:
+        """
+        JSON response for a cached result, honouring conditional headers and
+        Accept-Encoding
+        """
+        result = self.get(name, sources, build)
+        gzipped = result.gzip_body is not None and accepts_gzip(request)
+        headers = {
+            "ETag": result.gzip_etag if gzipped else result.etag,
+            "Cache-Control": "no-cache",
+        }
+        if result.last_modified is not None:
+            headers["Last-Modified"] = result.last_modified
+        if result.gzip_body is not None:
+            headers["Vary"] = "Accept-Encoding"
+
+        if not_modified(request, result):
+            responses_counter.inc((name, "not_modified"))
+            return Response(status_code=304, headers=headers)
+
+        if gzipped:
+            headers["Content-Encoding"] = "gzip"
+            return Response(
+                content=result.gzip_body,
+                media_type="application/json",
+                headers=headers,
+            )
+        return Response(
+            content=result.body, media_type="application/json", headers=headers
+        )
+
+
+def not_modified(request: Request, result: CachedResult) -> bool:
+    """Whether the client's cached copy (If-None-Match / If-Modified-Since) is current"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Weak comparison: W/ prefixes and -gzip suffixes (ours or a proxy's)
+        # are ignored, as both encodings hold the same data
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or any(
+            tag.replace("-gzip", "") == result.etag for tag in tags
+        )
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and result.last_modified_ts is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return result.last_modified_ts <= since
+    return False
+
+
+def accepts_gzip(request: Request) -> bool:
+    for coding in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = coding.strip().partition(";")
+        if name.strip().lower() in ("gzip", "*"):
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+results_cache = ResultsCache()
@@ -0,0 +1,470 @@
+"""
+Asynchronous CSV scoring jobs
+
+A cohort CSV is scored in the background instead of one HTTP request per
+row: POST /jobs/score stores the upload under API_JOBS_DIR and queues a job
+on the job pool (executors.job_pool, separate from the inference threads that
+serve online requests); GET /jobs/{id} reports progress and GET
+/jobs/{id}/result returns the output CSV.
+
+A job reads the CSV in chunks of API_JOB_CHUNK_ROWS rows (default 10000).
+Every model whose feature columns are all present in the header (matched by
+feature_names.pkl name or request field name) scores each chunk as one
+matrix, and the chunk's results are appended to the result file, so memory
+use does not depend on the size of the file. Rows that fail a model's
+feature checks get that model's `_error` column instead of a prediction.
+
+Each job's state is also written to status.json in its directory (after
+every chunk), so any pre-forked worker can report it and it survives a
+restart; a job whose process is gone before it finished is reported as
+failed. Jobs finished more than API_JOB_RETENTION_HOURS ago (default 24) are
+deleted, files included, and uploads larger than API_JOB_MAX_UPLOAD_MB
+(default 512) are rejected with 413.
+
+Jobs run as threads of the API process at a lower niceness (see
+executors.job_pool). That isolation is best effort only: CSV parsing and
+scoring hold the GIL the request handlers need, so a running job still adds
+latency to online requests.
+"""
+
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from fastapi import HTTPException, Request
+
+from executors import io_pool, job_pool
+from feature_vectors import VectorSchema
+from logging_config import LOGGER_NAME
+from metrics import Counter, registry, timed_import
+
+JOBS_DIR = Path(
+    os.environ.get("API_JOBS_DIR", Path(__file__).resolve().parent.parent / "jobs")
+)
+JOB_CHUNK_ROWS = int(os.environ.get("API_JOB_CHUNK_ROWS", "10000"))
+# 0 = keep finished jobs forever
+JOB_RETENTION = float(os.environ.get("API_JOB_RETENTION_HOURS", "24")) * 3600
+# 0 = no limit
+MAX_UPLOAD_BYTES = int(float(os.environ.get("API_JOB_MAX_UPLOAD_MB", "512")) * 2**20)
+# Shortest time between two sweeps for expired jobs
+CLEANUP_INTERVAL = 600
+
+JOB_ID = re.compile(r"^[0-9a-f]{32}$")
+FINISHED = ("succeeded", "failed")
+
+jobs_counter = registry.register(
+    Counter(
+        "api_jobs_total",
+        "Scoring jobs by outcome (submitted, succeeded, failed)",
+        ("status",),
+    )
+)
+job_rows_counter = registry.register(
+    Counter(
+        "api_job_rows_total",
+        "Rows scored by scoring jobs, per model and outcome (scored, error)",
+        ("model", "outcome"),
+    )
+)
+
+logger = logging.getLogger(f"{LOGGER_NAME}.jobs")
+
+
+class JobModel:
+    """A model applied by a job: its feature schema and a matrix scorer"""
+
+    def __init__(
+        self,
+        name: str,
+        schema: VectorSchema,
+        score: Callable[[np.ndarray], Dict[str, np.ndarray]],
+        version: str,
+    ):
+        self.name = name
+        self.schema = schema
+        self.score = score
+        self.version = version
+
+    def resolve(self, header: List[str]) -> Optional[List[str]]:
+        """CSV column for each feature, in feature order (None if any is missing)"""
+        columns = self.schema.csv_columns(header)
+        return None if None in columns else columns
+
+
+class ScoringJob:
+    """One uploaded CSV and its progress"""
+
+    def __init__(self, job_id: str, directory: Path):
+        self.id = job_id
+        self.directory = directory
+        self.input_path = directory / "input.csv"
+        self.result_path = directory / "result.csv"
+        self.models: List[JobModel] = []
+        # Copied to the result to identify rows (dropped if not in the CSV)
+        self.id_column: Optional[str] = None
+        self.status = "receiving"
+        self.rows_total: Optional[int] = None
+        self.rows_done = 0
+        # model name -> {"status", "scored", "errors", "version" or "missing"}
+        self.model_status: Dict[str, dict] = {}
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def to_dict(self) -> dict:
+        elapsed = None
+        if self.started_at is not None:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+        progress = None
+        if self.status == "succeeded":
+            progress = 1.0
+        elif self.rows_total:
+            progress = round(min(self.rows_done / self.rows_total, 1.0), 4)
+        return {
+            "id": self.id,
+            "status": self.status,
+            "rows_total": self.rows_total,
+            "rows_done": self.rows_done,
+            "progress": progress,
+            "rows_per_second": (
+                round(self.rows_done / elapsed, 1) if elapsed else None
+            ),
+            "models": self.model_status,
+            "id_column": self.id_column,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result_url": (
+                f"/jobs/{self.id}/result" if self.status == "succeeded" else None
+            ),
+            "pid": os.getpid(),
+        }
+
+    def save_status(self):
+        tmp_path = self.directory / "status.json.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, self.directory / "status.json")
+
+    # ------------------------------------------------------------------------
+    # Running (on the job pool)
+    # ------------------------------------------------------------------------
+
+    def run(self):
+        self.status = "running"
+        self.started_at = time.time()
+        self.save_status()
+        try:
+            self._score()
+            self.status = "succeeded"
+        except Exception as e:
+            logger.exception("Scoring job %s failed", self.id)
+            self.status = "failed"
+            self.error = str(e)
+        self.finished_at = time.time()
+        jobs_counter.inc((self.status,))
+        self.save_status()
+        logger.info(
+            "Scoring job %s %s: %d rows in %.1fs",
+            self.id,
+            self.status,
+            self.rows_done,
+            self.finished_at - self.started_at,
+        )
+
+    def _score(self):
+        pd = timed_import("pandas")
+        self.rows_total = count_rows(self.input_path)
+        header = list(pd.read_csv(self.input_path, nrows=0).columns)
+        if self.id_column not in header:
+            self.id_column = None
+
+        usable = []
+        for model in self.models:
+            columns = model.resolve(header)
+            if columns is None:
+                missing = [
+                    feature
+                    for feature, column in zip(
+                        model.schema.feature_names, model.schema.csv_columns(header)
+                    )
+                    if column is None
+                ]
+                self.model_status[model.name] = {
+                    "status": "skipped",
+                    "missing": missing,
+                }
+            else:
+                usable.append((model, columns))
+                self.model_status[model.name] = {
+                    "status": "scoring",
+                    "scored": 0,
+                    "errors": 0,
+                    "version": model.version,
+                }
+        if not usable:
+            raise ValueError("No model has all of its feature columns in the CSV")
+        self.save_status()
+
+        needed = {column for _, columns in usable for column in columns}
+        if self.id_column is not None:
+            needed.add(self.id_column)
+        tmp_path = self.directory / "result.csv.tmp"
+        with open(tmp_path, "w", newline="") as out:
+            chunks = pd.read_csv(
+                self.input_path,
+                usecols=lambda column: column in needed,
+                chunksize=JOB_CHUNK_ROWS,
+            )
+            for i, chunk in enumerate(chunks):
+                result = self._score_chunk(pd, chunk, usable)
+                result.to_csv(out, header=(i == 0), index=False)
+                self.rows_done += len(chunk)
+                self.save_status()
+                # Give the online handlers' threads the GIL between chunks
+                time.sleep(0)
+        os.replace(tmp_path, self.result_path)
+        for model, _ in usable:
+            self.model_status[model.name]["status"] = "scored"
+
+    def _score_chunk(self, pd, chunk, usable):
+        n = len(chunk)
+        result = pd.DataFrame(
+            {"row": np.arange(self.rows_done, self.rows_done + n)}
+        )
+        if self.id_column is not None:
+            result[self.id_column] = chunk[self.id_column].to_numpy()
+
+        for model, columns in usable:
+            X = np.empty((n, len(columns)), dtype=np.float64)
+            for j, column in enumerate(columns):
+                # Non-numeric cells become NaN and fail the finiteness check
+                X[:, j] = pd.to_numeric(chunk[column], errors="coerce")
+            errors = model.schema.row_errors(X) if n else {}
+            ok = np.ones(n, dtype=bool)
+            ok[list(errors)] = False
+
+            outputs = model.score(X[ok]) if ok.any() else {}
+            for name, values in outputs.items():
+                values = np.asarray(values)
+                if values.dtype.kind in "biu":
+                    column = pd.Series(pd.NA, index=result.index, dtype="Int64")
+                else:
+                    column = pd.Series(np.nan, index=result.index, dtype="float64")
+                column[ok] = values
+                result[f"{model.name}_{name}"] = column
+            messages = np.full(n, "", dtype=object)
+            for row, message in errors.items():
+                messages[row] = message
+            result[f"{model.name}_error"] = messages
+
+            status = self.model_status[model.name]
+            status["scored"] += int(ok.sum())
+            status["errors"] += len(errors)
+            job_rows_counter.inc((model.name, "scored"), int(ok.sum()))
+            if errors:
+                job_rows_counter.inc((model.name, "error"), len(errors))
+        return result
+
+
+def process_alive(pid: Optional[int]) -> bool:
+    if pid is None:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def count_rows(path: Path) -> int:
+    """Data rows in a CSV (line count minus the header), for progress"""
+    lines = 0
+    last = b"\n"
+    with open(path, "rb") as f:
+        while block := f.read(1 << 20):
+            lines += block.count(b"\n")
+            last = block[-1:]
+    if last != b"\n":
+        lines += 1
+    return max(lines - 1, 0)
+
+
+class JobManager:
+    """Scoring jobs by id, in memory and under JOBS_DIR"""
+
+    def __init__(self, jobs_dir: Path, retention: float):
+        self.jobs_dir = jobs_dir
+        self.retention = retention
+        self.jobs: Dict[str, ScoringJob] = {}
+        self.lock = threading.Lock()
+        self.last_cleanup = 0.0
+
+    def create(self) -> ScoringJob:
+        """New job directory (blocking: call on the I/O pool)"""
+        if time.monotonic() - self.last_cleanup >= CLEANUP_INTERVAL:
+            self.last_cleanup = time.monotonic()
+            self.cleanup()
+        job_id = uuid.uuid4().hex
+        directory = self.jobs_dir / job_id
+        directory.mkdir(parents=True)
+        job = ScoringJob(job_id, directory)
+        with self.lock:
+            self.jobs[job_id] = job
+        return job
+
+    def start(self, job: ScoringJob):
+        """Queue a job whose input is stored (503 if the job queue is full)"""
+        job.status = "queued"
+        job.save_status()
+        try:
+            job_pool.submit(job.run)
+        except HTTPException:
+            self.discard(job)
+            raise
+        jobs_counter.inc(("submitted",))
+
+    def discard(self, job: ScoringJob):
+        with self.lock:
+            self.jobs.pop(job.id, None)
+        shutil.rmtree(job.directory, ignore_errors=True)
+
+    def cleanup(self) -> int:
+        """
+        Delete jobs that finished more than `retention` seconds ago, from
+        memory and JOBS_DIR, including those of other or earlier processes
+        """
+        if not self.retention or not self.jobs_dir.is_dir():
+            return 0
+        cutoff = time.time() - self.retention
+        removed = 0
+        for directory in self.jobs_dir.iterdir():
+            job_id = directory.name
+            if not JOB_ID.match(job_id):
+                continue
+            job = self.jobs.get(job_id)
+            status = job.to_dict() if job is not None else self.load_status(job_id)
+            if status is None:
+                # Never queued (upload cut off by a crash): go by file times
+                try:
+                    finished = max(
+                        [directory.stat().st_mtime]
+                        + [path.stat().st_mtime for path in directory.iterdir()]
+                    )
+                except OSError:
+                    continue
+            elif status["status"] in FINISHED:
+                finished = status["finished_at"] or status["created_at"]
+            else:
+                continue
+            if finished < cutoff:
+                with self.lock:
+                    self.jobs.pop(job_id, None)
+                shutil.rmtree(directory, ignore_errors=True)
+                removed += 1
+        if removed:
+            logger.info("Deleted %d expired scoring job(s)", removed)
+        return removed
+
+    def load_status(self, job_id: str) -> Optional[dict]:
+        """A job's status.json (None if absent), failed if its process died"""
+        try:
+            with open(self.jobs_dir / job_id / "status.json") as f:
+                status = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if status["status"] not in FINISHED and not process_alive(status.get("pid")):
+            status["status"] = "failed"
+            status["error"] = "Interrupted by a server restart"
+        return status
+
+    def get(self, job_id: str) -> dict:
+        """Status of a job (404 if unknown), from memory or status.json"""
+        job = self.jobs.get(job_id)
+        # A finished job's files may have been expired by another worker
+        if job is not None and (job.status not in FINISHED or job.directory.is_dir()):
+            return job.to_dict()
+        if JOB_ID.match(job_id):
+            status = self.load_status(job_id)
+            if status is not None:
+                return status
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+
+    def result_path(self, job_id: str) -> Path:
+        """Result file of a finished job (404 unknown, 409 not finished)"""
+        status = self.get(job_id)
+        if status["status"] != "succeeded":
+            raise HTTPException(
+                status_code=409,
+                detail=f"Job '{job_id}' is {status['status']}, no result yet",
+            )
+        return self.jobs_dir / job_id / "result.csv"
+
+
+def upload_too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"CSV upload larger than {max_bytes / 2**20:g} MB",
+    )
+
+
+def copy_upload(source, target, max_bytes: int) -> int:
+    """Copy a spooled multipart file to `target`; bytes copied (413 past max)"""
+    size = 0
+    while block := source.read(1 << 20):
+        size += len(block)
+        if max_bytes and size > max_bytes:
+            raise upload_too_large(max_bytes)
+        target.write(block)
+    return size
+
+
+async def save_upload(
+    request: Request, path: Path, max_bytes: int = MAX_UPLOAD_BYTES
+):
+    """
+    Write a raw or multipart (field "file") CSV body to disk as it arrives,
+    on the I/O pool; 413 once it is larger than max_bytes (0 = no limit)
+    """
+    declared = request.headers.get("content-length", "")
+    if max_bytes and declared.isdigit() and int(declared) > max_bytes:
+        raise upload_too_large(max_bytes)
+
+    content_type = request.headers.get("content-type", "")
+    f = await io_pool.run(open, path, "wb")
+    try:
+        if content_type.startswith("multipart/form-data"):
+            form = await request.form()
+            upload = form.get("file")
+            if upload is None or isinstance(upload, str):
+                raise HTTPException(
+                    status_code=422, detail="Expected a CSV file in the 'file' field"
+                )
+            size = await io_pool.run(copy_upload, upload.file, f, max_bytes)
+        else:
+            size = 0
+            async for data in request.stream():
+                if data:
+                    size += len(data)
+                    if max_bytes and size > max_bytes:
+                        raise upload_too_large(max_bytes)
+                    await io_pool.run(f.write, data)
+    finally:
+        await io_pool.run(f.close)
+    if size == 0:
+        raise HTTPException(status_code=422, detail="Empty CSV upload")
+
+
+scoring_jobs = JobManager(JOBS_DIR, JOB_RETENTION)
@@ -2,8 +2,10 @@
 Test script for the Student Probation Risk Prediction API
 """
 
+import io
 import requests
 import json
+import numpy as np
 
 # API base URL
 API_URL = "http://localhost:8000"
@@ -235,6 +237,642 @@ def test_all_models():
     print()
 
 
+def test_batch_prediction(model_name="baseline_logistic"):
+    """Test batch prediction (one request, many students)"""
+    print("=" * 80)
+    print(f"TEST 8: Batch Prediction ({model_name})")
+    print("=" * 80)
+    
+    good_student = {
+        "mark": 73.68,
+        "subject_credit": 1.0,
+        "cgpa_y": 3.04,
+        "gpa_y": 3.09,
+        "grade_point": 3.0,
+        "cgpa_x": 3.04,
+        "yeargroup": 2024.0,
+        "gpa_x": 3.09,
+        "semester_year_y": 6.0,
+        "academic_year_y": 9.0,
+        "grade": 1.0,
+        "course_offering_plan_name": 0.0,
+        "admission_year": 1.0,
+        "grade_system": 6.0,
+        "academic_year_x": 0.0,
+        "offer_type": 9.0,
+        "offer_course_name": 3.0,
+        "extra_question_type_of_exam": 0.0,
+        "semester_year_x": 1.0,
+        "program": 0.0,
+        "kmeans_cluster": 3,
+        "hierarchical_cluster": -1,
+        "gmm_cluster": -1
+    }
+    at_risk_student = dict(good_student, mark=45.0, cgpa_y=1.8, gpa_y=1.7,
+                           grade_point=1.0, cgpa_x=1.8, gpa_x=1.7, grade=5.0)
+    
+    response = requests.post(
+        f"{API_URL}/prosit3/predict/{model_name}/batch",
+        json={"records": [good_student, at_risk_student] * 50}
+    )
+    
+    print(f"Status Code: {response.status_code}")
+    assert response.status_code == 200, response.text
+    result = response.json()
+    print(f"Records Scored: {result['n_records']}")
+    for i, row in enumerate(result['predictions'][:2]):
+        print(f"  Row {i}: risk={row['probation_risk']} "
+              f"probability={row['probability']:.4f} confidence={row['confidence']}")
+    assert result["n_records"] == len(result["predictions"]) == 100
+    
+    # Every row must match what the single-row endpoint says for it
+    for i, student in enumerate([good_student, at_risk_student]):
+        single = requests.post(
+            f"{API_URL}/prosit3/predict/{model_name}", json=student
+        ).json()
+        assert single["model_used"] == result["model_used"]
+        for row in result["predictions"][i::2]:
+            assert row["probation_risk"] == single["probation_risk"]
+            assert row["confidence"] == single["confidence"]
+            assert np.isclose(row["probability"], single["probability"],
+                              rtol=1e-9, atol=1e-12)
+    print("✅ Batch rows match single-row predictions")
+    print()
+
+
+def test_vector_prediction(model_name="baseline_logistic"):
+    """Test prediction from raw feature vectors (/prosit3/features order)"""
+    print("=" * 80)
+    print(f"TEST 9: Raw Vector Prediction ({model_name})")
+    print("=" * 80)
+    
+    # mark, subject_credit, cgpa_y, gpa_y, grade_point, cgpa_x, yeargroup,
+    # gpa_x, semester_year_y, academic_year_y, grade,
+    # course_offering_plan_name, admission_year, grade_system,
+    # academic_year_x, offer_type, offer_course_name,
+    # extra_question_type_of_exam, semester_year_x, program, kmeans_cluster,
+    # hierarchical_cluster, gmm_cluster
+    good_student = [73.68, 1.0, 3.04, 3.09, 3.0, 3.04, 2024.0, 3.09, 6.0, 9.0,
+                    1.0, 0.0, 1.0, 6.0, 0.0, 9.0, 3.0, 0.0, 1.0, 0.0, 3, -1, -1]
+    
+    response = requests.post(
+        f"{API_URL}/prosit3/predict/{model_name}/vector",
+        json={"features": [good_student] * 100}
+    )
+    
+    print(f"Status Code: {response.status_code}")
+    if response.status_code == 200:
+        result = response.json()
+        row = result['predictions'][0]
+        print(f"Records Scored: {result['n_records']}")
+        print(f"  Row 0: risk={row['probation_risk']} "
+              f"probability={row['probability']:.4f} confidence={row['confidence']}")
+    else:
+        print(f"Response: {response.text}")
+    
+    response = requests.post(
+        f"{API_URL}/prosit3/predict/{model_name}/vector",
+        json={"features": good_student[:-1]}
+    )
+    print(f"Short vector: {response.status_code} {response.json()['detail'][0]['msg']}")
+    assert response.status_code == 422
+    print()
+
+
+def test_bulk_prediction(model_name="ensemble"):
+    """Test columnar .npy scoring against the vector endpoint"""
+    print("=" * 80)
+    print(f"TEST 10: Bulk .npy Prediction ({model_name})")
+    print("=" * 80)
+    
+    # Same student as test_vector_prediction, in /prosit3/features order
+    good_student = [73.68, 1.0, 3.04, 3.09, 3.0, 3.04, 2024.0, 3.09, 6.0, 9.0,
+                    1.0, 0.0, 1.0, 6.0, 0.0, 9.0, 3.0, 0.0, 1.0, 0.0, 3, -1, -1]
+    X = np.array([good_student] * 1000)
+    X[:, 0] = np.linspace(0, 100, 1000)  # vary the mark
+    
+    buffer = io.BytesIO()
+    np.save(buffer, X)
+    response = requests.post(
+        f"{API_URL}/prosit3/predict/{model_name}/bulk",
+        data=buffer.getvalue(),
+        headers={"Content-Type": "application/x-npy"}
+    )
+    
+    print(f"Status Code: {response.status_code}")
+    assert response.status_code == 200, response.text
+    result = np.load(io.BytesIO(response.content))
+    print(f"Rows Scored: {len(result)}, columns {result.dtype.names}, "
+          f"model {response.headers['X-Model-Used']} "
+          f"v{response.headers['X-Model-Version']}")
+    print(f"At risk: {int(result['probation_risk'].sum())} of {len(result)}")
+    
+    vector = requests.post(
+        f"{API_URL}/prosit3/predict/{model_name}/vector",
+        json={"features": X.tolist()}
+    ).json()
+    assert result["probation_risk"].tolist() == [
+        p["probation_risk"] for p in vector["predictions"]
+    ]
+    print("✅ Matches /vector")
+    print()
+
+
+def test_stream_prediction(model_name="ensemble"):
+    """Test NDJSON streaming: one result line per record, then a summary"""
+    print("=" * 80)
+    print(f"TEST 11: Streaming NDJSON Prediction ({model_name})")
+    print("=" * 80)
+    
+    features = requests.get(f"{API_URL}/prosit3/features").json()
+    good_student = [73.68, 1.0, 3.04, 3.09, 3.0, 3.04, 2024.0, 3.09, 6.0, 9.0,
+                    1.0, 0.0, 1.0, 6.0, 0.0, 9.0, 3.0, 0.0, 1.0, 0.0, 3, -1, -1]
+    field_names = [
+        "mark", "subject_credit", "cgpa_y", "gpa_y", "grade_point", "cgpa_x",
+        "yeargroup", "gpa_x", "semester_year_y", "academic_year_y", "grade",
+        "course_offering_plan_name", "admission_year", "grade_system",
+        "academic_year_x", "offer_type", "offer_course_name",
+        "extra_question_type_of_exam", "semester_year_x", "program",
+        "kmeans_cluster", "hierarchical_cluster", "gmm_cluster",
+    ]
+    assert len(field_names) == len(features["features"])
+    record = dict(zip(field_names, good_student))
+    
+    def records(n):
+        # Uploaded as it is generated (chunked transfer encoding)
+        for i in range(n):
+            yield (json.dumps({**record, "id": i}) + "\n").encode()
+        yield (json.dumps({**record, "gpa_y": 5.0}) + "\n").encode()
+    
+    response = requests.post(
+        f"{API_URL}/prosit3/predict/{model_name}/stream?chunk_rows=100",
+        data=records(1000),
+        headers={"Content-Type": "application/x-ndjson"},
+        stream=True
+    )
+    
+    print(f"Status Code: {response.status_code}")
+    lines = [json.loads(line) for line in response.iter_lines() if line]
+    summary = lines[-1]["summary"]
+    print(f"Summary: {summary}")
+    print(f"  Line 1: {lines[0]}")
+    print(f"  Line 1001: {lines[-2]}")
+    assert [line.get("id") for line in lines[:1000]] == list(range(1000))
+    assert "error" in lines[1000]
+    assert summary["scored"] == 1000 and summary["errors"] == 1
+    
+    # Malformed lines (not UTF-8, not JSON) get error lines, wherever they are
+    valid = json.dumps(record).encode() + b"\n"
+    response = requests.post(
+        f"{API_URL}/prosit3/predict/{model_name}/stream",
+        data=b"\xff{\n" + valid + b"\xff{\n" + b"not json\n" + valid,
+        headers={"Content-Type": "application/x-ndjson"}
+    )
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    print(f"Malformed lines: {[line.get('error', 'ok') for line in lines[:-1]]}")
+    assert response.status_code == 200
+    assert [line["line"] for line in lines[:-1]] == [1, 2, 3, 4, 5]
+    for line in (lines[0], lines[2], lines[3]):
+        assert line["error"].startswith("Invalid JSON")
+    assert "error" not in lines[1] and "error" not in lines[4]
+    assert lines[-1]["summary"]["errors"] == 3
+    print()
+
+
+def test_chained_prediction(model_name="ensemble"):
+    """Test raw Prosit 2 features -> clusters -> probation risk in one call"""
+    print("=" * 80)
+    print(f"TEST 12: Chained Prosit 2 -> Prosit 3 Prediction ({model_name})")
+    print("=" * 80)
+    
+    # All 32 Prosit 2 features; no cluster fields
+    student_data = {
+        "mark": 73.68, "gpa_y": 3.09, "cgpa_y": 3.04, "grade_point": 3.0,
+        "subject_credit": 1.0, "cgpa_x": 3.04, "yeargroup": 2024.0,
+        "gpa_x": 3.09, "education_block_1_level": 2.0,
+        "latest_education_level": 3.0, "offer_course_name": 3.0,
+        "offer_type": 9.0, "extra_question_level_education_3": 2.0,
+        "extra_question_is_alive_3": 1.0,
+        "extra_question_level_education_2": 2.0,
+        "education_block_2_level": 2.0, "extra_question_is_alive_2": 1.0,
+        "extra_question_family_admission": 0.0, "extra_question_is_alive": 1.0,
+        "extra_question_is_alive_1": 1.0, "academic_year_x": 0.0,
+        "semester_year_x": 1.0, "extra_question_type_of_exam": 0.0,
+        "gender": 1.0, "semester_year_y": 6.0, "grade_system": 6.0,
+        "grade": 1.0, "academic_year_y": 9.0, "course_offering_plan_name": 0.0,
+        "nationality": 0.0, "admission_year": 1.0, "program": 0.0
+    }
+    
+    response = requests.post(
+        f"{API_URL}/prosit3/predict/{model_name}/chained",
+        json=student_data
+    )
+    print(f"Status Code: {response.status_code}")
+    result = response.json()
+    print(f"Response: {json.dumps(result, indent=2)}")
+    
+    # Same result as the four calls it replaces
+    clusters = {
+        f"{algorithm}_cluster": requests.post(
+            f"{API_URL}/prosit2/cluster/{algorithm}", json=student_data
+        ).json()["cluster"]
+        for algorithm in ("kmeans", "hierarchical", "gmm")
+    }
+    # Prosit 3 ignores the Prosit 2-only fields; the sampled clusterings get
+    # -1, the value most training rows had
+    reference = requests.post(
+        f"{API_URL}/prosit3/predict/{model_name}",
+        json={**student_data, "kmeans_cluster": clusters["kmeans_cluster"],
+              "hierarchical_cluster": -1, "gmm_cluster": -1}
+    ).json()
+    assert result["clusters"] == clusters
+    assert np.isclose(result["probability"], reference["probability"], rtol=1e-9)
+    
+    at_risk_student = dict(student_data, mark=45.0, cgpa_y=1.8, gpa_y=1.7,
+                           grade_point=1.0, cgpa_x=1.8, gpa_x=1.7, grade=5.0)
+    response = requests.post(
+        f"{API_URL}/prosit3/predict/{model_name}/chained/batch",
+        json={"records": [student_data, at_risk_student] * 50}
+    )
+    print(f"Batch Status Code: {response.status_code}")
+    batch = response.json()
+    print(f"Records Scored: {batch['n_records']}")
+    for i, row in enumerate(batch['predictions'][:2]):
+        print(f"  Row {i}: risk={row['probation_risk']} "
+              f"probability={row['probability']:.4f} clusters={row['clusters']}")
+    assert batch["predictions"][0]["clusters"] == clusters
+    # Equal up to rounding (a batch is scored with one matrix product)
+    assert np.isclose(
+        batch["predictions"][0]["probability"], result["probability"], rtol=1e-9
+    )
+    print()
+
+
+def test_metrics():
+    """Test the Prometheus metrics endpoint and Server-Timing header"""
+    print("=" * 80)
+    print("TEST 13: Metrics and Server-Timing")
+    print("=" * 80)
+    
+    response = requests.get(f"{API_URL}/prosit3/models/info")
+    print(f"Server-Timing: {response.headers.get('Server-Timing')}")
+    
+    response = requests.get(f"{API_URL}/metrics")
+    print(f"Status Code: {response.status_code}")
+    print(f"Content-Type: {response.headers.get('Content-Type')}")
+    assert response.status_code == 200
+    for line in response.text.splitlines():
+        if line.startswith("api_requests_total"):
+            print(f"  {line}")
+    
+    # Counter values render at full precision, whole numbers without a
+    # decimal point
+    from metrics import Counter
+    
+    counter = Counter("test_bytes_total", "Bytes", ("kind",))
+    counter.inc(("rows",), 123456789)
+    counter.inc(("seconds",), 0.1 + 0.2)
+    rendered = counter.render()
+    print(f"Rendered: {rendered[2:]}")
+    assert 'test_bytes_total{kind="rows"} 123456789' in rendered
+    assert 'test_bytes_total{kind="seconds"} 0.30000000000000004' in rendered
+    print()
+
+
+def test_startup_timings():
+    """Test the startup timing breakdown"""
+    print("=" * 80)
+    print("TEST 14: Startup Timings")
+    print("=" * 80)
+    
+    response = requests.get(f"{API_URL}/startup")
+    print(f"Status Code: {response.status_code}")
+    assert response.status_code == 200
+    result = response.json()
+    print(f"Model loading: {result['model_loading']} (loaded: {result['loaded']})")
+    for phase, seconds in result["phases"].items():
+        print(f"  {phase}: {seconds * 1000:.1f} ms")
+    print(f"Artifacts timed: {len(result['artifacts'])}")
+    
+    assert result["model_loading"] in ("eager", "lazy", "background")
+    if result["model_loading"] == "eager":
+        assert set(result["loaded"]) == {"prosit2", "prosit3", "prosit5"}
+    # Every loaded prosit reports its loading time and its artifacts
+    assert "imports" in result["phases"]
+    for prosit in result["loaded"]:
+        assert prosit in result["phases"]
+        number = prosit[len("prosit"):]
+        assert any(path.startswith(f"prosit {number}/") for path in result["artifacts"])
+    timings = [*result["phases"].values(), *result["imports"].values(),
+               *result["artifacts"].values()]
+    assert all(seconds >= 0 for seconds in timings)
+    print()
+
+
+def test_memory_report():
+    """Test the per-worker shared/private memory report"""
+    print("=" * 80)
+    print("TEST 15: Worker Memory")
+    print("=" * 80)
+    
+    response = requests.get(f"{API_URL}/memory")
+    print(f"Status Code: {response.status_code}")
+    # 501 where /proc is not available (not Linux)
+    assert response.status_code in (200, 501)
+    if response.status_code == 200:
+        result = response.json()
+        mib = 1024 * 1024
+        print(f"PID: {result['pid']} (mmap models: {result['mmap_models']})")
+        print(f"RSS: {result['rss_bytes'] / mib:.1f} MiB")
+        print(f"Shared: {result['shared_bytes'] / mib:.1f} MiB")
+        print(f"Private: {result['private_bytes'] / mib:.1f} MiB")
+        assert result["pid"] > 0 and isinstance(result["mmap_models"], bool)
+        # Resident pages are either shared or private; PSS counts a
+        # shared page only in part
+        assert result["rss_bytes"] > 0
+        assert result["shared_bytes"] + result["private_bytes"] == result["rss_bytes"]
+        assert result["private_bytes"] <= result["pss_bytes"] <= result["rss_bytes"]
+    print()
+
+
+def test_model_versions():
+    """Test model set versions and the admin reload endpoint"""
+    print("=" * 80)
+    print("TEST 16: Model Versions")
+    print("=" * 80)
+    
+    response = requests.get(f"{API_URL}/")
+    print(f"Status Code: {response.status_code}")
+    if response.status_code == 200:
+        for prosit, version in response.json()["model_loading"]["versions"].items():
+            print(f"  {prosit}: {version}")
+    
+    # Without X-Admin-Token the reload endpoint must refuse (401, or 403
+    # when API_ADMIN_TOKEN is not configured)
+    response = requests.post(f"{API_URL}/admin/models/reload")
+    print(f"Reload without token: {response.status_code}")
+    assert response.status_code in (401, 403)
+    print()
+
+
+def test_model_reload():
+    """Test the model set swap and the directory watcher's failure handling"""
+    import logging
+    import tempfile
+    import time
+    from pathlib import Path
+
+    from logging_config import LOGGER_NAME
+    from model_registry import ModelRegistry
+
+    print("=" * 80)
+    print("TEST 17: Model Set Reload")
+    print("=" * 80)
+    
+    directory = Path(tempfile.mkdtemp())
+    (directory / "model.txt").write_text("v1")
+    builds = []
+
+    def loader():
+        content = (directory / "model.txt").read_text()
+        builds.append(content)
+        if content == "broken":
+            raise ValueError("Unreadable model")
+        return {"content": content}
+
+    registry = ModelRegistry()
+    registry.register("test", loader, directory)
+    registry.ensure_loaded("test")
+    old_set = registry.get("test")
+    
+    # A reload publishes a whole new set; holders of the old one keep it
+    (directory / "model.txt").write_text("v2")
+    new_set = registry.reload("test")
+    print(f"Versions: {old_set['version']} -> {new_set['version']}")
+    assert registry.get("test") is new_set and new_set["content"] == "v2"
+    assert old_set["content"] == "v1" and old_set["version"] != new_set["version"]
+    
+    # A failing reload leaves the current set in place
+    (directory / "model.txt").write_text("broken")
+    try:
+        registry.reload("test")
+        raise AssertionError("reload of a broken directory succeeded")
+    except ValueError:
+        pass
+    assert registry.get("test") is new_set
+    
+    # The watcher tries a broken directory once, not on every poll
+    # Expected traceback: keep it out of the test output
+    logging.getLogger(f"{LOGGER_NAME}.models").disabled = True
+    registry.watch(0.05)
+    (directory / "model.txt").write_text("broken!")
+    (directory / "model.txt").write_text("broken")
+    time.sleep(0.6)
+    logging.getLogger(f"{LOGGER_NAME}.models").disabled = False
+    attempts = builds.count("broken")
+    print(f"Builds of the broken directory: {attempts}")
+    assert attempts == 2
+    (directory / "model.txt").write_text("v3")
+    time.sleep(0.4)
+    assert registry.get("test")["content"] == "v3"
+    print()
+
+
+def test_executor_cancellation():
+    """Test that a request cancelled while queued gives its slot back"""
+    import asyncio
+    import threading
+
+    from executors import BoundedExecutor
+
+    print("=" * 80)
+    print("TEST 18: Executor Cancellation")
+    print("=" * 80)
+    
+    executor = BoundedExecutor("test", max_workers=1, max_queue_depth=4)
+    release = threading.Event()
+
+    async def scenario():
+        blocker = asyncio.ensure_future(executor.run(release.wait))
+        await asyncio.sleep(0.05)
+        waiting = asyncio.ensure_future(executor.run(lambda: None))
+        await asyncio.sleep(0.05)
+        print(f"Before cancel: queued={executor.queued}, active={executor.active}")
+        # What a disconnecting client does to its handler coroutine
+        waiting.cancel()
+        await asyncio.sleep(0.05)
+        release.set()
+        await blocker
+    
+    asyncio.run(scenario())
+    print(f"After drain: queued={executor.queued}, active={executor.active}")
+    assert (executor.queued, executor.active) == (0, 0)
+    
+    executor.submit(release.wait)
+    executor.shutdown()
+    print(f"After shutdown: queued={executor.queued}")
+    assert executor.queued == 0
+    print()
+
+
+def test_batch_score_cli():
+    """Test the offline batch scoring CLI: output, resume and --restart"""
+    import csv
+    import shutil
+    import subprocess
+    import sys
+    import tempfile
+    from pathlib import Path
+
+    print("=" * 80)
+    print("TEST 19: Offline Batch Scoring")
+    print("=" * 80)
+    
+    good_student = {
+        "mark": 73.68,
+        "subject_credit": 1.0,
+        "cgpa_y": 3.04,
+        "gpa_y": 3.09,
+        "grade_point": 3.0,
+        "cgpa_x": 3.04,
+        "yeargroup": 2024.0,
+        "gpa_x": 3.09,
+        "semester_year_y": 6.0,
+        "academic_year_y": 9.0,
+        "grade": 1.0,
+        "course_offering_plan_name": 0.0,
+        "admission_year": 1.0,
+        "grade_system": 6.0,
+        "academic_year_x": 0.0,
+        "offer_type": 9.0,
+        "offer_course_name": 3.0,
+        "extra_question_type_of_exam": 0.0,
+        "semester_year_x": 1.0,
+        "program": 0.0,
+        "kmeans_cluster": 3
+    }
+    at_risk_student = dict(good_student, mark=45.0, cgpa_y=1.8, gpa_y=1.7,
+                           grade_point=1.0, cgpa_x=1.8, gpa_x=1.7, grade=5.0)
+    
+    # No Hierarchical/GMM cluster columns: the CLI fills them with -1
+    directory = Path(tempfile.mkdtemp())
+    csv_path = directory / "cohort.csv"
+    with open(csv_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(good_student))
+        writer.writeheader()
+        writer.writerows([good_student, at_risk_student] * 125)
+
+    def run(output, *options):
+        return subprocess.run(
+            [sys.executable, "batch_score.py", str(csv_path), str(output),
+             "--chunk-rows", "100", "--processes", "1", "--algorithms", "",
+             *options],
+            cwd=Path(__file__).resolve().parent,
+            capture_output=True,
+            text=True,
+        )
+    
+    try:
+        reference_path = directory / "reference.npy"
+        completed = run(reference_path)
+        print(completed.stdout)
+        assert completed.returncode == 0, completed.stderr
+        reference = np.load(reference_path)
+        assert len(reference) == 250
+        assert (reference["row"] == np.arange(250)).all()
+        assert reference["prosit3_valid"].all()
+        assert not (directory / "reference.npy.parts").exists()
+        
+        # Each row matches a single-row request with the filled-in clusters
+        for i, student in enumerate([good_student, at_risk_student]):
+            single = requests.post(
+                f"{API_URL}/prosit3/predict/ensemble",
+                json=dict(student, hierarchical_cluster=-1, gmm_cluster=-1)
+            ).json()
+            rows = reference[i::2]
+            assert (rows["prosit3_probation_risk"] == single["probation_risk"]).all()
+            assert np.allclose(rows["prosit3_probability"], single["probability"],
+                               rtol=1e-9, atol=1e-12)
+        
+        # Interrupt a run after its chunks: the output path is a directory,
+        # so joining the parts fails
+        output = directory / "scores.npy"
+        parts_dir = directory / "scores.npy.parts"
+        output.mkdir()
+        assert run(output).returncode != 0
+        output.rmdir()
+        (parts_dir / "part-000000.npy").unlink()
+        (parts_dir / "part-000002.npy").unlink()
+        
+        # Different options cannot reuse the parts; the same ones resume
+        completed = run(output, "--prosit3-model", "baseline_logistic")
+        assert completed.returncode != 0 and "--restart" in completed.stderr
+        completed = run(output)
+        print(completed.stdout)
+        assert completed.returncode == 0, completed.stderr
+        assert "Resumed: 1 chunk(s) were already scored" in completed.stdout
+        assert (np.load(output) == reference).all()
+        assert not parts_dir.exists()
+        
+        # --restart discards the parts of an unfinished run
+        output.unlink()
+        output.mkdir()
+        run(output)
+        output.rmdir()
+        completed = run(output, "--restart")
+        assert completed.returncode == 0, completed.stderr
+        assert "Resumed" not in completed.stdout
+        assert (np.load(output) == reference).all()
+        print("✅ Output, resume and --restart verified")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    print()
+
+
+def test_compiled_linear_models():
+    """Test the scaler-folded linear evaluator against sklearn"""
+    from pathlib import Path
+    import joblib
+    from compiled_models import compile_linear_models, predict_linear
+    from compiled_models import synthetic_rows
+
+    print("=" * 80)
+    print("TEST 20: Compiled Linear Models")
+    print("=" * 80)
+    
+    models_dir = Path(__file__).resolve().parent.parent / "models" / "prosit 3"
+    scaler = joblib.load(models_dir / "scaler.pkl")
+    models = {
+        name: joblib.load(models_dir / f"{name}.pkl")
+        for name in ("baseline_logistic", "lasso_logistic", "ridge_logistic",
+                     "elastic_net_logistic")
+    }
+    compiled = compile_linear_models(scaler, models)
+    assert compiled is not None and set(compiled["names"]) == set(models)
+    
+    X = synthetic_rows(scaler, n_rows=2000, seed=1)
+    X_scaled = scaler.transform(X)
+    all_predictions, all_probabilities = predict_linear(compiled, X)
+    for name, model in models.items():
+        predictions, probabilities = predict_linear(compiled, X, name)
+        i = compiled["index"][name]
+        # One model or all stacked: the same up to matmul rounding
+        assert np.allclose(probabilities, all_probabilities[i], rtol=1e-9, atol=1e-12)
+        # Labels can only differ for rows on the decision boundary
+        decided = np.abs(model.decision_function(X_scaled)) > 1e-7
+        assert np.array_equal(predictions[decided], model.predict(X_scaled)[decided])
+        if hasattr(model, "predict_proba"):
+            assert np.allclose(probabilities, model.predict_proba(X_scaled)[:, 1],
+                               rtol=1e-7, atol=1e-9)
+        else:
+            # RidgeClassifierCV: the endpoints report the class as probability
+            assert np.array_equal(probabilities, predictions)
+        single = predict_linear(compiled, X[:1], name)
+        assert np.isclose(single[1][0], probabilities[0], rtol=1e-9, atol=1e-12)
+        print(f"✅ {name}: {len(X)} rows match sklearn")
+    print()
+
+
 def run_all_tests():
     """Run all tests"""
     try:
@@ -245,6 +883,22 @@ def run_all_tests():
         test_at_risk_student()
         test_ensemble_prediction()
         test_all_models()
+        test_batch_prediction()
+        test_batch_prediction("ensemble")
+        test_vector_prediction()
+        test_vector_prediction("ensemble")
+        test_bulk_prediction()
+        test_stream_prediction()
+        test_chained_prediction()
+        test_chained_prediction("baseline_logistic")
+        test_metrics()
+        test_startup_timings()
+        test_memory_report()
+        test_model_versions()
+        test_model_reload()
+        test_executor_cancellation()
+        test_batch_score_cli()
+        test_compiled_linear_models()
         
         print("=" * 80)
         print("✅ ALL TESTS COMPLETED SUCCESSFULLY!")
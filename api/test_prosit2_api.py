@@ -72,6 +72,41 @@ def test_cluster_assignment():
             print(f"   Error: {response.text}")
 
 
+def test_batch_cluster_assignment():
+    """Test batch cluster assignment for all algorithms"""
+    print("\n" + "="*60)
+    print("TESTING PROSIT 2 - BATCH CLUSTER ASSIGNMENT")
+    print("="*60)
+    
+    far_student = dict(SAMPLE_STUDENT, mark=0.0, nationality=80.0, program=40.0)
+    records = [SAMPLE_STUDENT, far_student] * 10
+    
+    for algorithm in ["kmeans", "dbscan", "hierarchical", "gmm"]:
+        response = requests.post(
+            f"{BASE_URL}/prosit2/cluster/{algorithm}/batch",
+            json={"records": records}
+        )
+        
+        assert response.status_code == 200, response.text
+        result = response.json()
+        clusters = [a['cluster'] for a in result['assignments']]
+        outliers = sum(a['is_outlier'] for a in result['assignments'])
+        print(f"✅ {algorithm.upper()} batch of {result['n_records']}: "
+              f"clusters {sorted(set(clusters))}, outliers {outliers}")
+        assert result['n_records'] == len(result['assignments']) == len(records)
+        
+        # Each assignment must match the single-record endpoint
+        for i, student in enumerate([SAMPLE_STUDENT, far_student]):
+            single = requests.post(
+                f"{BASE_URL}/prosit2/cluster/{algorithm}",
+                json=student
+            ).json()
+            assert single['n_clusters'] == result['n_clusters']
+            for assignment in result['assignments'][i::2]:
+                assert assignment['cluster'] == single['cluster']
+                assert assignment['is_outlier'] == single['is_outlier']
+
+
 def test_model_info():
     """Test model information endpoint"""
     print("\n" + "="*60)
@@ -116,6 +151,88 @@ def test_metrics():
         print(f"   Status: {response.status_code}")
 
 
+def test_vector_cluster_assignment():
+    """Test cluster assignment from raw feature vectors"""
+    print("\n" + "="*60)
+    print("TESTING PROSIT 2 - RAW VECTOR ASSIGNMENT")
+    print("="*60)
+    
+    # SAMPLE_STUDENT lists its fields in /prosit2/features order
+    vector = list(SAMPLE_STUDENT.values())
+    
+    for algorithm in ["kmeans", "dbscan", "hierarchical", "gmm"]:
+        named = requests.post(
+            f"{BASE_URL}/prosit2/cluster/{algorithm}/batch",
+            json={"records": [SAMPLE_STUDENT]}
+        ).json()
+        response = requests.post(
+            f"{BASE_URL}/prosit2/cluster/{algorithm}/vector",
+            json={"features": vector}
+        )
+        
+        if response.status_code == 200:
+            result = response.json()
+            print(f"✅ {algorithm.upper()} vector: cluster "
+                  f"{result['assignments'][0]['cluster']}")
+            assert result["assignments"] == named["assignments"]
+        else:
+            print(f"❌ {algorithm.upper()} vector Failed!")
+            print(f"   Status: {response.status_code}")
+            print(f"   Error: {response.text}")
+    
+    # Out-of-range values are rejected with their position
+    bad_vector = list(vector)
+    bad_vector[1] = 5.0  # gpa_y must be <= 4
+    response = requests.post(
+        f"{BASE_URL}/prosit2/cluster/kmeans/vector",
+        json={"features": bad_vector}
+    )
+    print(f"   Out-of-range gpa_y: {response.status_code} "
+          f"{response.json()['detail'][0]['msg']}")
+    assert response.status_code == 422
+
+
+def test_bulk_cluster_assignment():
+    """Test Arrow IPC cluster assignment (columns matched by name)"""
+    print("\n" + "="*60)
+    print("TESTING PROSIT 2 - ARROW BULK ASSIGNMENT")
+    print("="*60)
+    
+    try:
+        import pyarrow as pa
+    except ImportError:
+        print("   pyarrow not installed, skipped")
+        return
+    
+    # Columns in reverse order, plus an id column the API ignores
+    columns = {name: [value] * 500 for name, value in reversed(SAMPLE_STUDENT.items())}
+    columns["student_id"] = list(range(500))
+    table = pa.table(columns)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    
+    named = requests.post(
+        f"{BASE_URL}/prosit2/cluster/kmeans/batch",
+        json={"records": [SAMPLE_STUDENT]}
+    ).json()
+    response = requests.post(
+        f"{BASE_URL}/prosit2/cluster/kmeans/bulk",
+        data=sink.getvalue().to_pybytes(),
+        headers={"Content-Type": "application/vnd.apache.arrow.stream"}
+    )
+    
+    if response.status_code == 200:
+        result = pa.ipc.open_stream(response.content).read_all()
+        clusters = set(result.column("cluster").to_pylist())
+        print(f"✅ {result.num_rows} rows assigned, clusters {clusters}")
+        assert clusters == {named["assignments"][0]["cluster"]}
+    else:
+        print(f"❌ Arrow bulk assignment Failed!")
+        print(f"   Status: {response.status_code}")
+        print(f"   Error: {response.text}")
+
+
 def main():
     """Run all tests"""
     print("\n" + "="*60)
@@ -134,6 +251,9 @@ def main():
         
         # Run tests
         test_cluster_assignment()
+        test_batch_cluster_assignment()
+        test_vector_cluster_assignment()
+        test_bulk_cluster_assignment()
         test_model_info()
         test_metrics()
         
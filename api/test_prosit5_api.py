@@ -2,8 +2,12 @@
 Test suite for Prosit 5 Predictive Models API endpoints
 """
 
+import io
 import requests
 import json
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 
 BASE_URL = "http://localhost:8000"
 
@@ -130,6 +134,144 @@ def test_delayed_graduation():
         print(f"   Error: {response.text}")
 
 
+def test_concurrent_predictions():
+    """Test concurrent single-row requests (micro-batched if API_MICRO_BATCH=1)"""
+    print("\n" + "="*60)
+    print("TESTING PROSIT 5 - CONCURRENT SINGLE-ROW REQUESTS")
+    print("="*60)
+    
+    students = [
+        dict(SAMPLE_Q9_DATA, first_year_gpa=round(1.0 + i * 0.1, 1), failed_courses=i % 4)
+        for i in range(30)
+    ]
+    
+    def predict(student):
+        response = requests.post(
+            f"{BASE_URL}/prosit5/predict/delayed-graduation", json=student
+        )
+        assert response.status_code == 200, response.text
+        result = response.json()
+        return result["prediction"], result["probability"]
+    
+    expected = [predict(student) for student in students]
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        concurrent = list(pool.map(predict, students * 4))
+    # Each request gets its own row back, whatever it was batched with
+    assert concurrent == expected * 4
+    print(f"✅ {len(concurrent)} concurrent predictions match the sequential ones")
+    
+    metrics = requests.get(f"{BASE_URL}/metrics").text
+    sizes = {}
+    for line in metrics.splitlines():
+        if line.startswith("api_micro_batch_size_") and "q9_delayed_graduation" in line:
+            sizes[line.split("{")[0]] = float(line.split()[-1])
+    if sizes:
+        print(f"   Mean batch size: "
+              f"{sizes['api_micro_batch_size_sum'] / sizes['api_micro_batch_size_count']:.2f}")
+    else:
+        print("   Micro-batching is off (API_MICRO_BATCH=1 to enable)")
+
+
+def test_bulk_upload():
+    """Test scoring an uploaded .npy file of named columns"""
+    print("\n" + "="*60)
+    print("TESTING PROSIT 5 - BULK .NPY UPLOAD")
+    print("="*60)
+    
+    # Structured array: columns are matched by name, in any order
+    students = np.zeros(
+        200, dtype=[("failed_courses", "i8"), ("first_year_gpa", "f8"),
+                    ("english_score", "f8"), ("math_score", "f8")]
+    )
+    students["math_score"] = SAMPLE_Q9_DATA["math_score"]
+    students["english_score"] = SAMPLE_Q9_DATA["english_score"]
+    students["first_year_gpa"] = np.linspace(1.0, 4.0, 200)
+    students["failed_courses"] = SAMPLE_Q9_DATA["failed_courses"]
+    buffer = io.BytesIO()
+    np.save(buffer, students)
+    
+    response = requests.post(
+        f"{BASE_URL}/prosit5/predict/delayed-graduation/bulk",
+        files={"file": ("students.npy", buffer.getvalue())}
+    )
+    
+    if response.status_code == 200:
+        result = np.load(io.BytesIO(response.content))
+        print(f"✅ {len(result)} students scored")
+        print(f"   Delayed: {int(result['prediction'].sum())}, "
+              f"probability range {result['probability'].min():.2%}"
+              f" - {result['probability'].max():.2%}")
+    else:
+        print(f"❌ Bulk upload Failed!")
+        print(f"   Status: {response.status_code}")
+        print(f"   Error: {response.text}")
+
+
+def test_stream_scoring():
+    """Test NDJSON streaming with the first-year struggle model"""
+    print("\n" + "="*60)
+    print("TESTING PROSIT 5 - NDJSON STREAM")
+    print("="*60)
+    
+    body = "".join(
+        json.dumps({**SAMPLE_Q1_DATA, "math_score": score, "id": f"s{score}"}) + "\n"
+        for score in range(40, 101)
+    )
+    response = requests.post(
+        f"{BASE_URL}/prosit5/predict/first-year-struggle/stream",
+        data=body,
+        headers={"Content-Type": "application/x-ndjson"}
+    )
+    
+    if response.status_code == 200:
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        summary = lines[-1]["summary"]
+        struggling = sum(line.get("prediction", 0) for line in lines[:-1])
+        print(f"✅ {summary['scored']} records streamed back, "
+              f"{struggling} likely to struggle")
+        assert summary["records"] == 61 and summary["errors"] == 0
+    else:
+        print(f"❌ Stream Failed!")
+        print(f"   Status: {response.status_code}")
+        print(f"   Error: {response.text}")
+
+
+def test_scoring_job():
+    """Test the CSV scoring job API: upload, poll, download"""
+    print("\n" + "="*60)
+    print("TESTING PROSIT 5 - CSV SCORING JOB")
+    print("="*60)
+    
+    header = "id,math_score,english_score,composite_score,first_year_gpa,failed_courses"
+    rows = [
+        f"s{i},{40 + i % 61},{SAMPLE_Q9_DATA['english_score']},"
+        f"{SAMPLE_Q1_DATA['composite_score']},{(i % 41) / 10},{i % 3}"
+        for i in range(1000)
+    ]
+    response = requests.post(
+        f"{BASE_URL}/jobs/score",
+        data="\n".join([header] + rows) + "\n",
+        headers={"Content-Type": "text/csv"}
+    )
+    print(f"   Submitted: {response.status_code} {response.headers.get('Location')}")
+    assert response.status_code == 202
+    job_id = response.json()["id"]
+    
+    for _ in range(100):
+        job = requests.get(f"{BASE_URL}/jobs/{job_id}").json()
+        if job["status"] in ("succeeded", "failed"):
+            break
+        time.sleep(0.2)
+    print(f"   Status: {job['status']}, {job['rows_done']}/{job['rows_total']} rows")
+    for model, status in job["models"].items():
+        print(f"   {model}: {status['status']}")
+    assert job["status"] == "succeeded"
+    
+    result = requests.get(f"{BASE_URL}/jobs/{job_id}/result").text.splitlines()
+    print(f"✅ Result: {len(result) - 1} rows, columns {result[0]}")
+    assert len(result) == 1001
+
+
 def test_model_info():
     """Test model information endpoint"""
     print("\n" + "="*60)
@@ -200,6 +342,186 @@ def test_findings():
         print(f"   Status: {response.status_code}")
 
 
+def cache_counter(name, model):
+    """Current value of a prediction cache counter for a model, or None"""
+    metrics = requests.get(f"{BASE_URL}/metrics").text
+    prefix = f'{name}{{model="{model}"}} '
+    for line in metrics.splitlines():
+        if line.startswith(prefix):
+            return float(line[len(prefix):])
+    return None
+
+
+def test_prediction_cache():
+    """Test that repeated profiles are served from the prediction cache"""
+    print("\n" + "="*60)
+    print("TESTING PROSIT 5 - PREDICTION CACHE")
+    print("="*60)
+    
+    model = "q1_first_year_struggle"
+    hits_before = cache_counter("api_prediction_cache_hits_total", model) or 0.0
+    
+    results = []
+    for attempt in range(2):
+        response = requests.post(
+            f"{BASE_URL}/prosit5/predict/first-year-struggle",
+            json=SAMPLE_Q1_DATA
+        )
+        assert response.status_code == 200
+        results.append(response.json())
+        print(f"   Request {attempt + 1}: {response.headers.get('Server-Timing')}")
+    assert results[0] == results[1]
+    
+    if cache_counter("api_prediction_cache_misses_total", model) is None:
+        print("ℹ️  Cache disabled (set API_PREDICTION_CACHE_SIZE to enable)")
+        return
+    
+    # The second request repeats the first profile, so it must be a hit
+    hits_after = cache_counter("api_prediction_cache_hits_total", model)
+    print(f"✅ Cache hits for {model}: {hits_before:g} -> {hits_after:g}")
+    assert hits_after is not None and hits_after >= hits_before + 1
+
+
+def test_dataset_insights():
+    """Test the cached dataset insights endpoint"""
+    print("\n" + "="*60)
+    print("TESTING PROSIT 5 - DATASET INSIGHTS")
+    print("="*60)
+    
+    response = requests.get(f"{BASE_URL}/prosit5/datasets/insights")
+    
+    assert response.status_code == 200, response.text
+    insights = response.json()
+    print("✅ Insights Retrieved!")
+    assert insights["datasets"]
+    for dataset in insights["datasets"]:
+        profiles = dataset.get("column_profiles", {})
+        null_rates = [p["null_rate"] for p in profiles.values()]
+        mean_null = sum(null_rates) / len(null_rates) if null_rates else 0.0
+        print(f"   {dataset['filename']}: {dataset['rows']} rows, "
+              f"{dataset['columns']} columns, mean null rate {mean_null:.1%}")
+        assert all(0.0 <= rate <= 1.0 for rate in null_rates)
+    
+    # Unchanged files: the same ETag, and a revalidation gets an empty 304
+    etag = response.headers.get("ETag")
+    print(f"   ETag: {etag}")
+    assert etag
+    response = requests.get(f"{BASE_URL}/prosit5/datasets/insights")
+    assert response.headers.get("ETag") == etag
+    assert response.json() == insights
+    response = requests.get(
+        f"{BASE_URL}/prosit5/datasets/insights",
+        headers={"If-None-Match": etag}
+    )
+    print(f"   Revalidation: {response.status_code}")
+    assert response.status_code == 304 and not response.content
+    response = requests.get(
+        f"{BASE_URL}/prosit5/datasets/insights",
+        headers={"If-None-Match": '"stale"'}
+    )
+    assert response.status_code == 200
+
+
+def test_conditional_get():
+    """Test ETag revalidation of the findings endpoint"""
+    print("\n" + "="*60)
+    print("TESTING PROSIT 5 - CONDITIONAL GET")
+    print("="*60)
+    
+    response = requests.get(f"{BASE_URL}/prosit5/results/findings")
+    etag = response.headers.get("ETag")
+    print(f"   First request: {response.status_code}, ETag {etag}, "
+          f"Content-Encoding {response.headers.get('Content-Encoding')}")
+    
+    response = requests.get(
+        f"{BASE_URL}/prosit5/results/findings",
+        headers={"If-None-Match": etag}
+    )
+    print(f"   Revalidation: {response.status_code}")
+    assert response.status_code == 304
+    
+    # The gzip and identity bodies are different representations: one
+    # ETag each, and either revalidates
+    response = requests.get(
+        f"{BASE_URL}/prosit5/results/findings",
+        headers={"Accept-Encoding": "identity"}
+    )
+    identity_etag = response.headers.get("ETag")
+    print(f"   Identity ETag: {identity_etag}")
+    if response.headers.get("Vary") == "Accept-Encoding":
+        assert identity_etag != etag
+    response = requests.get(
+        f"{BASE_URL}/prosit5/results/findings",
+        headers={"If-None-Match": identity_etag}
+    )
+    assert response.status_code == 304
+    print("✅ Unchanged findings revalidated with 304 Not Modified")
+
+
+def test_compiled_forests():
+    """Test the array-backed forest evaluator against sklearn's predict_proba"""
+    from pathlib import Path
+    import joblib
+    from compiled_models import FOREST_BLOCK_ROWS, compile_forest, predict_forest
+    from compiled_models import synthetic_rows
+    
+    print("\n" + "="*60)
+    print("TESTING PROSIT 5 - COMPILED RANDOM FORESTS")
+    print("="*60)
+    
+    models_dir = Path(__file__).resolve().parent.parent / "models" / "prosit 5"
+    for key in ("q1_first_year_struggle", "q3_major_success", "q9_delayed_graduation"):
+        model = joblib.load(models_dir / f"{key}_model.pkl")
+        scaler = joblib.load(models_dir / f"{key}_scaler.pkl")
+        compiled = compile_forest(scaler, model)
+        assert compiled is not None
+        
+        # Several row blocks plus a partial one, and single rows
+        X = synthetic_rows(scaler, n_rows=2 * FOREST_BLOCK_ROWS + 100, seed=1)
+        X_scaled = scaler.transform(X)
+        predictions, probabilities = predict_forest(compiled, X)
+        assert np.array_equal(probabilities, model.predict_proba(X_scaled)[:, 1])
+        assert np.array_equal(predictions, model.predict(X_scaled).astype(int))
+        for i in range(8):
+            assert predict_forest(compiled, X[i:i + 1])[1][0] == probabilities[i]
+        print(f"✅ {key}: {len(X)} rows match predict_proba exactly")
+
+
+def test_score_grid():
+    """Test the precomputed Q1/Q2 score grid against direct scoring"""
+    import main as api
+    
+    print("\n" + "="*60)
+    print("TESTING PROSIT 5 - PRECOMPUTED SCORE GRID")
+    print("="*60)
+    
+    api.ensure_loaded("prosit5")
+    p5 = api.model_registry.get("prosit5")
+    rng = np.random.default_rng(0)
+    for model_key in api.PROSIT5_GRID_MODELS:
+        table = api.build_prosit5_grid(p5, model_key)
+        grid_p5 = dict(p5, grids={model_key: table})
+        n_points = (len(api.PROSIT5_GRADE_SCORES) ** 2
+                    * len(api.prosit5_composite_scores()))
+        assert len(table["index"]) == len(table["predictions"]) == n_points
+        
+        # On-grid rows come from the table, with the directly scored result
+        points = list(table["index"])
+        for i in rng.choice(len(points), size=50, replace=False):
+            X = np.array([points[i]])
+            predictions, probabilities = api.lookup_prosit5_grid(grid_p5, model_key, X)
+            expected = api.compute_prosit5(p5, model_key, X)
+            assert predictions[0] == expected[0][0]
+            assert np.isclose(probabilities[0], expected[1][0], rtol=1e-12, atol=0)
+        
+        # Off-grid rows and batches are scored as usual
+        off_grid = np.array([[points[0][0] + 0.5, points[0][1], points[0][2]]])
+        assert api.lookup_prosit5_grid(grid_p5, model_key, off_grid) is None
+        batch = np.array(points[:2])
+        assert api.lookup_prosit5_grid(grid_p5, model_key, batch) is None
+        print(f"✅ {model_key}: {n_points} grid points match direct scoring")
+
+
 def main():
     """Run all tests"""
     print("\n" + "="*60)
@@ -221,11 +543,20 @@ def main():
         test_ajc_prediction()
         test_major_success()
         test_delayed_graduation()
+        test_prediction_cache()
+        test_concurrent_predictions()
+        test_compiled_forests()
+        test_score_grid()
+        test_bulk_upload()
+        test_stream_scoring()
+        test_scoring_job()
         
         # Run info tests
         test_model_info()
         test_metrics()
         test_findings()
+        test_dataset_insights()
+        test_conditional_get()
         
         print("\n" + "="*60)
         print("ALL PROSIT 5 TESTS COMPLETED!")
@@ -1,6 +1,13 @@
 import { useEffect, useState } from 'react';
 import { Database, FileText, Users, AlertCircle, BarChart3, PieChart } from 'lucide-react';
 
+interface ColumnProfile {
+  dtype: string;
+  null_rate: number;
+  cardinality: number;
+  quantiles?: Record<'min' | 'p25' | 'p50' | 'p75' | 'max', number>;
+}
+
 interface Dataset {
   name: string;
   filename: string;
@@ -16,6 +23,7 @@ interface Dataset {
     misconduct_types?: Record<string, number>;
     unique_students?: number;
   };
+  column_profiles?: Record<string, ColumnProfile>;
 }
 
 interface DatasetInsights {